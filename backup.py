@@ -0,0 +1,186 @@
+import sqlite3, os, json, datetime, logging, hashlib, struct
+
+BACKUP_DIR = "backups"
+BACKUP_KEEP = 5
+# Pages copied per backup step; other connections can write between steps.
+BACKUP_STEP_PAGES = 1024
+# An incremental chain is restarted from a full snapshot after this many deltas.
+MAX_DELTAS = 20
+
+DELTA_MAGIC = b"NLDELTA1"
+DELTA_HEADER = struct.Struct("<8sII")
+DELTA_PAGE = struct.Struct("<I")
+
+
+def page_digest(page):
+    return hashlib.blake2b(page, digest_size=16).hexdigest()
+
+
+def read_pages(path, page_size):
+    with open(path, "rb") as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                break
+            yield page
+
+
+def restore_backup(manifest_path, target_path):
+    # Rebuilds the newest snapshot of a chain: the full base file with each delta's pages
+    # written over it in order.
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    backup_dir = os.path.dirname(manifest_path)
+    with open(os.path.join(backup_dir, manifest["base"]), "rb") as src, open(target_path, "wb") as dst:
+        while True:
+            chunk = src.read(1 << 20)
+            if not chunk:
+                break
+            dst.write(chunk)
+    with open(target_path, "r+b") as dst:
+        for delta in manifest["deltas"]:
+            with open(os.path.join(backup_dir, delta), "rb") as f:
+                magic, page_size, page_count = DELTA_HEADER.unpack(f.read(DELTA_HEADER.size))
+                if magic != DELTA_MAGIC:
+                    raise ValueError(f"{delta} is not a backup delta")
+                while True:
+                    number = f.read(DELTA_PAGE.size)
+                    if not number:
+                        break
+                    dst.seek(DELTA_PAGE.unpack(number)[0] * page_size)
+                    dst.write(f.read(page_size))
+            dst.truncate(page_count * page_size)
+    return target_path
+
+
+class BackupManager:
+    def __init__(self, db_manager, translations, status_callback, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+        self.db_manager = db_manager
+        self.translations = translations
+        self.status_callback = status_callback
+        self.backup_dir = backup_dir
+        self.keep = keep
+
+    def backup(self, incremental=False):
+        os.makedirs(self.backup_dir, exist_ok=True)
+        if incremental:
+            path = self.incremental_backup()
+        else:
+            path = self.full_backup()
+        self.rotate()
+        logging.info(f"Database backed up to {path}")
+        return path
+
+    def full_backup(self):
+        path = self.backup_path(".bak")
+        self.snapshot(path)
+        self.write_manifest(path, [], self.hash_pages(path))
+        return path
+
+    def incremental_backup(self):
+        manifest = self.read_manifest()
+        if manifest is None or len(manifest["deltas"]) >= MAX_DELTAS:
+            return self.full_backup()
+        snapshot = self.backup_path(".tmp")
+        try:
+            self.snapshot(snapshot)
+            page_size = self.page_size(snapshot)
+            if page_size != manifest["page_size"]:
+                # A VACUUM changed the page size, so the old pages cannot be reused.
+                os.remove(snapshot)
+                return self.full_backup()
+            hashes = manifest["hashes"]
+            new_hashes = []
+            path = self.backup_path(".delta")
+            with open(path, "wb") as f:
+                f.write(DELTA_HEADER.pack(DELTA_MAGIC, page_size, 0))
+                for number, page in enumerate(read_pages(snapshot, page_size)):
+                    digest = page_digest(page)
+                    new_hashes.append(digest)
+                    if number >= len(hashes) or hashes[number] != digest:
+                        f.write(DELTA_PAGE.pack(number))
+                        f.write(page)
+                f.seek(0)
+                f.write(DELTA_HEADER.pack(DELTA_MAGIC, page_size, len(new_hashes)))
+        finally:
+            if os.path.exists(snapshot):
+                os.remove(snapshot)
+        base_path = os.path.join(self.backup_dir, manifest["base"])
+        self.write_manifest(base_path, manifest["deltas"] + [os.path.basename(path)], new_hashes)
+        return path
+
+    def snapshot(self, path):
+        # The online backup API copies a consistent image even while another connection
+        # is writing; the copy restarts if the source changes between steps.
+        def progress(status, remaining, total):
+            if total:
+                self.status_callback(self.translations.get(
+                    "backup_progress", "Backing up database: {percent}%"
+                ).format(percent=(total - remaining) * 100 // total))
+
+        target = sqlite3.connect(path)
+        try:
+            self.db_manager.conn.backup(target, pages=BACKUP_STEP_PAGES, progress=progress)
+        except BaseException:
+            target.close()
+            os.remove(path)
+            raise
+        target.close()
+
+    def hash_pages(self, path):
+        return [page_digest(page) for page in read_pages(path, self.page_size(path))]
+
+    def page_size(self, path):
+        with open(path, "rb") as f:
+            header = f.read(100)
+        # Header bytes 16-17; the value 1 means 65536.
+        size = int.from_bytes(header[16:18], "big")
+        return 65536 if size == 1 else size
+
+    def backup_path(self, suffix):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        return os.path.join(self.backup_dir, f"{self.db_label()}_{timestamp}{suffix}")
+
+    def db_label(self):
+        return os.path.basename(self.db_manager.db_name)
+
+    def manifest_path(self):
+        return os.path.join(self.backup_dir, f"{self.db_label()}.manifest.json")
+
+    def read_manifest(self):
+        path = self.manifest_path()
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if not os.path.exists(os.path.join(self.backup_dir, manifest["base"])):
+            return None
+        return manifest
+
+    def write_manifest(self, base_path, deltas, hashes):
+        manifest = {
+            "base": os.path.basename(base_path),
+            "deltas": deltas,
+            "page_size": self.page_size(base_path),
+            "hashes": hashes,
+        }
+        path = self.manifest_path()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def rotate(self):
+        # Keeps the newest `keep` full backups of this database and the deltas that follow
+        # them; names sort by time because the timestamp is fixed-width.
+        prefix = f"{self.db_label()}_"
+        names = sorted(name for name in os.listdir(self.backup_dir) if name.startswith(prefix))
+        bases = [name for name in names if name.endswith(".bak")]
+        if len(bases) <= self.keep:
+            return
+        oldest_kept = bases[-self.keep]
+        for name in names:
+            if name < oldest_kept and name.endswith((".bak", ".delta")):
+                try:
+                    os.remove(os.path.join(self.backup_dir, name))
+                except OSError:
+                    logging.exception(f"Could not remove old backup {name}")
@@ -0,0 +1,106 @@
+import argparse, json, os, random, shutil, sys, tempfile, time
+from database import DatabaseManager, SEARCH_FIELDS
+from diagnostics import percentile
+from import_export import ImportExportManager
+from benchmarks.generate import generate_entries
+from benchmarks.run import open_db, search_terms, quiet
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+QUERIES = 200
+TARGET_MS = 100
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # Kilobytes on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def query_terms(db_manager, count, seed):
+    # Half substrings as the search box gets them, half whole headwords and meaning words
+    # as a misspelled lookup would be; the long ones are the slow ones.
+    rng = random.Random(seed)
+    terms = search_terms(db_manager, count // 2, seed)
+    db_manager.cursor.execute("SELECT MAX(id) FROM Entry")
+    last_id = db_manager.cursor.fetchone()[0]
+    for entry in db_manager.fetch_entries(rng.sample(range(1, last_id + 1), min(count - len(terms), last_id))).values():
+        words = [entry['headword'].strip()]
+        if entry['meanings']:
+            words.append(rng.choice(rng.choice(entry['meanings']).split()))
+        terms.append(rng.choice(words).lower())
+    return [term for term in terms if term]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "queries": len(values),
+        "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure fuzzy search latency per query on a large dictionary.")
+    parser.add_argument("db", nargs="?", help="dictionary database; by default one of --size entries is generated")
+    parser.add_argument("--size", type=int, default=500000)
+    parser.add_argument("--queries", type=int, default=QUERIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--target-ms", type=float, default=TARGET_MS, help="p99 latency allowed per criterion")
+    parser.add_argument("--workdir", help="keep the generated database here instead of a temporary directory")
+    args = parser.parse_args(argv)
+
+    workdir = None
+    db_name = args.db
+    if not db_name:
+        workdir = args.workdir or tempfile.mkdtemp(prefix="nalluri-fuzzy-")
+        os.makedirs(workdir, exist_ok=True)
+        db_name = os.path.join(workdir, "fuzzy.db")
+        if not os.path.exists(db_name):
+            db_manager = DatabaseManager({}, quiet, 0)
+            db_manager.create_database(db_name)
+            ImportExportManager(db_manager, {}, quiet).bulk_import(generate_entries(args.size, seed=args.seed))
+            db_manager.conn.close()
+    try:
+        db_manager = open_db(db_name)
+        terms = query_terms(db_manager, args.queries, args.seed)
+        started = time.perf_counter()
+        db_manager.fuzzy_index.build(db_manager.cursor)
+        build_seconds = time.perf_counter() - started
+        db_manager.cursor.execute("SELECT COUNT(*) FROM Entry")
+        entries = db_manager.cursor.fetchone()[0]
+        criteria = {}
+        for criterion in (None,) + SEARCH_FIELDS:
+            fields = [criterion] if criterion else None
+            latencies = []
+            for term in terms:
+                started = time.perf_counter()
+                db_manager.fuzzy_search(term, fields)
+                latencies.append(time.perf_counter() - started)
+            criteria[criterion or "all"] = summarize(latencies)
+            print(f"{criterion or 'all':16} p50 {criteria[criterion or 'all']['p50_ms']:8.1f} ms"
+                  f"  p99 {criteria[criterion or 'all']['p99_ms']:8.1f} ms", file=sys.stderr, flush=True)
+        db_manager.conn.close()
+    finally:
+        if workdir and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {"entries": entries, "queries": len(terms), "seed": args.seed, "target_ms": args.target_ms},
+        "build": {"seconds": round(build_seconds, 3), "peak_rss_mb": peak_rss_mb()},
+        "criteria": criteria,
+        "over_target": sorted(name for name, result in criteria.items() if result["p99_ms"] > args.target_ms),
+    }
+    print(json.dumps(report, indent=2))
+    return 1 if report["over_target"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
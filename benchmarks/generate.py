@@ -0,0 +1,87 @@
+import argparse, random, sys
+from import_export import open_text, write_csv, write_json, write_jsonl
+
+# Headword scripts and their share of a generated dictionary.
+SCRIPT_WEIGHTS = {"latin": 40, "malayalam": 30, "cjk": 15, "arabic": 15}
+
+LATIN_ONSETS = ["", "b", "k", "d", "g", "l", "m", "n", "p", "r", "s", "t", "v", "ch", "sh", "th", "pr", "st"]
+LATIN_VOWELS = ["a", "e", "i", "o", "u", "aa", "ee", "ai", "ou"]
+LATIN_CODAS = ["", "", "", "n", "m", "r", "l", "s", "t"]
+MALAYALAM_CONSONANTS = [chr(c) for c in range(0x0D15, 0x0D3A)]
+MALAYALAM_SIGNS = [""] * 4 + [chr(c) for c in (0x0D3E, 0x0D3F, 0x0D40, 0x0D41, 0x0D42, 0x0D46, 0x0D47, 0x0D4A)]
+# Chillu letters and the virama, so near-duplicate folding has something to do.
+MALAYALAM_FINALS = ["", "", "", "ൺ", "ൻ", "ർ", "ൽ", "്"]
+ARABIC_LETTERS = [chr(c) for c in range(0x0628, 0x064B) if c not in range(0x063B, 0x0641)]
+PARTS_OF_SPEECH = ["noun", "verb", "adjective", "adverb", "pronoun", "preposition", "conjunction", ""]
+# Most entries have one or two senses, a few have many.
+SENSE_COUNTS = [1, 2, 3, 4, 5, 6, 8, 12]
+SENSE_WEIGHTS = [45, 25, 12, 7, 5, 3, 2, 1]
+
+
+def latin_word(rng, syllables):
+    return "".join(rng.choice(LATIN_ONSETS) + rng.choice(LATIN_VOWELS) + rng.choice(LATIN_CODAS)
+                   for _ in range(syllables))
+
+
+def headword(rng, script):
+    if script == "latin":
+        return latin_word(rng, rng.randint(1, 4))
+    if script == "malayalam":
+        word = "".join(rng.choice(MALAYALAM_CONSONANTS) + rng.choice(MALAYALAM_SIGNS) for _ in range(rng.randint(1, 4)))
+        return word + rng.choice(MALAYALAM_FINALS)
+    if script == "cjk":
+        return "".join(chr(rng.randint(0x4E00, 0x9FFF)) for _ in range(rng.randint(1, 3)))
+    return "".join(rng.choice(ARABIC_LETTERS) for _ in range(rng.randint(3, 6)))
+
+
+def variant(rng, word):
+    # A duplicate as a person would type it again: same word, other case or stray spaces.
+    return rng.choice([word, word.upper(), word.capitalize(), f" {word}", f"{word} "])
+
+
+def generate_entries(count, duplicate_rate=0.05, seed=0):
+    # Yields import records; about duplicate_rate of them repeat an earlier headword.
+    rng = random.Random(seed)
+    scripts, weights = list(SCRIPT_WEIGHTS), list(SCRIPT_WEIGHTS.values())
+    seen = []
+    for _ in range(count):
+        if seen and rng.random() < duplicate_rate:
+            word = variant(rng, rng.choice(seen))
+        else:
+            word = headword(rng, rng.choices(scripts, weights)[0])
+            seen.append(word)
+        senses = rng.choices(SENSE_COUNTS, SENSE_WEIGHTS)[0]
+        yield {
+            "headword": word,
+            "variation": headword(rng, "latin") if rng.random() < 0.1 else "",
+            "part_of_speech": rng.choice(PARTS_OF_SPEECH),
+            "notes": " ".join(latin_word(rng, 2) for _ in range(rng.randint(3, 12))) if rng.random() < 0.2 else "",
+            "meanings": [" ".join(latin_word(rng, rng.randint(1, 3)) for _ in range(rng.randint(1, 6)))
+                         for _ in range(senses)],
+        }
+
+
+WRITERS = {"csv": write_csv, "json": write_json, "jsonl": write_jsonl}
+
+
+def write_file(path, fmt, count, duplicate_rate=0.05, seed=0):
+    with open_text(path, "w", newline="" if fmt == "csv" else None) as f:
+        WRITERS[fmt]((dict(entry, id=number) for number, entry in
+                      enumerate(generate_entries(count, duplicate_rate, seed), 1)), f)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic dictionary for import.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_file(args.path, args.format, args.size, args.duplicate_rate, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import argparse, http.client, json, os, random, socket, subprocess, sys, threading, time
+from urllib.parse import quote
+from database import DatabaseManager
+from diagnostics import percentile
+from lookup_server import POOL_SIZE, RESPONSE_CACHE_SIZE
+from benchmarks.run import search_terms, quiet
+
+ENDPOINTS = ("lookup", "prefix", "search", "fuzzy", "entry")
+TERMS = 200
+# Building the fuzzy index of a large dictionary dominates startup.
+STARTUP_TIMEOUT = 300
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request_targets(db_name, endpoints, seed):
+    # Real headwords and substrings from the dictionary, so every endpoint finds something.
+    db_manager = DatabaseManager({}, quiet, 0)
+    db_manager.open_read_only(db_name)
+    try:
+        rng = random.Random(seed)
+        terms = search_terms(db_manager, TERMS, seed)
+        db_manager.cursor.execute("SELECT MAX(id) FROM Entry")
+        last_id = db_manager.cursor.fetchone()[0]
+        db_manager.cursor.execute("SELECT id, headword FROM Entry WHERE id IN (SELECT value FROM json_each(?))",
+                                  (json.dumps(rng.sample(range(1, last_id + 1), min(TERMS, last_id))),))
+        entries = [(entry_id, headword) for entry_id, headword in db_manager.cursor.fetchall() if headword.strip()]
+    finally:
+        db_manager.conn.close()
+    targets = []
+    for endpoint in endpoints:
+        if endpoint == "lookup":
+            targets += [f"/lookup?q={quote(headword)}" for _, headword in entries]
+        elif endpoint == "prefix":
+            targets += [f"/prefix?q={quote(headword[:2])}" for _, headword in entries]
+        elif endpoint == "entry":
+            targets += [f"/entry?id={entry_id}" for entry_id, _ in entries]
+        else:
+            targets += [f"/{endpoint}?q={quote(term)}" for term in terms]
+    return targets
+
+
+def start_server(db_name, port, pool_size, cache_size, fuzzy):
+    # A separate process, so the clients here do not compete with it for the GIL. Without
+    # fuzzy queries in the mix, the fuzzy index is not built behind the measured ones.
+    return subprocess.Popen(
+        [sys.executable, "-m", "lookup_server", os.path.abspath(db_name), "--port", str(port),
+         "--pool-size", str(pool_size), "--cache-size", str(cache_size)] + ([] if fuzzy else ["--no-fuzzy"]),
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+
+
+def wait_until_ready(host, port, process, fuzzy):
+    # Until /health answers, and with fuzzy until the fuzzy index is built as well.
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process and process.poll() is not None:
+            raise RuntimeError("The lookup server exited during startup")
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=10)
+            connection.request("GET", "/health")
+            health = json.loads(connection.getresponse().read())
+            connection.close()
+            if health["fuzzy_index"] or not fuzzy:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("The lookup server was not ready in time")
+
+
+def run_client(host, port, targets, deadline, seed, latencies, errors):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port)
+    while time.perf_counter() < deadline:
+        target = rng.choice(targets)
+        started = time.perf_counter()
+        try:
+            connection.request("GET", target)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port)
+            status = None
+        seconds = time.perf_counter() - started
+        endpoint = target[1:target.index("?")]
+        if status == 200:
+            latencies.setdefault(endpoint, []).append(seconds)
+        else:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+    connection.close()
+
+
+def summarize(latencies, seconds):
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "qps": round(len(values) / seconds, 1),
+        "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the lookup server and report QPS and latency.")
+    parser.add_argument("db", help="dictionary database; request terms are drawn from it")
+    parser.add_argument("--url", help="host:port of a running server; by default one is started on the database")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to send requests for")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated endpoints to mix")
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE, help="connections of the started server")
+    parser.add_argument("--cache-size", type=int, default=RESPONSE_CACHE_SIZE, help="response cache of the started server")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    endpoints = [endpoint for endpoint in args.endpoints.split(",") if endpoint]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    targets = request_targets(args.db, endpoints, args.seed)
+    process = None
+    if args.url:
+        host, _, port = args.url.rpartition(":")
+        port = int(port)
+    else:
+        host, port = "127.0.0.1", free_port()
+        process = start_server(args.db, port, args.pool_size, args.cache_size, "fuzzy" in endpoints)
+    try:
+        wait_until_ready(host, port, process, "fuzzy" in endpoints)
+        latencies = [{} for _ in range(args.clients)]
+        errors = [{} for _ in range(args.clients)]
+        started = time.perf_counter()
+        deadline = started + args.duration
+        clients = [
+            threading.Thread(target=run_client, args=(host, port, targets, deadline, args.seed + i, latencies[i], errors[i]))
+            for i in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        seconds = time.perf_counter() - started
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    by_endpoint = {}
+    for client_latencies in latencies:
+        for endpoint, values in client_latencies.items():
+            by_endpoint.setdefault(endpoint, []).extend(values)
+    report = {
+        "meta": {"clients": args.clients, "duration": args.duration, "targets": len(targets),
+                 "pool_size": args.pool_size, "cache_size": args.cache_size, "server": args.url or "started"},
+        "total": summarize([value for values in by_endpoint.values() for value in values], seconds),
+        "endpoints": {endpoint: summarize(values, seconds) for endpoint, values in sorted(by_endpoint.items())},
+        "errors": {endpoint: sum(client.get(endpoint, 0) for client in errors) for endpoint in endpoints
+                   if any(endpoint in client for client in errors)},
+    }
+    print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import argparse, json, os, platform, random, shutil, sqlite3, subprocess, sys, tempfile, time
+from database import DatabaseManager, SEARCH_FIELDS
+from import_export import ImportExportManager
+from benchmarks.generate import generate_entries, write_file
+
+# Same query shapes as the window: the first headword page, and searches that fetch one
+# row more than the narrowing cache holds.
+HEADWORD_PAGE = 500
+SEARCH_LIMIT = 2001
+SEARCH_TERMS = 50
+ENTRY_LOOKUPS = 1000
+# Slowdowns under this many seconds are treated as noise by the threshold check.
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def quiet(message):
+    pass
+
+
+def open_db(path):
+    # No entry cache, so entry lookups measure SQLite rather than a dict.
+    db_manager = DatabaseManager({}, quiet, 0)
+    db_manager.load_database(path)
+    return db_manager
+
+
+def close_db(db_manager):
+    db_manager.conn.close()
+
+
+def copy_db(source, target):
+    if os.path.exists(target):
+        os.remove(target)
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+    return target
+
+
+def search_terms(db_manager, count, seed):
+    # Substrings of real headwords and meanings, so every criterion finds something; the
+    # same seed picks the same terms.
+    rng = random.Random(seed)
+    db_manager.cursor.execute("SELECT MAX(id) FROM Entry")
+    last_id = db_manager.cursor.fetchone()[0]
+    entries = db_manager.fetch_entries(rng.sample(range(1, last_id + 1), min(count, last_id))).values()
+    words = [entry['headword'].strip() for entry in entries]
+    words += [rng.choice(rng.choice(entry['meanings']).split()) for entry in entries if entry['meanings']]
+    terms = []
+    for word in rng.sample(words, min(count, len(words))):
+        start = rng.randint(0, max(len(word) - 3, 0))
+        terms.append(word[start:start + rng.randint(3, 5)].lower())
+    return terms
+
+
+class BenchmarkRunner:
+    def __init__(self, workdir, size, duplicate_rate, seed, repeat):
+        self.workdir = workdir
+        self.size = size
+        self.duplicate_rate = duplicate_rate
+        self.seed = seed
+        self.repeat = repeat
+        self.results = {}
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def measure(self, name, run, setup=None, teardown=None, operations=1):
+        # Best of `repeat` runs. setup() and teardown(state) run untimed around each;
+        # setup's result is passed to run and teardown.
+        runs = []
+        for _ in range(self.repeat):
+            state = setup() if setup else None
+            started = time.perf_counter()
+            run(state)
+            runs.append(time.perf_counter() - started)
+            if teardown:
+                teardown(state)
+        self.results[name] = {"seconds": min(runs), "runs": runs, "operations": operations}
+        print(f"{name:32} {min(runs) * 1000:10.1f} ms", file=sys.stderr, flush=True)
+
+    def prepare(self):
+        for fmt in ("csv", "json"):
+            write_file(self.path(f"source.{fmt}"), fmt, self.size, self.duplicate_rate, self.seed)
+        db_manager = DatabaseManager({}, quiet, 0)
+        db_manager.create_database(self.path("base.db"))
+        ImportExportManager(db_manager, {}, quiet).bulk_import(
+            generate_entries(self.size, self.duplicate_rate, self.seed))
+        db_manager.conn.close()
+
+    def fresh_db(self, name="empty.db"):
+        path = self.path(name)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        db_manager = DatabaseManager({}, quiet, 0)
+        db_manager.create_database(path)
+        return db_manager
+
+    def copied_db(self):
+        return open_db(copy_db(self.path("base.db"), self.path("copy.db")))
+
+    def run(self):
+        self.prepare()
+        db_manager = open_db(self.path("base.db"))
+        manager = ImportExportManager(db_manager, {}, quiet)
+
+        self.measure("populate_headwords", lambda _: db_manager.fetch_headwords(limit=HEADWORD_PAGE))
+
+        def scroll(_):
+            page = db_manager.fetch_headwords(limit=HEADWORD_PAGE)
+            while len(page) == HEADWORD_PAGE:
+                page = db_manager.fetch_headwords(after=(page[-1][2], page[-1][0]), limit=HEADWORD_PAGE)
+        self.measure("scroll_headwords", scroll, operations=self.size)
+
+        terms = search_terms(db_manager, SEARCH_TERMS, self.seed)
+        db_manager.fuzzy_index.clear()
+        self.measure("fuzzy_index_build", lambda _: db_manager.fuzzy_index.build(db_manager.cursor),
+                     setup=db_manager.fuzzy_index.clear)
+        for criterion in (None,) + SEARCH_FIELDS:
+            fields = [criterion] if criterion else None
+            label = criterion or "all"
+            self.measure(f"search_{label}", lambda _: [
+                db_manager.search_entries(term, fields, limit=SEARCH_LIMIT, with_text=True) for term in terms
+            ], operations=len(terms))
+            self.measure(f"search_fuzzy_{label}", lambda _: [
+                db_manager.fuzzy_search(term, fields) for term in terms
+            ], operations=len(terms))
+
+        prefixes = [term[:length] for term in terms for length in (1, 2, 3)]
+        self.measure("complete_headwords", lambda _: [
+            db_manager.complete_headwords(prefix, limit=12) for prefix in prefixes
+        ], operations=len(prefixes))
+        self.measure("headword_initials", lambda _: db_manager.headword_initials())
+
+        entry_ids = random.Random(self.seed).sample(range(1, self.size + 1), min(ENTRY_LOOKUPS, self.size))
+        self.measure("display_entry", lambda _: [db_manager.fetch_entry(entry_id) for entry_id in entry_ids],
+                     operations=len(entry_ids))
+
+        self.measure("export_csv", lambda _: manager.export_csv(self.path("export.csv")), operations=self.size)
+        self.measure("export_json", lambda _: manager.export_json(self.path("export.json")), operations=self.size)
+        self.measure("export_json_sharded", lambda _: manager.export_sharded(self.path("export.json"), "json"),
+                     operations=self.size)
+        self.measure("backup_database", lambda _: db_manager.backup_database(),
+                     setup=lambda: shutil.rmtree(self.path("backups"), ignore_errors=True))
+        db_manager.conn.close()
+
+        for fmt in ("csv", "json"):
+            self.measure(f"import_{fmt}",
+                         lambda db: getattr(ImportExportManager(db, {}, quiet), f"import_{fmt}")(self.path(f"source.{fmt}")),
+                         setup=self.fresh_db, teardown=close_db, operations=self.size)
+        self.measure("merge_duplicates", lambda db: db.merge_duplicates(), setup=self.copied_db, teardown=close_db)
+        return self.results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    # Benchmarks slower than the baseline by more than threshold (a fraction) and by more
+    # than MIN_REGRESSION_SECONDS.
+    regressions = {}
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        seconds, base = result["seconds"], before["seconds"]
+        if seconds > base * (1 + threshold) and seconds - base > MIN_REGRESSION_SECONDS:
+            regressions[name] = {"seconds": seconds, "baseline": base, "ratio": round(seconds / base, 3)}
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the dictionary's hot paths on a synthetic dictionary.")
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--workdir", help="keep the generated files here instead of a temporary directory")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="nalluri-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    # BackupManager writes under the working directory.
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = BenchmarkRunner(workdir, args.size, args.duplicate_rate, args.seed, args.repeat).run()
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "size": args.size,
+            "duplicate_rate": args.duplicate_rate,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"]["size"] != args.size:
+            print(f"Baseline was run with --size {baseline['meta']['size']}", file=sys.stderr)
+        report["regressions"] = compare(results, baseline["results"], args.threshold)
+        for name, regression in report["regressions"].items():
+            print(f"REGRESSION {name}: {regression['baseline'] * 1000:.1f} ms -> "
+                  f"{regression['seconds'] * 1000:.1f} ms", file=sys.stderr)
+        code = 1 if report["regressions"] else 0
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+# Change tracking for delta exports. ChangeLog keeps one row per changed entry; every new
+# change replaces that row under a fresh AUTOINCREMENT revision, so revisions only grow
+# and the table never holds more rows than there are entries that ever changed. The
+# triggers delete and insert rather than INSERT OR REPLACE, because a conflict clause on
+# the statement that fired them (e.g. an upsert) would override theirs.
+CHANGE_TABLE = '''CREATE TABLE IF NOT EXISTS ChangeLog (
+        revision INTEGER PRIMARY KEY AUTOINCREMENT,
+        entry_id INTEGER NOT NULL UNIQUE,
+        operation TEXT NOT NULL)'''
+
+CHANGE_TRIGGERS = {
+    "entry_change_ai": '''CREATE TRIGGER IF NOT EXISTS entry_change_ai AFTER INSERT ON Entry BEGIN
+        DELETE FROM ChangeLog WHERE entry_id = NEW.id;
+        INSERT INTO ChangeLog(entry_id, operation) VALUES (NEW.id, 'upsert');
+    END''',
+    "entry_change_au": '''CREATE TRIGGER IF NOT EXISTS entry_change_au AFTER UPDATE ON Entry BEGIN
+        DELETE FROM ChangeLog WHERE entry_id = NEW.id;
+        INSERT INTO ChangeLog(entry_id, operation) VALUES (NEW.id, 'upsert');
+    END''',
+    "entry_change_ad": '''CREATE TRIGGER IF NOT EXISTS entry_change_ad AFTER DELETE ON Entry BEGIN
+        DELETE FROM ChangeLog WHERE entry_id = OLD.id;
+        INSERT INTO ChangeLog(entry_id, operation) VALUES (OLD.id, 'delete');
+    END''',
+    "senses_change_ai": '''CREATE TRIGGER IF NOT EXISTS senses_change_ai AFTER INSERT ON Senses BEGIN
+        DELETE FROM ChangeLog WHERE entry_id = NEW.entry_id;
+        INSERT INTO ChangeLog(entry_id, operation) VALUES (NEW.entry_id, 'upsert');
+    END''',
+    "senses_change_au": '''CREATE TRIGGER IF NOT EXISTS senses_change_au AFTER UPDATE ON Senses BEGIN
+        DELETE FROM ChangeLog WHERE entry_id = OLD.entry_id;
+        INSERT INTO ChangeLog(entry_id, operation) VALUES (OLD.entry_id, 'upsert');
+        DELETE FROM ChangeLog WHERE entry_id = NEW.entry_id;
+        INSERT INTO ChangeLog(entry_id, operation) VALUES (NEW.entry_id, 'upsert');
+    END''',
+    "senses_change_ad": '''CREATE TRIGGER IF NOT EXISTS senses_change_ad AFTER DELETE ON Senses BEGIN
+        DELETE FROM ChangeLog WHERE entry_id = OLD.entry_id;
+        INSERT INTO ChangeLog(entry_id, operation) VALUES (OLD.entry_id, 'upsert');
+    END''',
+}
+
+
+def log_changes(cursor, select, params=()):
+    # Records in one statement the changes that set-based operations make with the
+    # per-row triggers dropped. select yields (entry_id, operation) rows.
+    cursor.execute(f"INSERT OR REPLACE INTO ChangeLog(entry_id, operation) {select}", params)
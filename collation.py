@@ -0,0 +1,110 @@
+import json, logging, os, unicodedata
+from functools import lru_cache
+from near_duplicates import normalize_headword
+from resources import resource_path
+
+# Ordering tables, one per dictionary language, named like the translation files.
+COLLATION_DIR = "translations/collation"
+DEFAULT_COLLATION = "default"
+# Part of every collation's version: its sort keys depend on the Unicode data as well.
+KEY_FORMAT = 1
+# Between the primary weights and the tie-breaking spelling; sorts before any weight, so
+# a word sorts before the words it is a prefix of.
+LEVEL_SEPARATOR = "\0"
+# Sorts after every byte a key can contain; the end of a prefix range.
+PREFIX_END = b"\xff"
+
+
+class CollationWeights(dict):
+    # str.translate table from a code point to its primary weight. Unlisted characters
+    # weigh their own code point. The letters a table lists become a pair: the lowest code
+    # point of the alphabet, which keeps it in its place among the scripts, then the rank.
+    # That first code point is itself listed, so a pair is only ever compared with another
+    # pair. Filled on first use.
+    def __init__(self, order=(), expand=None, ignore=()):
+        super().__init__()
+        self.anchor = chr(min(map(ord, order))) if order else ""
+        self.ranks = {char: self.anchor + chr(rank + 1) for rank, char in enumerate(order)}
+        self.letters = {weight: char for char, weight in self.ranks.items()}
+        self.expand = expand or {}
+        self.ignore = set(ignore)
+
+    def weight(self, char):
+        if char in self.ranks:
+            return self.ranks[char]
+        # Combining marks, punctuation, controls and joiners do not change the order.
+        if char in self.ignore or unicodedata.category(char)[0] in "MP" or unicodedata.category(char) in ("Cc", "Cf"):
+            return ""
+        return char
+
+    def __missing__(self, code):
+        char = chr(code)
+        if char in self.expand:
+            weight = "".join(map(self.weight, self.expand[char]))
+        else:
+            weight = self.weight(char)
+        self[code] = weight
+        return weight
+
+
+class Collation:
+    # Turns a headword into a binary sort key. The primary level is the headword folded
+    # the way duplicate detection folds it (case, generic diacritics, chillu spelling,
+    # joiners), mapped through the language's ordering table; the spelling itself breaks
+    # ties, so keys are only equal for identical headwords.
+    def __init__(self, name=DEFAULT_COLLATION, table=None):
+        table = table or {}
+        self.name = name
+        self.version = f"{name}:{table.get('version', 1)}:{KEY_FORMAT}:{unicodedata.unidata_version}"
+        self.weights = CollationWeights(table.get("order", ()), table.get("expand"), table.get("ignore", ()))
+
+    def primary(self, text):
+        return normalize_headword(text).translate(self.weights)
+
+    def sort_key(self, headword):
+        headword = headword or ""
+        key = self.primary(headword) + LEVEL_SEPARATOR + unicodedata.normalize("NFC", headword.strip())
+        return key.encode("utf-8", "surrogatepass")
+
+    def prefix_range(self, prefix):
+        # [low, high) bounds of the keys of every headword starting with prefix.
+        low = self.primary(prefix).encode("utf-8", "surrogatepass")
+        return low, low + PREFIX_END
+
+    def headword_range(self, headword):
+        # [low, high) bounds of the keys of every headword equal to this one once folded.
+        low = self.primary(headword).encode("utf-8", "surrogatepass") + LEVEL_SEPARATOR.encode()
+        return low, low + PREFIX_END
+
+    def initial(self, key):
+        # The first letter of a sort key as (label, low, high), where [low, high) holds the
+        # keys of every headword starting with it; None for a headword without letters.
+        primary = key.split(LEVEL_SEPARATOR.encode(), 1)[0].decode("utf-8", "surrogatepass")
+        if not primary:
+            return None
+        unit = primary[:2] if self.weights.anchor and primary[0] == self.weights.anchor else primary[:1]
+        low = unit.encode("utf-8", "surrogatepass")
+        return self.weights.letters.get(unit, unit).upper(), low, low + PREFIX_END
+
+    def register(self, conn):
+        # SQL access for set-based rebuilds; rows are written with keys computed in Python.
+        conn.create_function("headword_sort_key", 1, self.sort_key, deterministic=True)
+
+
+def available_collations():
+    directory = resource_path(COLLATION_DIR)
+    names = [name[:-5] for name in os.listdir(directory) if name.endswith(".json")] if os.path.isdir(directory) else []
+    return [DEFAULT_COLLATION] + sorted(names)
+
+
+@lru_cache(maxsize=None)
+def load_collation(name):
+    if name == DEFAULT_COLLATION:
+        return Collation()
+    path = resource_path(os.path.join(COLLATION_DIR, f"{name}.json"))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return Collation(name, json.load(f))
+    except (OSError, ValueError) as e:
+        logging.warning(f"Collation {name} unavailable, using the default order: {e}")
+        return Collation()
@@ -1,24 +1,208 @@
-import sqlite3, os, json, datetime, logging
-from shutil import copyfile
-from PyQt5.QtWidgets import QMessageBox, QFileDialog, QInputDialog
+import sqlite3, os, json, logging
+from contextlib import contextmanager
+from urllib.request import pathname2url
+from backup import BackupManager
+from changelog import CHANGE_TRIGGERS, log_changes
+from collation import load_collation, DEFAULT_COLLATION
+from diagnostics import Diagnostics
+from entry_cache import EntryCache, ENTRY_CACHE_SIZE
+from fuzzy import FuzzyIndex
+from migrations import apply_migrations, schema_version, MIGRATIONS, META_TABLE
+from near_duplicates import NearDuplicateDetector
+
+# Headwords are duplicates when LOWER(TRIM(headword)) is equal. SQLite's LOWER folds
+# ASCII letters only and TRIM strips spaces only; duplicate_key does the same in Python.
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def duplicate_key(text):
+    return (text or "").strip(" ").translate(_ASCII_LOWER)
+
+
+# Columns searched by each search criterion; None stands for "All".
+SEARCH_FIELDS = ("headword", "part_of_speech", "variation", "meaning")
+
+# Pragmas applied to each new connection. WAL lets the GUI keep reading while a background
+# job writes; workers get a larger page cache for their long scans.
+CONNECTION_PROFILES = {
+    "interactive": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16384,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "worker": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    # Lookup services: read-only connections cannot change the journal mode.
+    "reader": {
+        "query_only": "ON",
+        "cache_size": -16384,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
+# Plain B-tree indexes, created by the schema migrations; bulk loads drop and rebuild
+# them around the insert.
+SECONDARY_INDEXES = {
+    "idx_senses_entry_id": "CREATE INDEX IF NOT EXISTS idx_senses_entry_id ON Senses(entry_id, position)",
+    "idx_entry_headword": "CREATE INDEX IF NOT EXISTS idx_entry_headword ON Entry(headword)",
+    # Duplicate handling groups on this expression, so keep it indexed.
+    "idx_entry_norm_headword": "CREATE INDEX IF NOT EXISTS idx_entry_norm_headword ON Entry(LOWER(TRIM(headword)))",
+    "idx_entry_sort_key": "CREATE INDEX IF NOT EXISTS idx_entry_sort_key ON Entry(sort_key, id, headword)",
+}
+
+SEARCH_TABLE = '''CREATE VIRTUAL TABLE IF NOT EXISTS EntrySearch USING fts5(
+        headword, variation, part_of_speech, notes, meaning,
+        tokenize='trigram')'''
+
+SEARCH_TRIGGERS = {
+    "entry_search_ai": '''CREATE TRIGGER IF NOT EXISTS entry_search_ai AFTER INSERT ON Entry BEGIN
+        INSERT INTO EntrySearch(rowid, headword, variation, part_of_speech, notes, meaning)
+        VALUES (NEW.id, NEW.headword, NEW.variation, NEW.part_of_speech, NEW.notes,
+                (SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = NEW.id));
+    END''',
+    "entry_search_au": '''CREATE TRIGGER IF NOT EXISTS entry_search_au AFTER UPDATE ON Entry BEGIN
+        DELETE FROM EntrySearch WHERE rowid = OLD.id;
+        INSERT INTO EntrySearch(rowid, headword, variation, part_of_speech, notes, meaning)
+        VALUES (NEW.id, NEW.headword, NEW.variation, NEW.part_of_speech, NEW.notes,
+                (SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = NEW.id));
+    END''',
+    "entry_search_ad": '''CREATE TRIGGER IF NOT EXISTS entry_search_ad AFTER DELETE ON Entry BEGIN
+        DELETE FROM EntrySearch WHERE rowid = OLD.id;
+    END''',
+    "senses_search_ai": '''CREATE TRIGGER IF NOT EXISTS senses_search_ai AFTER INSERT ON Senses BEGIN
+        UPDATE EntrySearch SET meaning =
+            (SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = NEW.entry_id)
+        WHERE rowid = NEW.entry_id;
+    END''',
+    # Reordering senses only touches position, which the index does not store.
+    "senses_search_au": '''CREATE TRIGGER IF NOT EXISTS senses_search_au AFTER UPDATE OF entry_id, meaning ON Senses BEGIN
+        UPDATE EntrySearch SET meaning =
+            (SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = OLD.entry_id)
+        WHERE rowid = OLD.entry_id;
+        UPDATE EntrySearch SET meaning =
+            (SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = NEW.entry_id)
+        WHERE rowid = NEW.entry_id;
+    END''',
+    "senses_search_ad": '''CREATE TRIGGER IF NOT EXISTS senses_search_ad AFTER DELETE ON Senses BEGIN
+        UPDATE EntrySearch SET meaning =
+            (SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = OLD.entry_id)
+        WHERE rowid = OLD.entry_id;
+    END''',
+}
+
+class DatabaseError(Exception):
+    # Carries a message (and dialog title) meant for the user; the GUI shows it in a
+    # message box, the command line prints it.
+    def __init__(self, message, title="Error"):
+        super().__init__(message)
+        self.title = title
+
+
+def open_connection(db_name, profile="interactive", read_only=False, shared_cache=False):
+    if read_only:
+        # Usable from whichever thread a connection pool hands it to; with shared_cache,
+        # every such connection to the file in this process reads through one page cache.
+        uri = "file:" + pathname2url(os.path.abspath(db_name)) + "?mode=ro" + ("&cache=shared" if shared_cache else "")
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(db_name)
+    for pragma, value in CONNECTION_PROFILES[profile].items():
+        try:
+            conn.execute(f"PRAGMA {pragma}={value}")
+        except sqlite3.OperationalError as e:
+            # e.g. WAL on a read-only directory; the connection still works without it.
+            logging.warning(f"PRAGMA {pragma}={value} not applied: {e}")
+    return conn
+
 
 class DatabaseManager:
-    def __init__(self, translations, status_callback):
+    def __init__(self, translations, status_callback, cache_size=ENTRY_CACHE_SIZE):
         self.conn = None
         self.cursor = None
+        self.db_name = None
         self.last_loaded_db = "last_loaded_db.json"
         self.translations = translations
         self.status_callback = status_callback
+        self.search_index_available = False
+        self.fuzzy_index = FuzzyIndex()
+        self.entry_cache = EntryCache(cache_size)
+        self.diagnostics = Diagnostics()
+        # Replaced by the database's own collation once it is loaded.
+        self.collation = load_collation(DEFAULT_COLLATION)
 
     def connect_db(self, db_name):
         try:
-            self.conn = sqlite3.connect(db_name)
-            self.cursor = self.conn.cursor()
+            self.conn = open_connection(db_name)
+            self.cursor = self.diagnostics.cursor(self.conn)
+            self.collation.register(self.conn)
+            self.db_name = db_name
+            self.fuzzy_index.clear()
+            self.entry_cache.clear()
         except Exception as e:
-            QMessageBox.critical(None, self.translations.get("error", "Error"),
-                                 f"Failed to connect to database: {e}")
-            return False
-        return True
+            raise DatabaseError(f"Failed to connect to database: {e}") from e
+
+    def open_read_only(self, db_name, shared_cache=False):
+        # For lookup services. Nothing is upgraded, backfilled or re-sorted, so the database
+        # must have been opened read-write by this version before.
+        if not os.path.exists(db_name):
+            raise DatabaseError(
+                self.translations.get("db_not_found", "Database not found: {database}").format(database=db_name)
+            )
+        try:
+            self.conn = open_connection(db_name, "reader", read_only=True, shared_cache=shared_cache)
+            self.cursor = self.diagnostics.cursor(self.conn)
+            if not self.check_db_structure():
+                raise DatabaseError(
+                    self.translations.get("not_valid", "Not a valid dictionary database!"),
+                    self.translations.get("invalid", "Invalid")
+                )
+            if schema_version(self.cursor) < MIGRATIONS[-1][0]:
+                raise DatabaseError(f"{db_name} needs upgrading; open it read-write once first")
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='EntrySearch'")
+            self.search_index_available = self.cursor.fetchone() is not None
+            self.collation = load_collation(self.read_meta("collation", DEFAULT_COLLATION))
+            if self.read_meta("collation_version") != self.collation.version:
+                logging.warning(f"Sort keys of {db_name} are out of date; prefix and exact lookups may miss entries")
+            self.db_name = db_name
+        except Exception as e:
+            if self.conn:
+                self.conn.close()
+            if isinstance(e, DatabaseError):
+                raise
+            raise DatabaseError(
+                self.translations.get("load_failed", "Load failed: {error_message}").format(error_message=e)
+            ) from e
+        return db_name
+
+    def open_worker(self, status_callback):
+        # A second manager on its own connection for use from a background thread.
+        # It shares the fuzzy index, entry cache and diagnostics so work done there is
+        # visible to the GUI.
+        worker = DatabaseManager(self.translations, status_callback)
+        worker.diagnostics = self.diagnostics
+        worker.conn = open_connection(self.db_name, "worker")
+        worker.cursor = self.diagnostics.cursor(worker.conn)
+        worker.collation = self.collation
+        worker.collation.register(worker.conn)
+        worker.db_name = self.db_name
+        worker.search_index_available = self.search_index_available
+        worker.fuzzy_index = self.fuzzy_index
+        worker.entry_cache = self.entry_cache
+        return worker
+
+    def set_diagnostics(self, enabled):
+        # Takes effect on this connection at once and on workers from their next job.
+        self.diagnostics.enabled = enabled
+        if self.conn:
+            self.cursor = self.diagnostics.cursor(self.conn)
 
     def check_db_structure(self):
         try:
@@ -28,12 +212,10 @@ class DatabaseManager:
             senses_table = self.cursor.fetchone()
             return entry_table and senses_table
         except sqlite3.Error as e:
-            QMessageBox.critical(
-                None, 
-                self.translations.get("db_error", "Database Error"),
-                self.translations.get("error_structure", "Structure check failed: {error_message}").format(error_message=e)
-            )
-            return False
+            raise DatabaseError(
+                self.translations.get("error_structure", "Structure check failed: {error_message}").format(error_message=e),
+                self.translations.get("db_error", "Database Error")
+            ) from e
 
     def save_last_db(self, db_name):
         with open(self.last_loaded_db, "w") as f:
@@ -45,153 +227,590 @@ class DatabaseManager:
                 return json.load(f).get("db_name")
         return None
 
-    def create_database(self, parent):
-        db_name, ok = QInputDialog.getText(
-            parent, 
-            self.translations.get("new_db", "New Database"),
-            self.translations.get("enter_db_name", "Enter database name:")
-        )
-        if not ok or not db_name:
-            return None
-
+    def create_database(self, db_name):
         if not db_name.endswith(".db"):
             db_name += ".db"
 
         if os.path.exists(db_name):
-            QMessageBox.warning(
-                parent, 
-                self.translations.get("exists", "Exists"),
-                self.translations.get("db_exists", "Database already exists!")
+            raise DatabaseError(
+                self.translations.get("db_exists", "Database already exists!"),
+                self.translations.get("exists", "Exists")
             )
-            return None
 
         try:
-            if self.connect_db(db_name):
-                self.cursor.execute('''CREATE TABLE Entry (
-                    id INTEGER PRIMARY KEY,
-                    headword TEXT,
-                    variation TEXT,
-                    part_of_speech TEXT,
-                    notes TEXT)''')
-                self.cursor.execute('''CREATE TABLE Senses (
-                    id INTEGER PRIMARY KEY,
-                    entry_id INTEGER,
-                    meaning TEXT,
-                    FOREIGN KEY(entry_id) REFERENCES Entry(id))''')
-                self.conn.commit()
-                self.save_last_db(db_name)
-                self.status_callback(
-                    self.translations.get("created_new_db", "Created new database: {database}").format(database=db_name)
-                )
-                return db_name
+            self.connect_db(db_name)
+            self.cursor.execute('''CREATE TABLE Entry (
+                id INTEGER PRIMARY KEY,
+                headword TEXT,
+                variation TEXT,
+                part_of_speech TEXT,
+                notes TEXT)''')
+            self.cursor.execute('''CREATE TABLE Senses (
+                id INTEGER PRIMARY KEY,
+                entry_id INTEGER,
+                meaning TEXT,
+                FOREIGN KEY(entry_id) REFERENCES Entry(id))''')
+            self.conn.commit()
+            self.migrate_schema()
+            self.ensure_search_index()
+            self.ensure_sort_keys()
         except Exception as e:
-            QMessageBox.critical(
-                parent,
-                self.translations.get("error", "Error"),
+            if self.conn:
+                self.conn.close()
+            raise DatabaseError(
                 self.translations.get("failed_to_create_db", "Failed to create database: {error_message}").format(error_message=e)
+            ) from e
+        self.status_callback(
+            self.translations.get("created_new_db", "Created new database: {database}").format(database=db_name)
+        )
+        return db_name
+
+    def load_database(self, db_name):
+        if not os.path.exists(db_name):
+            raise DatabaseError(
+                self.translations.get("db_not_found", "Database not found: {database}").format(database=db_name)
             )
+        try:
+            self.connect_db(db_name)
+            if not self.check_db_structure():
+                raise DatabaseError(
+                    self.translations.get("not_valid", "Not a valid dictionary database!"),
+                    self.translations.get("invalid", "Invalid")
+                )
+            self.migrate_schema()
+            self.ensure_search_index()
+            self.ensure_sort_keys()
+        except Exception as e:
             if self.conn:
                 self.conn.close()
-        return None
+            if isinstance(e, DatabaseError):
+                raise
+            raise DatabaseError(
+                self.translations.get("load_failed", "Load failed: {error_message}").format(error_message=e)
+            ) from e
+        self.status_callback(
+            self.translations.get("status_loaded", "Loaded: {database}").format(database=os.path.basename(db_name))
+        )
+        return db_name
 
-    def load_database(self, parent, db_name=None):
-        if not db_name:
-            db_name, _ = QFileDialog.getOpenFileName(
-                parent, 
-                self.translations.get("select_db", "Select Database"), 
-                "", 
-                self.translations.get("db_file_filter", "Database files (*.db);;All files (*.*)")
+    def prepare_database(self, db_name, status_callback):
+        # Runs load_database's upgrades and search index backfill on a connection of its own
+        # and closes it, so a worker can do the slow part before the GUI opens db_name.
+        preparer = DatabaseManager(self.translations, status_callback, 0)
+        preparer.load_database(db_name)
+        preparer.conn.close()
+        return db_name
+
+    def migrate_schema(self):
+        applied = apply_migrations(self.conn)
+        if applied:
+            self.status_callback(
+                self.translations.get("schema_migrated", "Database upgraded: {migrations}").format(migrations=", ".join(applied))
             )
-        if db_name and os.path.exists(db_name):
-            try:
-                if self.connect_db(db_name):
-                    if not self.check_db_structure():
-                        QMessageBox.critical(
-                            parent,
-                            self.translations.get("invalid", "Invalid"),
-                            self.translations.get("not_valid", "Not a valid dictionary database!")
-                        )
-                        self.conn.close()
-                        return None
-                    self.save_last_db(db_name)
-                    self.status_callback(
-                        self.translations.get("status_loaded", "Loaded: {database}").format(database=os.path.basename(db_name))
-                    )
-                    return db_name
-            except Exception as e:
-                QMessageBox.critical(
-                    parent, 
-                    self.translations.get("error", "Error"),
-                    self.translations.get("load_failed", "Load failed: {error_message}").format(error_message=e)
-                )
-                if self.conn:
-                    self.conn.close()
-        return None
+        return applied
 
-    def backup_database(self):
-        if self.conn is None:
-            return
-        db_name = self.load_last_db()
-        if not db_name or not os.path.exists(db_name):
+    def ensure_search_index(self):
+        # Older databases have no EntrySearch table; create it and backfill it once.
+        # It stays outside the migrations because SQLite builds without FTS5 cannot have it.
+        try:
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='EntrySearch'")
+            exists = self.cursor.fetchone()
+            self.cursor.execute(SEARCH_TABLE)
+            for statement in SEARCH_TRIGGERS.values():
+                self.cursor.execute(statement)
+            if not exists:
+                self.backfill_search_index()
+            self.conn.commit()
+            self.search_index_available = True
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5/trigram fall back to LIKE scans.
+            self.conn.rollback()
+            self.search_index_available = False
+            logging.warning(f"Full-text search index unavailable: {e}")
+
+    def read_meta(self, key, default=None):
+        self.cursor.execute("SELECT value FROM Meta WHERE key = ?", (key,))
+        row = self.cursor.fetchone()
+        return row[0] if row else default
+
+    def write_meta(self, key, value):
+        self.cursor.execute(META_TABLE)
+        self.cursor.execute("INSERT OR REPLACE INTO Meta (key, value) VALUES (?, ?)", (key, value))
+
+    def ensure_sort_keys(self):
+        # Keys are written with each entry. They are all rebuilt when the collation or its
+        # table changed since they were computed, and filled in for rows written by other
+        # programs, which leave them NULL.
+        collation = load_collation(self.read_meta("collation", DEFAULT_COLLATION))
+        if collation is not self.collation:
+            self.collation = collation
+            collation.register(self.conn)
+        if self.read_meta("collation_version") != collation.version:
+            self.rebuild_sort_keys()
             return
-        backup_dir = "backups"
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = os.path.join(backup_dir, f"{os.path.basename(db_name)}_{timestamp}.bak")
+        self.cursor.execute("SELECT 1 FROM Entry WHERE sort_key IS NULL LIMIT 1")
+        if self.cursor.fetchone():
+            self.update_sort_keys("sort_key IS NULL")
+
+    def set_collation(self, name):
+        self.write_meta("collation", name)
+        self.conn.commit()
+        self.ensure_sort_keys()
+
+    def rebuild_sort_keys(self):
+        self.status_callback(self.translations.get("sort_keys_rebuilding", "Sorting headwords ({collation})...").format(
+            collation=self.collation.name))
+        return self.update_sort_keys("1", drop_index=True)
+
+    def update_sort_keys(self, condition, drop_index=False):
+        # A sort key is not content: the full-text index and change log do not see it change.
+        self.conn.commit()
         try:
-            from shutil import copyfile
-            copyfile(db_name, backup_path)
-            logging.info(f"Database backed up to {backup_path}")
-        except Exception as e:
-            logging.exception("Database backup failed")
+            self.cursor.execute("BEGIN")
+            if drop_index:
+                # Building the index once afterwards beats updating it row by row.
+                self.cursor.execute("DROP INDEX IF EXISTS idx_entry_sort_key")
+            self.drop_tracking_triggers()
+            self.cursor.execute(f"UPDATE Entry SET sort_key = headword_sort_key(headword) WHERE {condition}")
+            count = self.cursor.rowcount
+            self.cursor.execute(SECONDARY_INDEXES["idx_entry_sort_key"])
+            for statement in CHANGE_TRIGGERS.values():
+                self.cursor.execute(statement)
+            if self.search_index_available:
+                for statement in SEARCH_TRIGGERS.values():
+                    self.cursor.execute(statement)
+            self.write_meta("collation_version", self.collation.version)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return count
 
-    def merge_duplicates(self):
-        self.cursor.execute(
-            "SELECT LOWER(TRIM(headword)) as norm_headword, COUNT(*) as cnt FROM Entry GROUP BY norm_headword HAVING cnt > 1"
-        )
-        duplicates = self.cursor.fetchall()
-        for norm_headword, count in duplicates:
+    def backfill_search_index(self, after_id=0):
+        self.index_search_rows("Entry.id > ?", (after_id,))
+
+    def index_search_rows(self, condition, params=()):
+        self.cursor.execute(f'''
+            INSERT INTO EntrySearch(rowid, headword, variation, part_of_speech, notes, meaning)
+            SELECT Entry.id, headword, variation, part_of_speech, notes,
+                   (SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = Entry.id)
+            FROM Entry WHERE {condition}''', params)
+
+    @contextmanager
+    def bulk_load(self, keep_indexes=()):
+        # Relax durability and drop per-row index maintenance for the duration of a load;
+        # keep_indexes names the ones the load itself reads through.
+        # Everything, including the DDL, runs in one transaction so a failure rolls back cleanly.
+        self.conn.commit()
+        self.cursor.execute("PRAGMA journal_mode")
+        journal_mode = self.cursor.fetchone()[0]
+        self.cursor.execute("PRAGMA synchronous")
+        synchronous = self.cursor.fetchone()[0]
+        # A WAL database stays in WAL: leaving it needs every other connection closed.
+        if journal_mode.lower() != "wal":
+            self.cursor.execute("PRAGMA journal_mode=MEMORY")
+        self.cursor.execute("PRAGMA synchronous=OFF")
+        try:
+            self.cursor.execute("BEGIN")
+            self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM Entry")
+            last_id = self.cursor.fetchone()[0]
+            # Loads that also rewrite existing entries list their ids here, so the search
+            # index and change log are fixed up for them along with the new rows.
+            self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_updated (entry_id INTEGER PRIMARY KEY)")
+            self.cursor.execute("DELETE FROM bulk_updated")
+            for name in list(SEARCH_TRIGGERS) + list(CHANGE_TRIGGERS):
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            for name in SECONDARY_INDEXES:
+                if name not in keep_indexes:
+                    self.cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            yield last_id
+            for statement in SECONDARY_INDEXES.values():
+                self.cursor.execute(statement)
+            log_changes(
+                self.cursor,
+                "SELECT id, 'upsert' FROM Entry WHERE id > ? UNION ALL SELECT entry_id, 'upsert' FROM bulk_updated",
+                (last_id,)
+            )
+            for statement in CHANGE_TRIGGERS.values():
+                self.cursor.execute(statement)
+            if self.search_index_available:
+                self.cursor.execute("DELETE FROM EntrySearch WHERE rowid IN (SELECT entry_id FROM bulk_updated)")
+                self.index_search_rows("Entry.id IN (SELECT entry_id FROM bulk_updated)")
+                self.backfill_search_index(last_id)
+                for statement in SEARCH_TRIGGERS.values():
+                    self.cursor.execute(statement)
+            self.conn.commit()
+            self.entry_cache.clear()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            if journal_mode.lower() != "wal":
+                self.cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            self.cursor.execute(f"PRAGMA synchronous={synchronous}")
+
+    def fetch_headwords(self, after=None, limit=500):
+        # Keyset paging on (sort_key, id) so each page costs the same however deep the list
+        # is; rows are (id, headword, sort_key), read from idx_entry_sort_key alone.
+        if after is None:
+            self.cursor.execute("SELECT id, headword, sort_key FROM Entry ORDER BY sort_key, id LIMIT ?", (limit,))
+        else:
             self.cursor.execute(
-                "SELECT id, headword FROM Entry WHERE LOWER(TRIM(headword)) = ? ORDER BY id ASC",
-                (norm_headword,)
+                "SELECT id, headword, sort_key FROM Entry WHERE (sort_key, id) > (?, ?) ORDER BY sort_key, id LIMIT ?",
+                (after[0], after[1], limit)
             )
-            entries = self.cursor.fetchall()
-            if entries:
-                master_id = entries[0][0]
-                for duplicate in entries[1:]:
-                    duplicate_id = duplicate[0]
-                    self.cursor.execute(
-                        "UPDATE Senses SET entry_id = ? WHERE entry_id = ?",
-                        (master_id, duplicate_id)
-                    )
-                    self.cursor.execute(
-                        "DELETE FROM Entry WHERE id = ?",
-                        (duplicate_id,)
-                    )
-        self.conn.commit()
+        return self.cursor.fetchall()
 
-    def delete_duplicates(self):
+    def fetch_headwords_before(self, before, limit=500):
+        # The page that precedes the key `before`, nearest first.
         self.cursor.execute(
-            "SELECT LOWER(TRIM(headword)) as norm_headword, COUNT(*) as cnt FROM Entry GROUP BY norm_headword HAVING cnt > 1"
+            "SELECT id, headword, sort_key FROM Entry WHERE (sort_key, id) < (?, ?) ORDER BY sort_key DESC, id DESC LIMIT ?",
+            (before[0], before[1], limit)
         )
-        duplicates = self.cursor.fetchall()
-        for norm_headword, count in duplicates:
-            self.cursor.execute(
-                "SELECT id, headword FROM Entry WHERE LOWER(TRIM(headword)) = ? ORDER BY id ASC",
-                (norm_headword,)
-            )
-            entries = self.cursor.fetchall()
-            if entries:
-                master_id = entries[0][0]
-                for duplicate in entries[1:]:
-                    duplicate_id = duplicate[0]
-                    self.cursor.execute(
-                        "DELETE FROM Senses WHERE entry_id = ?",
-                        (duplicate_id,)
-                    )
-                    self.cursor.execute(
-                        "DELETE FROM Entry WHERE id = ?",
-                        (duplicate_id,)
-                    )
-        self.conn.commit()
+        return self.cursor.fetchall()
+
+    def complete_headwords(self, prefix, limit=10):
+        # Headwords that start with prefix once both are folded by the collation, in list
+        # order: one range scan of idx_entry_sort_key, however large the dictionary. A
+        # headword entered several times is listed once, with its lowest id.
+        low, high = self.collation.prefix_range(prefix)
+        self.cursor.execute(
+            "SELECT MIN(id), headword FROM Entry WHERE sort_key >= ? AND sort_key < ? GROUP BY sort_key "
+            "ORDER BY sort_key LIMIT ?",
+            (low, high, limit)
+        )
+        return self.cursor.fetchall()
+
+    def find_headword(self, headword):
+        # Entries whose headword equals this one once both are folded by the collation, in
+        # list order; the same matches as LookupFile.lookup.
+        self.cursor.execute("SELECT id FROM Entry WHERE sort_key >= ? AND sort_key < ? ORDER BY sort_key, id",
+                            self.collation.headword_range(headword))
+        entry_ids = [row[0] for row in self.cursor.fetchall()]
+        entries = self.fetch_entries(entry_ids)
+        return [entries[entry_id] for entry_id in entry_ids]
+
+    def headword_initials(self, limit=100):
+        # The first letters in use, in list order, as (label, low, high) key ranges. Each
+        # letter costs one index seek past the previous one instead of a scan; large
+        # alphabets (CJK) are cut off at limit.
+        initials = []
+        # Headwords without letters have keys starting with the level separator.
+        low = b"\x01"
+        while len(initials) < limit:
+            self.cursor.execute("SELECT sort_key FROM Entry WHERE sort_key >= ? ORDER BY sort_key LIMIT 1", (low,))
+            row = self.cursor.fetchone()
+            initial = row and self.collation.initial(row[0])
+            if not initial:
+                break
+            initials.append(initial)
+            low = initial[2]
+        return initials
+
+    def fetch_entry(self, entry_id):
+        # One round trip for the entry and its senses in their stored order; cached until
+        # the entry is saved, deleted or replaced by an import.
+        entry = self.entry_cache.get(entry_id)
+        if entry is not None:
+            return entry
+        self.cursor.execute('''
+            SELECT Entry.id, headword, variation, part_of_speech, notes, Senses.meaning
+            FROM Entry LEFT JOIN Senses ON Senses.entry_id = Entry.id
+            WHERE Entry.id = ? ORDER BY Senses.position, Senses.id''', (entry_id,))
+        rows = self.cursor.fetchall()
+        if not rows:
+            return None
+        _, headword, variation, part_of_speech, notes, _ = rows[0]
+        entry = {
+            'id': entry_id,
+            'headword': headword,
+            'variation': variation,
+            'part_of_speech': part_of_speech,
+            'notes': notes,
+            'meanings': [row[5] for row in rows if row[5] is not None],
+        }
+        self.entry_cache.put(entry_id, entry)
+        return entry
+
+    def current_revision(self):
+        self.cursor.execute("SELECT COALESCE(MAX(revision), 0) FROM ChangeLog")
+        return self.cursor.fetchone()[0]
+
+    def iter_changes(self, since, upto, chunk_size=1000):
+        # The latest change of each entry in (since, upto], in revision order: the entry
+        # dict for upserts, {'id': ...} for entries that no longer exist.
+        changes = self.diagnostics.cursor(self.conn)
+        changes.execute(
+            "SELECT revision, entry_id FROM ChangeLog WHERE revision > ? AND revision <= ? ORDER BY revision",
+            (since, upto)
+        )
+        while True:
+            rows = changes.fetchmany(chunk_size)
+            if not rows:
+                break
+            entries = self.fetch_entries({entry_id for _, entry_id in rows})
+            for revision, entry_id in rows:
+                entry = entries.get(entry_id)
+                if entry is None:
+                    yield revision, "delete", {'id': entry_id}
+                else:
+                    yield revision, "upsert", entry
+
+    def iter_entries(self, chunk_size=1000, id_range=None):
+        # Merge-joins Entry and Senses, both read in entry order through fetchmany, so an
+        # export holds one chunk of each table at a time and meanings are never re-split.
+        # id_range limits it to low <= id < high; either end may be None.
+        low, high = id_range or (None, None)
+        bounds = [(operator, bound) for operator, bound in ((">=", low), ("<", high)) if bound is not None]
+        params = tuple(bound for _, bound in bounds)
+
+        def where(column):
+            return "WHERE " + " AND ".join(f"{column} {operator} ?" for operator, _ in bounds) if bounds else ""
+        entries = self.diagnostics.cursor(self.conn)
+        senses = self.diagnostics.cursor(self.conn)
+        entries.execute(f"SELECT id, headword, variation, part_of_speech, notes FROM Entry {where('id')} ORDER BY id",
+                        params)
+        senses.execute(f"SELECT entry_id, meaning FROM Senses {where('entry_id')} ORDER BY entry_id, position, id",
+                       params)
+        sense_rows = senses.fetchmany(chunk_size)
+        sense_pos = 0
+        while True:
+            rows = entries.fetchmany(chunk_size)
+            if not rows:
+                break
+            for entry_id, headword, variation, part_of_speech, notes in rows:
+                meanings = []
+                while sense_rows:
+                    if sense_pos == len(sense_rows):
+                        sense_rows = senses.fetchmany(chunk_size)
+                        sense_pos = 0
+                        continue
+                    sense_entry_id, meaning = sense_rows[sense_pos]
+                    if sense_entry_id is not None and sense_entry_id > entry_id:
+                        break
+                    if sense_entry_id == entry_id:
+                        meanings.append(meaning)
+                    sense_pos += 1
+                yield {
+                    'id': entry_id,
+                    'headword': headword,
+                    'variation': variation,
+                    'part_of_speech': part_of_speech,
+                    'notes': notes,
+                    'meanings': meanings,
+                }
+
+    def entry_id_ranges(self, count, min_size=1):
+        # Splits the ids into at most count ranges holding about as many entries each, but
+        # at least min_size, as (low, high) for iter_entries; the first and last are open-ended.
+        self.cursor.execute("SELECT COUNT(*) FROM Entry")
+        size = max(-(-self.cursor.fetchone()[0] // max(count, 1)), min_size, 1)
+        # Every size-th id, found in one pass over the primary key.
+        self.cursor.execute(
+            "SELECT id FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS position FROM Entry) "
+            "WHERE position > 0 AND position % ? = 0", (size,)
+        )
+        bounds = [row[0] for row in self.cursor.fetchall()]
+        return list(zip([None] + bounds, bounds + [None]))
+
+    def fetch_entries(self, entry_ids):
+        # Same dicts as iter_entries, for an arbitrary set of ids.
+        ids = json.dumps(sorted(entry_ids))
+        self.cursor.execute(
+            "SELECT id, headword, variation, part_of_speech, notes FROM Entry "
+            "WHERE id IN (SELECT value FROM json_each(?))", (ids,)
+        )
+        entries = {
+            entry_id: {'id': entry_id, 'headword': headword, 'variation': variation,
+                       'part_of_speech': part_of_speech, 'notes': notes, 'meanings': []}
+            for entry_id, headword, variation, part_of_speech, notes in self.cursor.fetchall()
+        }
+        self.cursor.execute(
+            "SELECT entry_id, meaning FROM Senses WHERE entry_id IN (SELECT value FROM json_each(?)) "
+            "ORDER BY entry_id, position, id", (ids,)
+        )
+        for entry_id, meaning in self.cursor.fetchall():
+            entries[entry_id]['meanings'].append(meaning)
+        return entries
+
+    def search_entries(self, term, fields=None, limit=-1, offset=0, with_text=False):
+        # Pages through the ranked matches with LIMIT/OFFSET. with_text adds a third column
+        # holding the searched fields joined by newlines, so callers can narrow the result
+        # in memory when the term grows.
+        fields = fields or SEARCH_FIELDS
+        term = term.lower().strip()
+        if not self.search_index_available:
+            return self._search_entries_like(term, fields, limit, offset, with_text)
+        text = ", " + self._search_text(fields, "EntrySearch") if with_text else ""
+        if len(term) >= 3:
+            # The trigram tokenizer answers substring phrases straight from the index.
+            phrase = '"' + term.replace('"', '""') + '"'
+            query = f'''SELECT Entry.id, Entry.headword{text} FROM EntrySearch
+                       JOIN Entry ON Entry.id = EntrySearch.rowid
+                       WHERE EntrySearch MATCH ?
+                       ORDER BY rank, Entry.sort_key LIMIT ? OFFSET ?'''
+            param = ("{" + " ".join(fields) + "} : " + phrase,)
+        else:
+            # Terms shorter than a trigram cannot use the index; scan the FTS content instead.
+            query = f'''SELECT Entry.id, Entry.headword{text} FROM EntrySearch
+                       JOIN Entry ON Entry.id = EntrySearch.rowid
+                       WHERE ''' + " OR ".join(f"EntrySearch.{field} LIKE ?" for field in fields) + '''
+                       ORDER BY Entry.sort_key LIMIT ? OFFSET ?'''
+            param = ('%' + term + '%',) * len(fields)
+        self.cursor.execute(query, param + (limit, offset))
+        return self.cursor.fetchall()
+
+    @staticmethod
+    def _search_text(fields, table):
+        columns = []
+        for field in fields:
+            if field == "meaning" and table == "Entry":
+                columns.append("(SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = Entry.id)")
+            else:
+                columns.append(f"{table}.{field}")
+        return " || char(10) || ".join(f"COALESCE({column}, '')" for column in columns)
+
+    def fuzzy_search(self, term, fields=None, limit=-1, offset=0):
+        # Closest matches first, equally close ones in list order. The index is built on the
+        # first fuzzy query and kept current by its callers afterwards.
+        if not self.fuzzy_index.built:
+            self.fuzzy_index.build(self.cursor)
+        scores = self.fuzzy_index.search(term, fields)
+        self.cursor.execute(
+            """SELECT Entry.id, Entry.headword FROM json_each(?) AS scored
+               JOIN Entry ON Entry.id = CAST(scored.key AS INTEGER)
+               ORDER BY scored.value DESC, Entry.sort_key, Entry.id LIMIT ? OFFSET ?""",
+            (json.dumps(scores), limit, offset)
+        )
+        return self.cursor.fetchall()
+
+    def _search_entries_like(self, term, fields, limit=-1, offset=0, with_text=False):
+        clauses = []
+        for field in fields:
+            if field == "meaning":
+                clauses.append("id IN (SELECT entry_id FROM Senses WHERE LOWER(meaning) LIKE ?)")
+            else:
+                clauses.append(f"LOWER({field}) LIKE ?")
+        text = ", " + self._search_text(fields, "Entry") if with_text else ""
+        query = (f"SELECT id, headword{text} FROM Entry WHERE " + " OR ".join(clauses) +
+                 " ORDER BY sort_key, id LIMIT ? OFFSET ?")
+        self.cursor.execute(query, ('%' + term + '%',) * len(fields) + (limit, offset))
+        return self.cursor.fetchall()
+
+    def backup_database(self, incremental=False):
+        if self.conn is None or not self.db_name:
+            return None
+        return BackupManager(self, self.translations, self.status_callback).backup(incremental)
+
+    def find_duplicates(self):
+        # Grouped the same way merge_duplicates groups, so what is shown is what gets merged.
+        self.cursor.execute('''
+            SELECT MIN(headword), COUNT(*) FROM Entry
+            GROUP BY LOWER(TRIM(headword)) HAVING COUNT(*) > 1 ORDER BY MIN(headword)''')
+        return self.cursor.fetchall()
+
+    def find_near_duplicates(self, report_every=50000):
+        # Clusters of headwords that differ only by diacritics, joiners, case or punctuation,
+        # or whose spelling and meanings are close. Clusters that are one exact group are left
+        # to find_duplicates.
+        def entries():
+            for count, entry in enumerate(self.iter_entries(), 1):
+                if count % report_every == 0:
+                    self.status_callback(self.translations.get(
+                        "near_duplicates_progress", "Checking for near-duplicates: {count} entries"
+                    ).format(count=count))
+                yield entry
+
+        clusters = NearDuplicateDetector().find_clusters(entries(), self.fetch_entries)
+        found = self.fetch_entries({entry_id for cluster in clusters for entry_id in cluster})
+        groups = []
+        for cluster in clusters:
+            headwords = [found[entry_id]['headword'] or "" for entry_id in cluster if entry_id in found]
+            if len({headword.strip().lower() for headword in headwords}) > 1:
+                groups.append(headwords)
+        return sorted(groups, key=lambda headwords: min(headwords))
+
+    def map_duplicates(self):
+        # One row per duplicate entry, pointing at the lowest id sharing its normalized headword.
+        self.cursor.execute("DROP TABLE IF EXISTS temp.duplicate_map")
+        self.cursor.execute("CREATE TEMP TABLE duplicate_map (duplicate_id INTEGER PRIMARY KEY, master_id INTEGER)")
+        self.cursor.execute('''
+            INSERT INTO duplicate_map (duplicate_id, master_id)
+            SELECT id, master_id FROM (
+                SELECT id, MIN(id) OVER (PARTITION BY LOWER(TRIM(headword))) AS master_id FROM Entry
+            ) WHERE id != master_id''')
+        return self.cursor.rowcount
+
+    def refresh_duplicate_search_rows(self):
+        # With the triggers dropped, the affected full-text rows are fixed up in two statements.
+        if not self.search_index_available:
+            return
+        self.cursor.execute("DELETE FROM EntrySearch WHERE rowid IN (SELECT duplicate_id FROM duplicate_map)")
+        self.cursor.execute('''
+            UPDATE EntrySearch SET meaning =
+                (SELECT group_concat(meaning, char(10)) FROM Senses WHERE entry_id = EntrySearch.rowid)
+            WHERE rowid IN (SELECT DISTINCT master_id FROM duplicate_map)''')
+        for statement in SEARCH_TRIGGERS.values():
+            self.cursor.execute(statement)
+
+    def drop_tracking_triggers(self):
+        # Per-row triggers would rebuild a master's full-text row once per moved sense;
+        # the set-based duplicate operations fix up the index and change log themselves.
+        for name in list(SEARCH_TRIGGERS) + list(CHANGE_TRIGGERS):
+            self.cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    def record_duplicate_changes(self):
+        # Fixes up the search index and change log for the mapped duplicates, then restores
+        # the per-row triggers.
+        self.refresh_duplicate_search_rows()
+        log_changes(self.cursor, "SELECT duplicate_id, 'delete' FROM duplicate_map")
+        for statement in CHANGE_TRIGGERS.values():
+            self.cursor.execute(statement)
+
+    def merge_duplicates(self):
+        try:
+            self.map_duplicates()
+            self.drop_tracking_triggers()
+            self.cursor.execute("SELECT COUNT(*) FROM Senses WHERE entry_id IN (SELECT duplicate_id FROM duplicate_map)")
+            senses = self.cursor.fetchone()[0]
+            # Moved senses follow the master's own, in entry id then sense order.
+            self.cursor.execute('''
+                UPDATE Senses SET entry_id = moved.master_id, position = moved.position FROM (
+                    SELECT Senses.id, groups.master_id,
+                           ROW_NUMBER() OVER (PARTITION BY groups.master_id
+                                              ORDER BY Senses.entry_id, Senses.position, Senses.id) - 1 AS position
+                    FROM Senses JOIN (
+                        SELECT duplicate_id AS entry_id, master_id FROM duplicate_map
+                        UNION SELECT master_id, master_id FROM duplicate_map
+                    ) AS groups ON groups.entry_id = Senses.entry_id
+                ) AS moved WHERE moved.id = Senses.id''')
+            self.cursor.execute("DELETE FROM Entry WHERE id IN (SELECT duplicate_id FROM duplicate_map)")
+            entries = self.cursor.rowcount
+            log_changes(self.cursor, "SELECT DISTINCT master_id, 'upsert' FROM duplicate_map")
+            self.record_duplicate_changes()
+            self.cursor.execute("DROP TABLE temp.duplicate_map")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.fuzzy_index.clear()
+        self.entry_cache.clear()
+        return {"entries": entries, "senses": senses}
+
+    def delete_duplicates(self):
+        try:
+            self.map_duplicates()
+            self.drop_tracking_triggers()
+            self.cursor.execute("DELETE FROM Senses WHERE entry_id IN (SELECT duplicate_id FROM duplicate_map)")
+            senses = self.cursor.rowcount
+            self.cursor.execute("DELETE FROM Entry WHERE id IN (SELECT duplicate_id FROM duplicate_map)")
+            entries = self.cursor.rowcount
+            self.record_duplicate_changes()
+            self.cursor.execute("DROP TABLE temp.duplicate_map")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.fuzzy_index.clear()
+        self.entry_cache.clear()
+        return {"entries": entries, "senses": senses}
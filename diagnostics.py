@@ -0,0 +1,246 @@
+import json, logging, math, sqlite3, threading, time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+DIAGNOSTICS_LOG = "diagnostics.log"
+LOG_MAX_BYTES = 1 << 20
+LOG_BACKUPS = 3
+SLOW_QUERY_MS = 50
+# Per operation, only the latest timings feed the percentiles.
+SAMPLES_KEPT = 1000
+SLOW_QUERIES_KEPT = 50
+PLANNED_STATEMENTS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of an already sorted list.
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(math.ceil(fraction * len(values)) - 1, 0))]
+
+
+def statement_key(sql):
+    # Whitespace-insensitive, so a statement written over several lines aggregates as one.
+    return " ".join(sql.split())
+
+
+def format_plan(rows):
+    # EXPLAIN QUERY PLAN rows are (id, parent, notused, detail); indent children under parents.
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return "\n".join(lines)
+
+
+class TimedCursor(sqlite3.Cursor):
+    # Times a statement from execute until its rows have been fetched or iterated over,
+    # then reports it.
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.diagnostics = None
+        self.pending = None
+
+    def execute(self, sql, parameters=()):
+        self.finish()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            # Writes report the rows they changed; queries count the rows as they are fetched.
+            changed = self.rowcount if self.description is None else 0
+            self.pending = [sql, parameters, time.perf_counter() - started, max(changed, 0)]
+            self.diagnostics.pending_cursors().add(self)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.finish()
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # No plan for these: there is no single parameter set to explain.
+            self.pending = [sql, None, time.perf_counter() - started, max(self.rowcount, 0)]
+            self.finish()
+
+    def fetchone(self):
+        row = self.timed_fetch(super().fetchone)
+        if row is None:
+            self.finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.timed_fetch(lambda: super(TimedCursor, self).fetchmany(size or self.arraysize))
+        if not rows:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self.timed_fetch(super().fetchall)
+        self.finish()
+        return rows
+
+    def __next__(self):
+        try:
+            return self.timed_fetch(super().__next__)
+        except StopIteration:
+            self.finish()
+            raise
+
+    def timed_fetch(self, fetch):
+        started = time.perf_counter()
+        result = fetch()
+        if self.pending:
+            self.pending[2] += time.perf_counter() - started
+            self.pending[3] += len(result) if isinstance(result, list) else int(result is not None)
+        return result
+
+    def finish(self):
+        if self.pending:
+            sql, parameters, seconds, rows = self.pending
+            self.pending = None
+            self.diagnostics.pending_cursors().discard(self)
+            self.diagnostics.record_statement(self.connection, sql, parameters, seconds, rows)
+
+
+class Diagnostics:
+    # Opt-in instrumentation shared by the GUI's DatabaseManager and its workers: statement
+    # timings from TimedCursor, statement counts from SQLite's trace callback (which also
+    # sees trigger and full-text index internals), and timed spans around user-level
+    # operations. Spans and slow queries go to a rotating JSON Lines log as well as to the
+    # in-memory summary.
+    def __init__(self, enabled=False, slow_query_ms=SLOW_QUERY_MS, log_path=DIAGNOSTICS_LOG):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.logger = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.samples = defaultdict(lambda: deque(maxlen=SAMPLES_KEPT))
+            self.span_counts = defaultdict(int)
+            self.span_statements = defaultdict(int)
+            self.statements = {}
+            self.slow_queries = deque(maxlen=SLOW_QUERIES_KEPT)
+            self.plans = {}
+
+    def cursor(self, conn):
+        # The cursor a DatabaseManager should use on conn under the current setting.
+        if not self.enabled:
+            conn.set_trace_callback(None)
+            return conn.cursor()
+        conn.set_trace_callback(self.trace)
+        cursor = conn.cursor(TimedCursor)
+        cursor.diagnostics = self
+        return cursor
+
+    def pending_cursors(self):
+        # This thread's cursors whose last statement has not been recorded yet.
+        if not hasattr(self.local, "cursors"):
+            self.local.cursors = set()
+        return self.local.cursors
+
+    def log(self, record):
+        if self.logger is None:
+            # Imported here: most sessions never enable diagnostics, and startup need not pay for it.
+            from logging.handlers import RotatingFileHandler
+            self.logger = logging.getLogger("nalluri.diagnostics")
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(self.log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                          encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+        self.logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    def trace(self, sql):
+        # SQLite prefixes statements run inside triggers and virtual tables (the FTS5
+        # shadow tables) with "--".
+        current = getattr(self.local, "span", None)
+        if current is not None:
+            current["statements"] += 1
+            if sql.startswith("--"):
+                current["nested_statements"] += 1
+
+    @contextmanager
+    def span(self, operation, **details):
+        if not self.enabled:
+            yield None
+            return
+        parent = getattr(self.local, "span", None)
+        current = {"operation": operation, **details, "statements": 0, "nested_statements": 0,
+                   "sql_seconds": 0.0, "rows": 0}
+        self.local.span = current
+        started = time.perf_counter()
+        try:
+            yield current
+        except BaseException:
+            current["failed"] = True
+            raise
+        finally:
+            # Statements whose rows were not fetched to the end still belong to this span.
+            for cursor in list(self.pending_cursors()):
+                cursor.finish()
+            self.local.span = parent
+            current["seconds"] = round(time.perf_counter() - started, 6)
+            current["sql_seconds"] = round(current["sql_seconds"], 6)
+            with self.lock:
+                self.samples[operation].append(current["seconds"])
+                self.span_counts[operation] += 1
+                self.span_statements[operation] += current["statements"]
+            self.log({"type": "span", "time": time.time(), **current})
+
+    def record_statement(self, conn, sql, parameters, seconds, rows):
+        key = statement_key(sql)
+        current = getattr(self.local, "span", None)
+        if current is not None:
+            current["sql_seconds"] += seconds
+            current["rows"] += rows
+        with self.lock:
+            stats = self.statements.setdefault(key, {"count": 0, "seconds": 0.0, "max": 0.0, "rows": 0})
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["rows"] += rows
+        if seconds * 1000 < self.slow_query_ms:
+            return
+        query = {"type": "slow_query", "time": time.time(), "sql": key, "seconds": round(seconds, 6), "rows": rows,
+                 "operation": current["operation"] if current else None, "plan": self.plan(conn, key, sql, parameters)}
+        with self.lock:
+            self.slow_queries.append(query)
+        self.log(query)
+
+    def plan(self, conn, key, sql, parameters):
+        # Captured once per statement; the plan rarely depends on the parameter values.
+        # Explained outside the lock, so two threads may both explain it; the first one is kept.
+        with self.lock:
+            if key in self.plans or parameters is None or not key.upper().startswith(PLANNED_STATEMENTS):
+                return self.plans.get(key)
+        try:
+            plan = format_plan(conn.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall())
+        except sqlite3.Error as e:
+            plan = f"(no plan: {e})"
+        with self.lock:
+            return self.plans.setdefault(key, plan)
+
+    def summary(self, top=20):
+        with self.lock:
+            operations = []
+            for operation, samples in sorted(self.samples.items()):
+                values = sorted(samples)
+                operations.append({
+                    "operation": operation,
+                    "count": self.span_counts[operation],
+                    "p50": percentile(values, 0.5),
+                    "p95": percentile(values, 0.95),
+                    "max": values[-1],
+                    "statements": self.span_statements[operation] / self.span_counts[operation],
+                })
+            statements = sorted(
+                ({"sql": sql, **stats} for sql, stats in self.statements.items()),
+                key=lambda stats: stats["seconds"], reverse=True
+            )[:top]
+            return {"operations": operations, "statements": statements, "slow_queries": list(self.slow_queries)}
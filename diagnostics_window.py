@@ -0,0 +1,109 @@
+import os
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QLabel, QSpinBox, QTableWidget, QTableWidgetItem,
+    QTextEdit, QPushButton, QSplitter, QHeaderView
+)
+from PyQt5.QtCore import Qt
+
+
+class DiagnosticsWindow(QDialog):
+    # Shows what the shared Diagnostics instance has recorded: p50/p95 per operation, the
+    # statements taking the most time, and the slow queries with their plans.
+    def __init__(self, db_manager, translations, on_changed, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.translations = translations
+        self.on_changed = on_changed
+        diagnostics = db_manager.diagnostics
+        self.setWindowTitle(translations.get("diagnostics_title", "Diagnostics"))
+        self.setMinimumSize(800, 600)
+        layout = QVBoxLayout(self)
+
+        options = QHBoxLayout()
+        self.enabled_checkbox = QCheckBox(translations.get("diagnostics_enabled", "Record timings"))
+        self.enabled_checkbox.setChecked(diagnostics.enabled)
+        self.enabled_checkbox.toggled.connect(self.toggle)
+        options.addWidget(self.enabled_checkbox)
+        options.addWidget(QLabel(translations.get("diagnostics_slow_query", "Slow query threshold (ms):")))
+        self.slow_query_spin = QSpinBox()
+        self.slow_query_spin.setRange(1, 60000)
+        self.slow_query_spin.setValue(diagnostics.slow_query_ms)
+        self.slow_query_spin.valueChanged.connect(self.set_slow_query_ms)
+        options.addWidget(self.slow_query_spin)
+        options.addStretch()
+        layout.addLayout(options)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.operations_table = self.make_table(["operation", "count", "p50 (ms)", "p95 (ms)", "max (ms)", "statements"])
+        splitter.addWidget(self.operations_table)
+        self.statements_table = self.make_table(["statement", "count", "total (ms)", "max (ms)", "rows"])
+        splitter.addWidget(self.statements_table)
+        self.slow_queries_text = QTextEdit()
+        self.slow_queries_text.setReadOnly(True)
+        splitter.addWidget(self.slow_queries_text)
+        layout.addWidget(splitter)
+
+        self.log_label = QLabel(translations.get("diagnostics_log", "Log: {path}").format(
+            path=os.path.abspath(diagnostics.log_path)))
+        self.log_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.log_label)
+
+        buttons = QHBoxLayout()
+        self.refresh_button = QPushButton(translations.get("diagnostics_refresh", "Refresh"))
+        self.refresh_button.clicked.connect(self.refresh)
+        buttons.addWidget(self.refresh_button)
+        self.reset_button = QPushButton(translations.get("diagnostics_reset", "Reset"))
+        self.reset_button.clicked.connect(self.reset)
+        buttons.addWidget(self.reset_button)
+        buttons.addStretch()
+        self.close_button = QPushButton(translations.get("close", "Close"))
+        self.close_button.clicked.connect(self.close)
+        buttons.addWidget(self.close_button)
+        layout.addLayout(buttons)
+        self.refresh()
+
+    def make_table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        return table
+
+    def fill_table(self, table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value if isinstance(value, str) else f"{value:g}")
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+
+    def refresh(self):
+        summary = self.db_manager.diagnostics.summary()
+        self.fill_table(self.operations_table, [
+            (op["operation"], op["count"], round(op["p50"] * 1000, 1), round(op["p95"] * 1000, 1),
+             round(op["max"] * 1000, 1), round(op["statements"], 1))
+            for op in summary["operations"]
+        ])
+        self.fill_table(self.statements_table, [
+            (stats["sql"], stats["count"], round(stats["seconds"] * 1000, 1), round(stats["max"] * 1000, 1), stats["rows"])
+            for stats in summary["statements"]
+        ])
+        self.slow_queries_text.setPlainText("\n\n".join(
+            f"{query['seconds'] * 1000:.1f} ms, {query['rows']} rows"
+            f"{' (' + query['operation'] + ')' if query['operation'] else ''}\n{query['sql']}"
+            f"{chr(10) + query['plan'] if query['plan'] else ''}"
+            for query in reversed(summary["slow_queries"])
+        ))
+
+    def toggle(self, enabled):
+        self.db_manager.set_diagnostics(enabled)
+        self.on_changed()
+
+    def set_slow_query_ms(self, value):
+        self.db_manager.diagnostics.slow_query_ms = value
+        self.on_changed()
+
+    def reset(self):
+        self.db_manager.diagnostics.reset()
+        self.refresh()
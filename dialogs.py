@@ -0,0 +1,97 @@
+import os
+from PyQt5.QtWidgets import (
+    QMessageBox, QFileDialog, QInputDialog, QDialog, QVBoxLayout, QLabel, QComboBox, QCheckBox, QDialogButtonBox
+)
+from database import DatabaseError
+from import_export import IMPORT_MODES
+
+IMPORT_MODE_LABELS = {
+    "append": "Add them as new entries (may create duplicates)",
+    "skip": "Skip them",
+    "merge": "Add their new senses to the existing entry",
+    "replace": "Replace the existing entry",
+}
+
+
+class Dialogs:
+    # The file pickers and prompts in front of DatabaseManager and ImportExportManager,
+    # which themselves run without Qt.
+    def __init__(self, translations):
+        self.translations = translations
+
+    def show_error(self, parent, error):
+        QMessageBox.critical(parent, error.title, str(error))
+
+    def create_database(self, parent, db_manager):
+        db_name, ok = QInputDialog.getText(
+            parent,
+            self.translations.get("new_db", "New Database"),
+            self.translations.get("enter_db_name", "Enter database name:")
+        )
+        if not ok or not db_name:
+            return None
+        try:
+            db_name = db_manager.create_database(db_name)
+        except DatabaseError as e:
+            self.show_error(parent, e)
+            return None
+        db_manager.save_last_db(db_name)
+        return db_name
+
+    def load_database(self, parent, db_manager, db_name=None):
+        if not db_name:
+            db_name, _ = QFileDialog.getOpenFileName(
+                parent,
+                self.translations.get("select_db", "Select Database"),
+                "",
+                self.translations.get("db_file_filter", "Database files (*.db);;All files (*.*)")
+            )
+        if not db_name or not os.path.exists(db_name):
+            return None
+        try:
+            db_manager.load_database(db_name)
+        except DatabaseError as e:
+            self.show_error(parent, e)
+            return None
+        db_manager.save_last_db(db_name)
+        return db_name
+
+    def ask_export_path(self, parent, title_key, title, filter_key, file_filter):
+        path, _ = QFileDialog.getSaveFileName(
+            parent,
+            self.translations.get(title_key, title),
+            "",
+            self.translations.get(filter_key, file_filter)
+        )
+        return path or None
+
+    def ask_import_path(self, parent, title_key, title, filter_key, file_filter):
+        path, _ = QFileDialog.getOpenFileName(
+            parent,
+            self.translations.get(title_key, title),
+            "",
+            self.translations.get(filter_key, file_filter)
+        )
+        return path or None
+
+    def ask_import_options(self, parent):
+        # Asks what happens to records whose headword already exists. Returns
+        # (mode, match_pos), or None if cancelled.
+        dialog = QDialog(parent)
+        dialog.setWindowTitle(self.translations.get("confirm_import", "Confirm Import"))
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(QLabel(self.translations.get(
+            "import_mode_prompt", "Records whose headword is already in the dictionary:")))
+        modes = QComboBox()
+        for mode in IMPORT_MODES:
+            modes.addItem(self.translations.get(f"import_mode_{mode}", IMPORT_MODE_LABELS[mode]), mode)
+        layout.addWidget(modes)
+        match_pos = QCheckBox(self.translations.get("import_match_pos", "Match part of speech too"))
+        layout.addWidget(match_pos)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+        if dialog.exec_() != QDialog.Accepted:
+            return None
+        return modes.currentData(), match_pos.isChecked()
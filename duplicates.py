@@ -38,16 +38,20 @@ class DuplicatesWindow(QDialog):
             QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            # Assumes that the parent is the main window with a db_manager attribute.
-            if hasattr(self.parent(), 'db_manager'):
-                try:
-                    self.parent().db_manager.merge_duplicates()
-                    if hasattr(self.parent(), 'populate_headwords'):
-                        self.parent().populate_headwords()
-                    QMessageBox.information(self, "Merge Completed", "Duplicate entries have been merged successfully.")
-                    self.close()
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"An error occurred while merging duplicates:\n{e}")
+            # Assumes that the parent is the main window with a run_job method.
+            if hasattr(self.parent(), 'run_job'):
+                self.set_busy(True)
+                job = self.parent().run_job(
+                    lambda job, db: db.merge_duplicates(),
+                    on_finished=self.merge_finished,
+                    error_key="merge_failed",
+                    error_default="An error occurred while merging duplicates:\n{error_message}"
+                )
+                if job:
+                    job.signals.failed.connect(lambda message: self.set_busy(False))
+                    job.signals.cancelled.connect(lambda: self.set_busy(False))
+                else:
+                    self.set_busy(False)
             else:
                 QMessageBox.critical(self, "Error", "Database manager not available.")
 
@@ -60,14 +64,42 @@ class DuplicatesWindow(QDialog):
             QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            if hasattr(self.parent(), 'db_manager'):
-                try:
-                    self.parent().db_manager.delete_duplicates()
-                    if hasattr(self.parent(), 'populate_headwords'):
-                        self.parent().populate_headwords()
-                    QMessageBox.information(self, "Deletion Completed", "Duplicate entries have been deleted successfully.")
-                    self.close()
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"An error occurred while deleting duplicates:\n{e}")
+            if hasattr(self.parent(), 'run_job'):
+                self.set_busy(True)
+                job = self.parent().run_job(
+                    lambda job, db: db.delete_duplicates(),
+                    on_finished=self.delete_finished,
+                    error_key="delete_duplicates_failed",
+                    error_default="An error occurred while deleting duplicates:\n{error_message}"
+                )
+                if job:
+                    job.signals.failed.connect(lambda message: self.set_busy(False))
+                    job.signals.cancelled.connect(lambda: self.set_busy(False))
+                else:
+                    self.set_busy(False)
             else:
                 QMessageBox.critical(self, "Error", "Database manager not available.")
+
+    def set_busy(self, busy):
+        self.merge_button.setEnabled(not busy)
+        self.delete_button.setEnabled(not busy)
+
+    def merge_finished(self, result):
+        if hasattr(self.parent(), 'populate_headwords'):
+            self.parent().populate_headwords()
+        QMessageBox.information(
+            self, "Merge Completed",
+            "Duplicate entries have been merged successfully.\n"
+            f"{result['entries']} entries removed, {result['senses']} senses moved."
+        )
+        self.close()
+
+    def delete_finished(self, result):
+        if hasattr(self.parent(), 'populate_headwords'):
+            self.parent().populate_headwords()
+        QMessageBox.information(
+            self, "Deletion Completed",
+            "Duplicate entries have been deleted successfully.\n"
+            f"{result['entries']} entries and {result['senses']} senses deleted."
+        )
+        self.close()
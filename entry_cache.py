@@ -0,0 +1,37 @@
+import threading
+from collections import OrderedDict
+
+ENTRY_CACHE_SIZE = 512
+
+
+class EntryCache:
+    # Least-recently-used map of entry id -> entry dict. Background jobs invalidate it
+    # from their own threads, hence the lock.
+    def __init__(self, max_size=ENTRY_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, entry_id):
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            if entry is not None:
+                self.entries.move_to_end(entry_id)
+            return entry
+
+    def put(self, entry_id, entry):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[entry_id] = entry
+            self.entries.move_to_end(entry_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, entry_id):
+        with self.lock:
+            self.entries.pop(entry_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,112 @@
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+# kind is "inserted", "updated" or "deleted"; senses counts the rows written per operation.
+EntryChange = namedtuple("EntryChange", "kind entry_id headword senses")
+
+ENTRY_COLUMNS = ("headword", "variation", "part_of_speech", "notes")
+
+
+def diff_senses(old, new):
+    # old is [(sense id, meaning)] in display order, new the edited meanings. Returns the
+    # row operations that turn one into the other while keeping unchanged rows (and their
+    # ids) in place: ("keep" | "update", id, meaning, position), ("insert", None, meaning,
+    # position) and ("delete", id, None, None).
+    operations = []
+    matcher = SequenceMatcher(None, [meaning for _, meaning in old], new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            operations.extend(("keep", old[i][0], new[j], j) for i, j in zip(range(i1, i2), range(j1, j2)))
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        operations.extend(("update", old[i1 + k][0], new[j1 + k], j1 + k) for k in range(paired))
+        operations.extend(("insert", None, new[j], j) for j in range(j1 + paired, j2))
+        operations.extend(("delete", old[i][0], None, None) for i in range(i1 + paired, i2))
+    return operations
+
+
+class EntryService:
+    # Writes single-entry edits as the smallest set of row changes, in one transaction,
+    # then tells its listeners exactly which entry changed.
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def save_entry(self, entry_id, headword, variation, part_of_speech, notes, meanings):
+        values = (headword, variation, part_of_speech, notes)
+        sort_key = self.db_manager.collation.sort_key(headword)
+        meanings = [meaning.strip() for meaning in meanings]
+        conn, cursor = self.db_manager.conn, self.db_manager.cursor
+        try:
+            if entry_id:
+                kind = "updated"
+                cursor.execute("SELECT headword, variation, part_of_speech, notes FROM Entry WHERE id=?", (entry_id,))
+                if cursor.fetchone() != values:
+                    cursor.execute(
+                        "UPDATE Entry SET headword=?, variation=?, part_of_speech=?, notes=?, sort_key=? WHERE id=?",
+                        values + (sort_key, entry_id)
+                    )
+                senses = self.write_senses(entry_id, meanings)
+            else:
+                kind = "inserted"
+                cursor.execute(
+                    "INSERT INTO Entry (headword, variation, part_of_speech, notes, sort_key) VALUES (?, ?, ?, ?, ?)",
+                    values + (sort_key,)
+                )
+                entry_id = cursor.lastrowid
+                senses = self.write_senses(entry_id, meanings)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.db_manager.entry_cache.invalidate(entry_id)
+        self.db_manager.fuzzy_index.update_entry(entry_id, headword, part_of_speech, variation, meanings)
+        return self.notify(EntryChange(kind, entry_id, headword, senses))
+
+    def delete_entry(self, entry_id):
+        conn, cursor = self.db_manager.conn, self.db_manager.cursor
+        try:
+            cursor.execute("DELETE FROM Senses WHERE entry_id=?", (entry_id,))
+            senses = {"deleted": cursor.rowcount}
+            cursor.execute("DELETE FROM Entry WHERE id=?", (entry_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.db_manager.entry_cache.invalidate(entry_id)
+        self.db_manager.fuzzy_index.remove_entry(entry_id)
+        return self.notify(EntryChange("deleted", entry_id, None, senses))
+
+    def write_senses(self, entry_id, meanings):
+        cursor = self.db_manager.cursor
+        cursor.execute("SELECT id, meaning, position FROM Senses WHERE entry_id=? ORDER BY position, id", (entry_id,))
+        rows = cursor.fetchall()
+        positions = {sense_id: position for sense_id, _, position in rows}
+        counts = {"kept": 0, "inserted": 0, "updated": 0, "deleted": 0, "moved": 0}
+        for operation, sense_id, meaning, position in diff_senses([row[:2] for row in rows], meanings):
+            if operation == "delete":
+                cursor.execute("DELETE FROM Senses WHERE id=?", (sense_id,))
+                counts["deleted"] += 1
+            elif operation == "insert":
+                cursor.execute(
+                    "INSERT INTO Senses (entry_id, meaning, position) VALUES (?, ?, ?)", (entry_id, meaning, position)
+                )
+                counts["inserted"] += 1
+            elif operation == "update":
+                cursor.execute("UPDATE Senses SET meaning=?, position=? WHERE id=?", (meaning, position, sense_id))
+                counts["updated"] += 1
+            elif positions[sense_id] != position:
+                # Only the position changed, which the full-text trigger ignores.
+                cursor.execute("UPDATE Senses SET position=? WHERE id=?", (position, sense_id))
+                counts["moved"] += 1
+            else:
+                counts["kept"] += 1
+        return counts
+
+    def notify(self, change):
+        for listener in self.listeners:
+            listener(change)
+        return change
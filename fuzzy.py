@@ -0,0 +1,324 @@
+import re, threading
+from array import array
+from collections import defaultdict
+from difflib import SequenceMatcher
+from math import ceil, floor
+
+FUZZY_CUTOFF = 0.6
+FUZZY_FIELDS = ("headword", "part_of_speech", "variation", "meaning")
+# Longer senses are indexed by their words only; a whole sense this long could only reach
+# the cutoff against a query of more than twenty characters.
+MAX_SENSE_LENGTH = 48
+# A posting list kept as a bitmask once it holds at least one in this many of its bucket's terms.
+DENSE_RATIO = 32
+
+_WORD_RE = re.compile(r"\w+")
+_NONZERO_RE = re.compile(rb"[^\x00]")
+_FIELD_NUMBERS = {field: number for number, field in enumerate(FUZZY_FIELDS)}
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def normalize(text):
+    return (text or "").lower().strip()
+
+
+def occurrences(text):
+    # Each character as often as it has occurred so far: "ana" gives "a", "n", "aa". Two
+    # strings share as many of these as difflib's quick_ratio counts matching characters.
+    seen = {}
+    for char in text:
+        seen[char] = seen.get(char, "") + char
+        yield seen[char]
+
+
+def size_band(size, cutoff):
+    # Sizes b for which 2 * shared / (size + b) can reach the cutoff. The same bound
+    # applies to difflib's ratio over string lengths.
+    return ceil(size * cutoff / (2 - cutoff) - 1e-9), floor(size * (2 - cutoff) / cutoff + 1e-9)
+
+
+def at_least(masks, needed):
+    # The bits set in at least needed of masks. Counts are kept bit-sliced, counts[j]
+    # holding bit j of every position's count, so a mask is added with a few operations
+    # on whole ints.
+    counts = []
+    for mask in masks:
+        for j, bit in enumerate(counts):
+            if not mask:
+                break
+            counts[j], mask = bit ^ mask, bit & mask
+        if mask:
+            counts.append(mask)
+    above, equal = 0, -1
+    for j in range(max(len(counts), needed.bit_length()) - 1, -1, -1):
+        bit = counts[j] if j < len(counts) else 0
+        if needed >> j & 1:
+            equal &= bit
+        else:
+            above |= equal & bit
+            equal &= ~bit
+    return above | equal
+
+
+def set_bits(mask):
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    for match in _NONZERO_RE.finditer(data):
+        position = match.start()
+        for bit in _BYTE_BITS[data[position]]:
+            yield position * 8 + bit
+
+
+def common_length(masks, size, text):
+    # Length of the longest common subsequence of text and the query that masks (its
+    # characters' positions as bits) were made from, computed a row at a time on bits.
+    full = (1 << size) - 1
+    row = full
+    for char in text:
+        matched = row & masks.get(char, 0)
+        row = ((row + matched) | (row - matched)) & full
+    return size - bin(row).count("1")
+
+
+class _Terms:
+    # The distinct values of one field and the entries holding each: an id while there is
+    # one, a set once there are more. Values are bucketed by length, and each bucket has
+    # a posting list of slots per character occurrence, turned into a bitmask (and kept
+    # while it stays current) once it is dense, so a query counts shared characters for a
+    # whole bucket in a few int operations.
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+        self.entries = []
+        self.slots = defaultdict(lambda: array("I"))
+        self.postings = defaultdict(dict)
+        self.masks = {}
+
+    def add(self, value, entry_id):
+        term_id = self.ids.get(value)
+        if term_id is None:
+            term_id = len(self.values)
+            self.values.append(value)
+            self.ids[value] = term_id
+            self.entries.append(None)
+            slots = self.slots[len(value)]
+            bucket = self.postings[len(value)]
+            for feature in occurrences(value):
+                posting = bucket.get(feature)
+                if posting is None:
+                    posting = bucket[feature] = array("I")
+                posting.append(len(slots))
+            slots.append(term_id)
+        current = self.entries[term_id]
+        if current is None:
+            self.entries[term_id] = entry_id
+        elif isinstance(current, set):
+            current.add(entry_id)
+        elif current != entry_id:
+            self.entries[term_id] = {current, entry_id}
+        return term_id
+
+    def discard(self, term_id, entry_id):
+        current = self.entries[term_id]
+        if isinstance(current, set):
+            current.discard(entry_id)
+        elif current == entry_id:
+            self.entries[term_id] = None
+
+    def entry_ids(self, term_id):
+        current = self.entries[term_id]
+        if current is None or isinstance(current, set):
+            return current or ()
+        return (current,)
+
+    def candidates(self, term, cutoff):
+        # Terms sharing enough characters with term for quick_ratio to reach the cutoff.
+        # quick_ratio is never below ratio, so no match of get_close_matches is left out.
+        features = list(occurrences(term))
+        low, high = size_band(len(term), cutoff)
+        for length in range(low, high + 1):
+            slots = self.slots.get(length)
+            if not slots:
+                continue
+            needed = ceil(cutoff * (len(term) + length) / 2 - 1e-9)
+            masks = [mask for mask in (self._mask(length, feature) for feature in features) if mask]
+            if len(masks) < needed:
+                continue
+            for slot in set_bits(at_least(masks, needed)):
+                yield slots[slot]
+
+    def _mask(self, length, feature):
+        posting = self.postings[length].get(feature)
+        if not posting:
+            return 0
+        count, mask = self.masks.get((length, feature), (0, 0))
+        if count < len(posting):
+            # Postings are only appended to, so a kept mask needs just the newer slots.
+            bits = bytearray(posting[-1] // 8 + 1)
+            for slot in posting[count:]:
+                bits[slot >> 3] |= 1 << (slot & 7)
+            mask |= int.from_bytes(bits, "little")
+            if len(posting) * DENSE_RATIO >= len(self.slots[length]):
+                self.masks[length, feature] = len(posting), mask
+        return mask
+
+
+# Character index over distinct normalized field values, one per field. A query's
+# candidates are the values difflib's quick_ratio would let through; a longest common
+# subsequence, which bounds ratio from above as well, rules out most of them, and the rest
+# are scored like difflib.get_close_matches. search returns each matching entry with the
+# best ratio of its values.
+#
+# One index is shared by the GUI thread and the workers, so its tables are only touched
+# under lock. A build reads the database into tables of its own and swaps them in; edits
+# made meanwhile are kept in pending and replayed onto them first. Builds run one at a
+# time, and a build that clear() overtakes is thrown away and started again.
+class FuzzyIndex:
+    def __init__(self, cutoff=FUZZY_CUTOFF):
+        self.cutoff = cutoff
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.generation = 0
+        self.pending = None
+        self.built = False
+        self._reset()
+
+    def _reset(self):
+        self.fields = {field: _Terms() for field in FUZZY_FIELDS}
+        # Per entry, its terms as term_id * len(FUZZY_FIELDS) + field number.
+        self.entry_terms = defaultdict(lambda: array("I"))
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+            self.built = False
+            self._reset()
+
+    def build(self, cursor):
+        # Returns once the index is built, by this call or by one another thread was running.
+        with self.build_lock:
+            while not self.built:
+                with self.lock:
+                    generation = self.generation
+                    self.pending = {}
+                index = FuzzyIndex(self.cutoff)
+                try:
+                    index._load(cursor)
+                except BaseException:
+                    with self.lock:
+                        if generation == self.generation:
+                            self.pending = None
+                    raise
+                with self.lock:
+                    if generation == self.generation:
+                        for entry_id, values in self.pending.items():
+                            index._remove(entry_id)
+                            if values is not None:
+                                index._add_entry(entry_id, *values)
+                        self.pending = None
+                        self.fields, self.entry_terms = index.fields, index.entry_terms
+                        self.built = True
+
+    def add_from_db(self, cursor, after_id=0):
+        # Entries an import added above after_id. A build still running may have read the
+        # table before they were there, so it starts over instead.
+        with self.lock:
+            if self.built:
+                self._load(cursor, after_id)
+            elif self.pending is not None:
+                self.generation += 1
+                self.pending = None
+
+    def update_entry(self, entry_id, headword, pos, variation, meanings):
+        with self.lock:
+            if self.built:
+                self._remove(entry_id)
+                self._add_entry(entry_id, headword, pos, variation, meanings)
+            elif self.pending is not None:
+                self.pending[entry_id] = (headword, pos, variation, list(meanings))
+
+    def remove_entry(self, entry_id):
+        with self.lock:
+            if self.built:
+                self._remove(entry_id)
+            elif self.pending is not None:
+                self.pending[entry_id] = None
+
+    def search(self, term, fields=None):
+        term = normalize(term)
+        if not term:
+            return {}
+        with self.lock:
+            return self._search(term, fields)
+
+    def _search(self, term, fields):
+        # Like get_close_matches, keep the query as seq2 so its b2j table is built once.
+        matcher = SequenceMatcher()
+        matcher.set_seq2(term)
+        masks = {}
+        for position, char in enumerate(term):
+            masks[char] = masks.get(char, 0) | 1 << position
+        scores = {}
+        matches = {}
+        for field in fields or FUZZY_FIELDS:
+            terms = self.fields[field]
+            for term_id in terms.candidates(term, self.cutoff):
+                entries, candidate = terms.entry_ids(term_id), terms.values[term_id]
+                if not entries:
+                    continue
+                if candidate not in scores:
+                    scores[candidate] = self._score(matcher, masks, candidate)
+                score = scores[candidate]
+                if score:
+                    for entry_id in entries:
+                        if score > matches.get(entry_id, 0):
+                            matches[entry_id] = score
+        return matches
+
+    def _load(self, cursor, after_id=0):
+        cursor.execute(
+            "SELECT id, headword, part_of_speech, variation FROM Entry WHERE id > ?", (after_id,)
+        )
+        for entry_id, headword, pos, variation in cursor:
+            self._add(entry_id, "headword", headword)
+            self._add(entry_id, "part_of_speech", pos)
+            self._add(entry_id, "variation", variation)
+        cursor.execute("SELECT entry_id, meaning FROM Senses WHERE entry_id > ?", (after_id,))
+        for entry_id, meaning in cursor:
+            self._add_meaning(entry_id, meaning)
+
+    def _add_entry(self, entry_id, headword, pos, variation, meanings):
+        self._add(entry_id, "headword", headword)
+        self._add(entry_id, "part_of_speech", pos)
+        self._add(entry_id, "variation", variation)
+        for meaning in meanings:
+            self._add_meaning(entry_id, meaning)
+
+    def _remove(self, entry_id):
+        for term in self.entry_terms.pop(entry_id, ()):
+            term_id, number = divmod(term, len(FUZZY_FIELDS))
+            self.fields[FUZZY_FIELDS[number]].discard(term_id, entry_id)
+
+    def _add_meaning(self, entry_id, meaning):
+        # Whole senses rarely score 0.6 against a short query, so their words are indexed too.
+        meaning = normalize(meaning)
+        if len(meaning) <= MAX_SENSE_LENGTH:
+            self._add(entry_id, "meaning", meaning)
+        for word in set(_WORD_RE.findall(meaning)):
+            self._add(entry_id, "meaning", word)
+
+    def _add(self, entry_id, field, value):
+        value = normalize(value)
+        if value:
+            term_id = self.fields[field].add(value, entry_id)
+            self.entry_terms[entry_id].append(term_id * len(FUZZY_FIELDS) + _FIELD_NUMBERS[field])
+
+    def _score(self, matcher, masks, candidate):
+        # The ratio, or 0 below the cutoff. ratio counts the characters of matching blocks,
+        # which form a common subsequence, so the longest one is an upper bound.
+        total = len(matcher.b) + len(candidate)
+        if 2.0 * common_length(masks, len(matcher.b), candidate) / total < self.cutoff:
+            return 0
+        matcher.set_seq1(candidate)
+        ratio = matcher.ratio()
+        return ratio if ratio >= self.cutoff else 0
@@ -0,0 +1,149 @@
+from bisect import bisect_left
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+
+ENTRY_ID_ROLE = Qt.UserRole
+
+
+class HeadwordListModel(QAbstractListModel):
+    def __init__(self, page_size=500, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        # Rows are (key, entry id) pairs, kept in the same order as the page query: the
+        # headword's sort key in the ordered list, the headword itself for result lists.
+        self.rows = []
+        self.headwords = {}
+        self.sort_key = None
+        self.fetch_page = None
+        self.fetch_before = None
+        self.start = None
+        self.exhausted = True
+        self.ordered = True
+
+    def reset(self, fetch_page=None, sort_key=None, fetch_before=None, start=None):
+        # fetch_page(after, limit) returns the (id, headword, sort key) rows that follow the
+        # row key `after`; sort_key(headword) places entries saved while the list is shown.
+        # With a start key the list begins there instead of at the top, and
+        # fetch_before(before, limit) pages in the rows above it, nearest first.
+        self.beginResetModel()
+        self.rows = []
+        self.headwords = {}
+        self.sort_key = sort_key
+        self.fetch_page = fetch_page
+        self.fetch_before = fetch_before if start is not None else None
+        self.start = start
+        self.exhausted = fetch_page is None
+        self.ordered = True
+        self.endResetModel()
+
+    def set_rows(self, rows, fetch_page=None):
+        # Result lists (e.g. ranked search hits) are shown as given. If fetch_page is set,
+        # further pages come from fetch_page(offset, limit) as the view scrolls.
+        self.beginResetModel()
+        self.rows = [(headword or "", entry_id) for entry_id, headword, *_ in rows]
+        self.headwords = {entry_id: headword for headword, entry_id in self.rows}
+        self.fetch_page = fetch_page
+        self.fetch_before = None
+        self.exhausted = fetch_page is None
+        self.ordered = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        entry_id = self.rows[index.row()][1]
+        if role == Qt.DisplayRole:
+            return self.headwords[entry_id]
+        if role == ENTRY_ID_ROLE:
+            return entry_id
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        if self.ordered:
+            after = self.rows[-1] if self.rows else self.start
+        else:
+            after = len(self.rows)
+        page = self.fetch_page(after, self.page_size)
+        if len(page) < self.page_size:
+            self.exhausted = True
+        if page:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            for entry_id, headword, *rest in page:
+                self.rows.append(((rest[0] or b"") if self.ordered else (headword or ""), entry_id))
+                self.headwords[entry_id] = headword or ""
+            self.endInsertRows()
+
+    def can_fetch_before(self):
+        return self.fetch_before is not None and bool(self.rows)
+
+    def fetch_rows_before(self):
+        # Prepends the page above the first row; returns how many rows were added.
+        if not self.can_fetch_before():
+            return 0
+        page = self.fetch_before(self.rows[0], self.page_size)
+        if len(page) < self.page_size:
+            self.fetch_before = None
+        if page:
+            self.beginInsertRows(QModelIndex(), 0, len(page) - 1)
+            self.rows[0:0] = [(sort_key or b"", entry_id) for entry_id, headword, sort_key in reversed(page)]
+            self.headwords.update((entry_id, headword or "") for entry_id, headword, sort_key in page)
+            self.endInsertRows()
+        return len(page)
+
+    def insert_entry(self, entry_id, headword):
+        if not self.ordered:
+            return
+        key = (self.sort_key(headword), entry_id)
+        row = bisect_left(self.rows, key)
+        if row == len(self.rows) and not self.exhausted:
+            # Past the loaded pages; it will arrive with a later fetchMore.
+            return
+        if row == 0 and self.fetch_before is not None:
+            # Above the loaded pages; likewise for fetch_rows_before.
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.rows.insert(row, key)
+        self.headwords[entry_id] = headword or ""
+        self.endInsertRows()
+
+    def remove_entry(self, entry_id):
+        row = self.row_of(entry_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        del self.headwords[entry_id]
+        self.endRemoveRows()
+
+    def update_entry(self, entry_id, headword):
+        row = self.row_of(entry_id)
+        if row is None:
+            self.insert_entry(entry_id, headword)
+        elif self.ordered:
+            self.remove_entry(entry_id)
+            self.insert_entry(entry_id, headword)
+        else:
+            self.rows[row] = (headword or "", entry_id)
+            self.headwords[entry_id] = headword or ""
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def row_of(self, entry_id):
+        if entry_id not in self.headwords:
+            return None
+        headword = self.headwords[entry_id]
+        if self.ordered:
+            row = bisect_left(self.rows, (self.sort_key(headword), entry_id))
+            if row < len(self.rows) and self.rows[row][1] == entry_id:
+                return row
+            # The stored key predates the collation in use; look the row up by id instead.
+            return next(row for row, (key, row_id) in enumerate(self.rows) if row_id == entry_id)
+        return self.rows.index((headword, entry_id))
@@ -1,171 +1,503 @@
-import json, csv, os, logging
-from PyQt5.QtWidgets import QMessageBox, QFileDialog
+import json, csv, os, logging, time, gzip, bz2, lzma, multiprocessing, shutil, tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain, islice
+from textwrap import indent
+from json_stream import iter_json_array, iter_json_lines
+from database import DatabaseManager, duplicate_key
+from entry_service import EntryService, ENTRY_COLUMNS
+from lookup_file import write_lookup_file
+
+IMPORT_BATCH_SIZE = 5000
+# What an import does with a record whose headword is already in the dictionary: add it
+# anyway, leave the existing entry alone, add its new senses to it, or overwrite it.
+IMPORT_MODES = ("append", "skip", "merge", "replace")
+EXPORT_FIELDS = ["id", "headword", "variation", "part_of_speech", "notes", "meanings"]
+# Exports and imports are compressed transparently when the file name asks for it.
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+# Sharded exports split the ids into this many ranges per worker process, so a worker
+# that finishes early picks up another range instead of idling.
+SHARDS_PER_WORKER = 4
+# Smaller ranges would cost more in process round trips than they save.
+SHARD_MIN_ENTRIES = 5000
+# Line endings of each export format, for its temporary shards as well.
+EXPORT_NEWLINES = {"csv": "", "json": None, "jsonl": None}
+
+
+def open_text(path, mode, newline=None):
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(path)[1].lower())
+    if opener:
+        return opener(path, mode + "t", encoding="utf-8", newline=newline)
+    return open(path, mode, encoding="utf-8", newline=newline)
+
+
+def escape_meaning(meaning):
+    # Only a meaning that would blur the ';;' separator (holding ';;', starting or ending
+    # with ';') or that holds a backslash is escaped; "to eat; to consume" is written as is.
+    if ";;" in meaning or meaning.startswith(";") or meaning.endswith(";") or "\\" in meaning:
+        return meaning.replace("\\", "\\\\").replace(";", "\\;")
+    return meaning
+
+
+def join_meanings(meanings):
+    # Meanings share one CSV cell separated by ';;'.
+    return ";;".join(escape_meaning(m) for m in meanings)
+
+
+def split_meanings(text):
+    if "\\" not in text:
+        return text.split(";;")
+    meanings, current, i = [], [], 0
+    while i < len(text):
+        if text[i] == "\\" and text[i + 1:i + 2] in ("\\", ";"):
+            current.append(text[i + 1])
+            i += 2
+        elif text.startswith(";;", i):
+            meanings.append("".join(current))
+            current = []
+            i += 2
+        else:
+            current.append(text[i])
+            i += 1
+    meanings.append("".join(current))
+    return meanings
+
+
+def import_key(headword, part_of_speech=None):
+    # Headwords match the way find_duplicates and merge_duplicates group them, so an import
+    # merges exactly what a later dedupe would. With part_of_speech given, homographs of
+    # different parts of speech stay separate entries.
+    key = duplicate_key(headword)
+    if part_of_speech is None:
+        return key
+    return key, duplicate_key(part_of_speech)
+
+
+def add_meanings(entry, meanings):
+    # Appends the meanings the entry does not have yet, in order.
+    for meaning in meanings:
+        meaning = meaning.strip()
+        if meaning not in entry["seen"]:
+            entry["seen"].add(meaning)
+            entry["meanings"].append(meaning)
+
+
+def write_csv(entries, f):
+    csv.writer(f).writerow(EXPORT_FIELDS)
+    write_csv_rows(entries, f)
+
+
+def write_csv_rows(entries, f):
+    writer = csv.writer(f)
+    for entry in entries:
+        writer.writerow([entry[field] for field in EXPORT_FIELDS[:-1]] + [join_meanings(entry['meanings'])])
+
+
+def write_json(entries, f):
+    # Same layout as json.dump(entries, indent=4), written one entry at a time.
+    entries = iter(entries)
+    first = next(entries, None)
+    if first is None:
+        f.write("[]")
+        return
+    f.write("[\n")
+    write_json_items(chain((first,), entries), f)
+    f.write("\n]")
+
+
+def write_json_items(entries, f):
+    # The elements of write_json's array, without the brackets around them.
+    separator = ""
+    for entry in entries:
+        f.write(separator)
+        f.write(indent(json.dumps(entry, indent=4, ensure_ascii=False), "    "))
+        separator = ",\n"
+
+
+def write_delta(changes, since, revision, f):
+    # JSON Lines: a header naming the revision range, then one record per changed entry,
+    # either the whole entry ("upsert") or just its id ("delete").
+    f.write(json.dumps({"delta": 1, "since": since, "revision": revision}))
+    f.write("\n")
+    for change_revision, operation, entry in changes:
+        f.write(json.dumps({"revision": change_revision, "op": operation, **entry}, ensure_ascii=False))
+        f.write("\n")
+
+
+def write_jsonl(entries, f):
+    for entry in entries:
+        f.write(json.dumps(entry, ensure_ascii=False))
+        f.write("\n")
+
+
+# Writers of a whole export file, and of the entries alone for joining shards into one.
+EXPORT_WRITERS = {"csv": write_csv, "json": write_json, "jsonl": write_jsonl}
+SHARD_WRITERS = {"csv": write_csv_rows, "json": write_json_items, "jsonl": write_jsonl}
+
+
+def part_path(path, number):
+    # words.csv.gz -> words.part-0001.csv.gz
+    root, compression = os.path.splitext(path)
+    if compression.lower() not in COMPRESSED_OPENERS:
+        root, compression = path, ""
+    root, ext = os.path.splitext(root)
+    return f"{root}.part-{number:04d}{ext}{compression}"
+
+
+def export_shard(db_name, fmt, id_range, path, complete):
+    # Runs in a worker process: writes the entries in id_range to path, as a complete
+    # export file or as the entries alone for join_shards. Returns how many it wrote.
+    db_manager = DatabaseManager({}, logging.info, 0)
+    db_manager.open_read_only(db_name)
+    count = 0
+
+    def entries():
+        nonlocal count
+        for entry in db_manager.iter_entries(id_range=id_range):
+            count += 1
+            yield entry
+    try:
+        if complete:
+            with open_text(path, "w", newline=EXPORT_NEWLINES[fmt]) as f:
+                EXPORT_WRITERS[fmt](entries(), f)
+        else:
+            with open(path, "w", encoding="utf-8", newline=EXPORT_NEWLINES[fmt]) as f:
+                SHARD_WRITERS[fmt](entries(), f)
+    finally:
+        db_manager.conn.close()
+    return count
+
+
+def join_shards(fmt, shard_paths, counts, path):
+    # Concatenates shards written by export_shard in order, framed like a single export.
+    newline = EXPORT_NEWLINES[fmt]
+    total = sum(counts)
+    with open_text(path, "w", newline=newline) as f:
+        if fmt == "csv":
+            csv.writer(f).writerow(EXPORT_FIELDS)
+        elif fmt == "json":
+            f.write("[\n" if total else "[]")
+        separator = ""
+        for shard_path, count in zip(shard_paths, counts):
+            if not count:
+                continue
+            if fmt == "json":
+                f.write(separator)
+                separator = ",\n"
+            with open(shard_path, "r", encoding="utf-8", newline=newline) as shard:
+                shutil.copyfileobj(shard, f)
+        if fmt == "json" and total:
+            f.write("\n]")
+
 
 class ImportExportManager:
-    def __init__(self, db_manager, translations, status_callback):
+    def __init__(self, db_manager, translations, status_callback, batch_size=IMPORT_BATCH_SIZE):
         self.db_manager = db_manager
         self.translations = translations
         self.status_callback = status_callback
+        self.batch_size = batch_size
 
-    def export_csv(self, parent):
-        path, _ = QFileDialog.getSaveFileName(
-            parent, 
-            self.translations.get("export_csv", "Export CSV"),
-            self.translations.get("csv_file_filter", "CSV files (*.csv);;All files (*.*)")
-        )
-        if not path:
-            return
-        try:
-            self.db_manager.cursor.execute('''
-                SELECT Entry.*, GROUP_CONCAT(Senses.meaning, ';;') AS meanings 
-                FROM Entry 
-                LEFT JOIN Senses ON Entry.id = Senses.entry_id 
-                GROUP BY Entry.id
-            ''')
-            entries = self.db_manager.cursor.fetchall()
-            headers = [description[0] for description in self.db_manager.cursor.description]
-            with open(path, "w", newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(headers)
-                for row in entries:
-                    writer.writerow(row)
-            self.status_callback(self.translations.get("csv_exported", "CSV exported successfully"))
-        except Exception as e:
-            QMessageBox.critical(
-                parent,
-                self.translations.get("error", "Error"),
-                self.translations.get("csv_failed", "CSV export failed: {error_message}").format(error_message=e)
-            )
+    def bulk_import(self, records, mode="append", match_pos=False):
+        # Ids are assigned here rather than read back through lastrowid, so each batch
+        # goes to SQLite as a few executemany calls.
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Unknown import mode: {mode}")
+        cursor = self.db_manager.cursor
+        counts = {"added": 0, "merged": 0, "replaced": 0, "skipped": 0}
+        started = time.perf_counter()
+        records = iter(records)
+        # Matching modes read the senses of the entries they update batch by batch.
+        keep_indexes = () if mode == "append" else ("idx_senses_entry_id",)
+        with self.db_manager.bulk_load(keep_indexes) as last_id:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM Senses")
+            next_ids = [last_id, cursor.fetchone()[0]]
+            keys = None if mode == "append" else self.existing_keys(match_pos)
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                if keys is None:
+                    self.append_batch(batch, next_ids)
+                    counts["added"] += len(batch)
+                else:
+                    self.upsert_batch(batch, next_ids, keys, mode, match_pos, last_id, counts)
+                count = sum(counts.values())
+                rate = count / max(time.perf_counter() - started, 1e-9)
+                self.status_callback(
+                    self.translations.get("import_progress", "Importing... {count} entries ({rate:.0f} rows/s)").format(count=count, rate=rate)
+                )
+        if counts["merged"] or counts["replaced"]:
+            self.db_manager.fuzzy_index.clear()
+        else:
+            # Added rows only ever get ids above the previous maximum.
+            self.db_manager.fuzzy_index.add_from_db(cursor, last_id)
+        return counts, sum(counts.values()) / max(time.perf_counter() - started, 1e-9)
 
-    def export_json(self, parent):
-        path, _ = QFileDialog.getSaveFileName(
-            parent, 
-            self.translations.get("export_json", "Export JSON"),
-            self.translations.get("json_file_filter", "JSON files (*.json);;All files (*.*)")
+    def append_batch(self, batch, next_ids):
+        entry_id, sense_id = next_ids
+        entries, senses = [], []
+        for item in batch:
+            entry_id += 1
+            entries.append((entry_id,) + tuple(item.get(field, '') for field in ENTRY_COLUMNS))
+            for position, meaning in enumerate(item.get('meanings') or []):
+                sense_id += 1
+                senses.append((sense_id, entry_id, meaning.strip(), position))
+        self.write_batch(entries, senses)
+        next_ids[:] = entry_id, sense_id
+
+    def existing_keys(self, match_pos):
+        # Built once per import; where the database already holds duplicates the oldest
+        # entry is the one updated.
+        keys = {}
+        self.db_manager.cursor.execute("SELECT id, headword, part_of_speech FROM Entry ORDER BY id")
+        for entry_id, headword, part_of_speech in self.db_manager.cursor:
+            keys.setdefault(import_key(headword or '', (part_of_speech or '') if match_pos else None), entry_id)
+        return keys
+
+    def upsert_batch(self, batch, next_ids, keys, mode, match_pos, last_id, counts):
+        # Matches each record against `keys`, which grows with the entries this import adds,
+        # so repeated headwords within the file are combined too. The entries a batch
+        # touches are read in one query and rewritten with one executemany per statement.
+        batch_keys = [
+            import_key(item.get('headword') or '', (item.get('part_of_speech') or '') if match_pos else None)
+            for item in batch
+        ]
+        existing = self.db_manager.fetch_entries({keys[key] for key in batch_keys if key in keys})
+        entry_id, sense_id = next_ids
+        changed = {}
+        for item, key in zip(batch, batch_keys):
+            fields = [item.get(field, '') for field in ENTRY_COLUMNS]
+            meanings = item.get('meanings') or []
+            target = keys.get(key)
+            if target is None:
+                entry_id += 1
+                keys[key] = entry_id
+                changed[entry_id] = {"fields": fields, "meanings": [], "seen": set(), "kept": 0, "new": True}
+                add_meanings(changed[entry_id], meanings)
+                counts["added"] += 1
+                continue
+            if mode == "skip":
+                counts["skipped"] += 1
+                continue
+            entry = changed.get(target)
+            if entry is None:
+                old = existing[target]
+                old_fields = [old[field] or '' for field in ENTRY_COLUMNS]
+                entry = changed[target] = {
+                    "fields": list(old_fields), "old_fields": old_fields, "meanings": old['meanings'],
+                    "seen": set(old['meanings']), "kept": len(old['meanings']), "new": False,
+                }
+            if mode == "replace":
+                entry.update(fields=fields, meanings=[], seen=set(), kept=0, replace=True)
+                counts["replaced"] += 1
+            else:
+                # Merging keeps what the entry already has and only fills empty fields.
+                entry["fields"] = [current or value for current, value in zip(entry["fields"], fields)]
+                counts["merged"] += 1
+            add_meanings(entry, meanings)
+
+        entries, senses, updates, cleared, updated_ids = [], [], [], [], []
+        sort_key = self.db_manager.collation.sort_key
+        for target, entry in changed.items():
+            if entry["new"]:
+                entries.append((target,) + tuple(entry["fields"]))
+            else:
+                if entry["fields"] != entry["old_fields"]:
+                    updates.append(tuple(entry["fields"]) + (sort_key(entry["fields"][0]), target))
+                if entry.get("replace"):
+                    cleared.append((target,))
+                if target <= last_id and (updates and updates[-1][-1] == target or entry.get("replace")
+                                          or entry["kept"] < len(entry["meanings"])):
+                    updated_ids.append((target,))
+            for position in range(entry["kept"], len(entry["meanings"])):
+                sense_id += 1
+                senses.append((sense_id, target, entry["meanings"][position], position))
+        cursor = self.db_manager.cursor
+        cursor.executemany(
+            "UPDATE Entry SET headword=?, variation=?, part_of_speech=?, notes=?, sort_key=? WHERE id=?", updates
         )
-        if not path:
-            return
-        try:
-            self.db_manager.cursor.execute('''
-                SELECT Entry.*, GROUP_CONCAT(Senses.meaning, ';;') AS meanings 
-                FROM Entry 
-                LEFT JOIN Senses ON Entry.id = Senses.entry_id 
-                GROUP BY Entry.id
-            ''')
-            entries = self.db_manager.cursor.fetchall()
-            headers = [description[0] for description in self.db_manager.cursor.description]
-            data = []
-            for row in entries:
-                entry_dict = dict(zip(headers, row))
-                entry_dict['meanings'] = entry_dict['meanings'].split(';;') if entry_dict['meanings'] else []
-                data.append(entry_dict)
-            with open(path, "w", encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-            self.status_callback(self.translations.get("json_exported", "JSON exported successfully"))
-        except Exception as e:
-            QMessageBox.critical(
-                parent,
-                self.translations.get("error", "Error"),
-                self.translations.get("json_failed", "JSON export failed: {error_message}").format(error_message=e)
-            )
+        cursor.executemany("DELETE FROM Senses WHERE entry_id=?", cleared)
+        cursor.executemany("INSERT OR IGNORE INTO bulk_updated (entry_id) VALUES (?)", updated_ids)
+        self.write_batch(entries, senses)
+        next_ids[:] = entry_id, sense_id
 
-    def import_csv(self, parent):
-        path, _ = QFileDialog.getOpenFileName(
-            parent, 
-            self.translations.get("import_csv", "Import CSV"),
-            self.translations.get("csv_file_filter", "CSV files (*.csv);;All files (*.*)")
+    def write_batch(self, entries, senses):
+        sort_key = self.db_manager.collation.sort_key
+        self.db_manager.cursor.executemany(
+            "INSERT INTO Entry (id, headword, variation, part_of_speech, notes, sort_key) VALUES (?, ?, ?, ?, ?, ?)",
+            (entry + (sort_key(entry[1]),) for entry in entries)
         )
-        if not path:
-            return
-
-        reply = QMessageBox.question(
-            parent,
-            self.translations.get("confirm_import", "Confirm Import"),
-            self.translations.get(
-            "confirm_message",
-            "Do you wish to import data from external file? This may create duplicates of your existing headwords."
-            ),
-            QMessageBox.Yes | QMessageBox.No,
-            QMessageBox.No
+        self.db_manager.cursor.executemany(
+            "INSERT INTO Senses (id, entry_id, meaning, position) VALUES (?, ?, ?, ?)", senses
         )
-        if reply != QMessageBox.Yes:
-            return
 
-        try:
-            with open(path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    self.db_manager.cursor.execute('''
-                        INSERT INTO Entry (headword, variation, part_of_speech, notes)
-                        VALUES (?, ?, ?, ?)
-                    ''', (
-                        row.get('headword', ''),
-                        row.get('variation', ''),
-                        row.get('part_of_speech', ''),
-                        row.get('notes', '')
-                    ))
-                    entry_id = self.db_manager.cursor.lastrowid
-                    meanings = row.get('meanings', '')
-                    if meanings:
-                        for meaning in meanings.split(';;'):
-                            self.db_manager.cursor.execute('''
-                                INSERT INTO Senses (entry_id, meaning)
-                                VALUES (?, ?)
-                            ''', (entry_id, meaning.strip()))
-                self.db_manager.conn.commit()
-            self.status_callback(self.translations.get("csv_imported", "CSV imported successfully"))
-        except Exception as e:
-            QMessageBox.critical(
-                parent,
-                self.translations.get("error", "Error"),
-                self.translations.get("csv_import_failed", "CSV import failed: {error_message}").format(error_message=e)
-            )
+    def imported(self, message_key, message, counts, rate):
+        count = sum(counts.values())
+        status = self.translations.get(message_key, message) + " - " + self.translations.get(
+            "import_rate", "{count} entries, {rate:.0f} rows/s").format(count=count, rate=rate)
+        if count != counts["added"]:
+            status += " - " + self.translations.get(
+                "import_summary", "{added} added, {merged} merged, {replaced} replaced, {skipped} skipped"
+            ).format(**counts)
+        self.status_callback(status)
+        return counts
 
-    def import_json(self, parent):
-        path, _ = QFileDialog.getOpenFileName(
-            parent, 
-            self.translations.get("import_json", "Import JSON"),
-            self.translations.get("json_file_filter", "JSON files (*.json);;All files (*.*)")
-        )
-        if not path:
-            return
-        reply = QMessageBox.question(
-            parent,
-            self.translations.get("confirm_import", "Confirm Import"),
-            self.translations.get(
-            "confirm_message",
-            "Do you wish to import data from external file? This may create duplicates of your existing headwords."
-            ),
-            QMessageBox.Yes | QMessageBox.No,
-            QMessageBox.No
+    def export_csv(self, path):
+        with open_text(path, "w", newline='') as csvfile:
+            write_csv(self.db_manager.iter_entries(), csvfile)
+        self.status_callback(self.translations.get("csv_exported", "CSV exported successfully"))
+
+    def export_json(self, path):
+        with open_text(path, "w") as f:
+            write_json(self.db_manager.iter_entries(), f)
+        self.status_callback(self.translations.get("json_exported", "JSON exported successfully"))
+
+    def export_jsonl(self, path):
+        with open_text(path, "w") as f:
+            write_jsonl(self.db_manager.iter_entries(), f)
+        self.status_callback(self.translations.get("jsonl_exported", "JSON Lines exported successfully"))
+
+    def export_lookup(self, path):
+        # Compiles the dictionary into a read-only lookup file (see lookup_file.LookupFile).
+        # Both passes read one snapshot, so every sort key belongs to an entry already packed.
+        db_manager = self.db_manager
+        db_manager.conn.commit()
+        db_manager.cursor.execute("BEGIN")
+        try:
+            keys = db_manager.diagnostics.cursor(db_manager.conn)
+            keys.execute("SELECT id, sort_key FROM Entry ORDER BY sort_key, id")
+            count = write_lookup_file(path, db_manager.iter_entries(), keys, db_manager.collation.version)
+        finally:
+            db_manager.conn.rollback()
+        self.status_callback(
+            self.translations.get("lookup_exported", "Lookup file exported: {count} entries").format(count=count)
         )
-        if reply != QMessageBox.Yes:
-            return
+        return count
 
+    def export_sharded(self, path, fmt, workers=None, parts=False):
+        # Exports the id ranges of entry_id_ranges in a pool of processes, each reading the
+        # database on a connection of its own, so serializing runs on every core. With
+        # parts each range becomes a complete file (part_path); otherwise the ranges go to
+        # temporary files joined in id order into the same file export_{fmt} writes. Each
+        # process reads its own snapshot: export a dictionary nobody is editing meanwhile.
+        workers = workers or os.cpu_count() or 1
+        ranges = self.db_manager.entry_id_ranges(workers * SHARDS_PER_WORKER, SHARD_MIN_ENTRIES)
+        db_name = os.path.abspath(self.db_manager.db_name)
+        shard_dir = None
+        if parts:
+            targets = [part_path(path, number) for number in range(1, len(ranges) + 1)]
+        else:
+            shard_dir = tempfile.mkdtemp(prefix=".export-", dir=os.path.dirname(os.path.abspath(path)))
+            targets = [os.path.join(shard_dir, f"{number:04d}") for number in range(len(ranges))]
+        counts = [0] * len(ranges)
+        started = time.perf_counter()
         try:
-            with open(path, "r", encoding='utf-8') as f:
-                data = json.load(f)
-            for item in data:
-                self.db_manager.cursor.execute('''
-                    INSERT INTO Entry (headword, variation, part_of_speech, notes)
-                    VALUES (?, ?, ?, ?)
-                ''', (
-                    item.get('headword', ''),
-                    item.get('variation', ''),
-                    item.get('part_of_speech', ''),
-                    item.get('notes', '')
-                ))
-                entry_id = self.db_manager.cursor.lastrowid
-                for meaning in item.get('meanings', []):
-                    self.db_manager.cursor.execute('''
-                        INSERT INTO Senses (entry_id, meaning)
-                        VALUES (?, ?)
-                    ''', (entry_id, meaning.strip()))
-            self.db_manager.conn.commit()
-            self.status_callback(self.translations.get("json_imported", "JSON imported successfully"))
-        except Exception as e:
-            QMessageBox.critical(
-                parent,
-                self.translations.get("error", "Error"),
-                self.translations.get("json_import_failed", "JSON import failed: {error_message}").format(error_message=e)
+            # Spawned rather than forked: the GUI process has threads of its own.
+            with ProcessPoolExecutor(min(workers, len(ranges)), mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = {pool.submit(export_shard, db_name, fmt, id_range, target, parts): number
+                           for number, (id_range, target) in enumerate(zip(ranges, targets))}
+                try:
+                    for done, future in enumerate(as_completed(futures), 1):
+                        counts[futures[future]] = future.result()
+                        self.status_callback(self.translations.get(
+                            "export_progress", "Exporting... {done}/{shards} parts, {count} entries ({rate:.0f} entries/s)"
+                        ).format(done=done, shards=len(ranges), count=sum(counts),
+                                 rate=sum(counts) / (time.perf_counter() - started)))
+                except BaseException:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+            if not parts:
+                join_shards(fmt, targets, counts, path)
+        finally:
+            if shard_dir:
+                shutil.rmtree(shard_dir, ignore_errors=True)
+        seconds = time.perf_counter() - started
+        count = sum(counts)
+        self.status_callback(self.translations.get(
+            "sharded_exported", "Exported {count} entries in {shards} parts ({rate:.0f} entries/s)"
+        ).format(count=count, shards=len(ranges), rate=count / seconds if seconds else 0))
+        return {"entries": count, "shards": len(ranges), "workers": workers, "seconds": round(seconds, 3),
+                "rate": round(count / seconds if seconds else 0), "files": targets if parts else [path]}
+
+    def import_csv(self, path, mode="append", match_pos=False):
+        with open_text(path, "r", newline='') as csvfile:
+            records = (
+                {
+                    'headword': row.get('headword', ''),
+                    'variation': row.get('variation', ''),
+                    'part_of_speech': row.get('part_of_speech', ''),
+                    'notes': row.get('notes', ''),
+                    'meanings': split_meanings(row['meanings']) if row.get('meanings') else [],
+                }
+                for row in csv.DictReader(csvfile)
             )
+            counts, rate = self.bulk_import(records, mode, match_pos)
+        return self.imported("csv_imported", "CSV imported successfully", counts, rate)
+
+    def import_json(self, path, mode="append", match_pos=False):
+        with open_text(path, "r") as f:
+            counts, rate = self.bulk_import(iter_json_array(f), mode, match_pos)
+        return self.imported("json_imported", "JSON imported successfully", counts, rate)
+
+    def import_jsonl(self, path, mode="append", match_pos=False):
+        with open_text(path, "r") as f:
+            counts, rate = self.bulk_import(iter_json_lines(f), mode, match_pos)
+        return self.imported("jsonl_imported", "JSON Lines imported successfully", counts, rate)
+
+    def export_delta(self, path, since=0):
+        revision = self.db_manager.current_revision()
+        with open_text(path, "w") as f:
+            write_delta(self.db_manager.iter_changes(since, revision), since, revision, f)
+        self.status_callback(
+            self.translations.get("delta_exported", "Changes exported up to revision {revision}").format(revision=revision)
+        )
+        return revision
+
+    def import_delta(self, path):
+        # Applying a delta twice leaves the database as after the first time: upserts write
+        # only what differs and deletes of missing entries do nothing. Entry ids are kept,
+        # so deltas are meant for copies of the database they were exported from.
+        cursor = self.db_manager.cursor
+        senses = EntryService(self.db_manager)
+        count = 0
+        with open_text(path, "r") as f:
+            records = iter_json_lines(f)
+            # Written first by export_delta; without it this is some other JSON Lines file,
+            # whose ids would overwrite unrelated entries.
+            header = next(records, None)
+            if not isinstance(header, dict) or "delta" not in header:
+                raise ValueError(self.translations.get("not_delta", "{path} is not a changes file").format(path=path))
+            try:
+                for record in records:
+                    if "delta" in record:
+                        continue
+                    entry_id = record['id']
+                    if record.get('op') == "delete":
+                        cursor.execute("DELETE FROM Senses WHERE entry_id=?", (entry_id,))
+                        cursor.execute("DELETE FROM Entry WHERE id=?", (entry_id,))
+                    else:
+                        cursor.execute('''
+                            INSERT INTO Entry (id, headword, variation, part_of_speech, notes, sort_key)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(id) DO UPDATE SET headword=excluded.headword, variation=excluded.variation,
+                                part_of_speech=excluded.part_of_speech, notes=excluded.notes, sort_key=excluded.sort_key
+                            WHERE (headword, variation, part_of_speech, notes) IS NOT
+                                  (excluded.headword, excluded.variation, excluded.part_of_speech, excluded.notes)''',
+                            (entry_id, record.get('headword', ''), record.get('variation', ''),
+                             record.get('part_of_speech', ''), record.get('notes', ''),
+                             self.db_manager.collation.sort_key(record.get('headword', ''))))
+                        senses.write_senses(entry_id, [meaning.strip() for meaning in record.get('meanings') or []])
+                    count += 1
+                    if count % self.batch_size == 0:
+                        self.status_callback(
+                            self.translations.get("delta_progress", "Applying changes... {count} entries").format(count=count)
+                        )
+                self.db_manager.conn.commit()
+            except BaseException:
+                self.db_manager.conn.rollback()
+                raise
+        self.db_manager.entry_cache.clear()
+        self.db_manager.fuzzy_index.clear()
+        self.status_callback(
+            self.translations.get("delta_imported", "Changes applied: {count} entries").format(count=count)
+        )
+        return count
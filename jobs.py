@@ -0,0 +1,99 @@
+import logging, threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobSignals(QObject):
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class Job(QRunnable):
+    # Runs work(job, db_manager) on a pool thread with its own SQLite connection, or with
+    # None when no database is open yet. Results and progress reach the GUI thread only
+    # through the queued signals.
+    def __init__(self, db_manager, work):
+        super().__init__()
+        self.db_manager = db_manager
+        self.work = work
+        self.signals = JobSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report(self, message):
+        # Also the worker's status_callback, so long loops notice cancellation between steps.
+        if self.is_cancelled():
+            raise JobCancelled()
+        self.signals.progress.emit(message)
+
+    def run(self):
+        worker_db = None
+        try:
+            if self.db_manager is not None:
+                worker_db = self.db_manager.open_worker(self.report)
+                # Lets cancel() interrupt a statement that is already running inside SQLite.
+                worker_db.conn.set_progress_handler(self.is_cancelled, 10000)
+            result = self.work(self, worker_db)
+            if self.is_cancelled():
+                raise JobCancelled()
+            self.signals.finished.emit(result)
+        except Exception as e:
+            if self.is_cancelled():
+                self.signals.cancelled.emit()
+            else:
+                logging.exception("Background job failed")
+                self.signals.failed.emit(str(e))
+        finally:
+            if worker_db is not None and worker_db.conn:
+                worker_db.conn.close()
+
+
+class JobRunner(QObject):
+    # Background jobs, such as searches replaced at the next keystroke, are left out of
+    # active_changed and of cancel_all; whoever started one cancels it.
+    active_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None, max_threads=2):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.jobs = set()
+        self.background_jobs = set()
+
+    def start(self, db_manager, work, on_finished=None, on_progress=None, on_failed=None, on_cancelled=None,
+              background=False):
+        job = Job(db_manager, work)
+        for signal, slot in ((job.signals.finished, on_finished), (job.signals.progress, on_progress),
+                             (job.signals.failed, on_failed), (job.signals.cancelled, on_cancelled)):
+            if slot is not None:
+                signal.connect(slot)
+        for signal in (job.signals.finished, job.signals.failed, job.signals.cancelled):
+            signal.connect(lambda *args, job=job: self._done(job))
+        if background:
+            self.background_jobs.add(job)
+        else:
+            self.jobs.add(job)
+            self.active_changed.emit(len(self.jobs))
+        self.pool.start(job)
+        return job
+
+    def cancel_all(self, background=False):
+        for job in list(self.jobs | self.background_jobs if background else self.jobs):
+            job.cancel()
+
+    def _done(self, job):
+        if job in self.background_jobs:
+            self.background_jobs.discard(job)
+            return
+        self.jobs.discard(job)
+        self.active_changed.emit(len(self.jobs))
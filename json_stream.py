@@ -0,0 +1,92 @@
+import json
+
+CHUNK_SIZE = 1 << 16
+# Characters a single element may take before the file is rejected as malformed.
+MAX_ELEMENT_SIZE = 64 << 20
+# Decode errors this close to the end of the buffer may just be an element cut off by
+# the chunk boundary, such as "tru" of true or half of a \uXXXX escape.
+TRUNCATION_WINDOW = 6
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    # Yields the elements of a top-level JSON array one at a time, reading the file in
+    # chunks so memory stays bounded by the chunk size plus the largest single element.
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                return ""
+            read_more()
+
+    if peek() == "\ufeff":
+        pos += 1
+    if peek() != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    if peek() == "]":
+        return
+    while True:
+        peek()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Anything else would not be fixed by reading on; without this check a
+                # malformed element near the start kept the reader going to the end.
+                cut_off = e.pos >= len(buffer) - TRUNCATION_WINDOW or e.msg.startswith("Unterminated string")
+                if eof or not cut_off:
+                    raise
+                if len(buffer) - pos > MAX_ELEMENT_SIZE:
+                    raise ValueError(f"JSON array element longer than {MAX_ELEMENT_SIZE} characters") from e
+                read_more()
+                continue
+            if isinstance(item, (int, float)) and not isinstance(item, bool) and not eof:
+                # A number cut at the chunk boundary ("12" or "12." of "12.5e3") still
+                # decodes, as its prefix: read on until something follows that cannot
+                # continue it.
+                tail = end
+                while tail < len(buffer) and buffer[tail] in _NUMBER_CHARS:
+                    tail += 1
+                if tail == len(buffer):
+                    if len(buffer) - pos > MAX_ELEMENT_SIZE:
+                        raise ValueError(f"JSON array element longer than {MAX_ELEMENT_SIZE} characters")
+                    read_more()
+                    continue
+            break
+        pos = end
+        yield item
+        separator = peek()
+        if separator == ",":
+            pos += 1
+        elif separator == "]":
+            return
+        else:
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {separator!r}")
+
+
+def iter_json_lines(f):
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}") from e
@@ -0,0 +1,195 @@
+import logging, mmap, os, struct
+from array import array
+from bisect import bisect_left
+from collation import load_collation
+
+# A read-only compiled dictionary for lookup services: a header, a heap of packed entries
+# and sort keys, then a table of fixed-size records in headword order pointing into the
+# heap. Readers map the file and touch only the pages a lookup needs.
+LOOKUP_EXTENSION = ".nlk"
+MAGIC = b"NLKP"
+FORMAT_VERSION = 1
+# magic, format version, record count, heap offset, heap size, table offset, then the
+# collation version the sort keys were computed with.
+HEADER = struct.Struct("<4sHxxIQQQ64s")
+# Per headword: sort key offset and length, packed entry offset and length, all within the heap.
+RECORD = struct.Struct("<IIII")
+# Packed entry: id and meaning count, then the byte length of every string, then the
+# strings themselves as UTF-8: headword, variation, part of speech, notes, meanings.
+ENTRY_HEADER = struct.Struct("<IH")
+ENTRY_STRINGS = ("headword", "variation", "part_of_speech", "notes")
+LENGTH_SIZE = 4
+MAX_HEAP = 1 << 32
+MAX_ID = 1 << 32
+MAX_MEANINGS = 1 << 16
+
+
+class LookupFileError(Exception):
+    pass
+
+
+def pack_entry(entry):
+    if not 0 <= entry['id'] < MAX_ID:
+        raise LookupFileError(f"Entry id {entry['id']} is out of range for the lookup file format")
+    if len(entry['meanings']) >= MAX_MEANINGS:
+        raise LookupFileError(f"Entry {entry['id']} has more meanings than the lookup file format holds")
+    strings = [(entry[field] or "").encode("utf-8", "surrogatepass") for field in ENTRY_STRINGS]
+    strings += [meaning.encode("utf-8", "surrogatepass") for meaning in entry['meanings']]
+    lengths = struct.pack(f"<{len(strings)}I", *map(len, strings))
+    return ENTRY_HEADER.pack(entry['id'], len(entry['meanings'])) + lengths + b"".join(strings)
+
+
+def write_lookup_file(path, entries, keys, collation_version):
+    # entries in id order (DatabaseManager.iter_entries), keys as (id, sort_key) in
+    # headword order. Entries are packed as they stream past; only their ids and heap
+    # positions are kept for the second pass. The file is written beside the target and
+    # renamed over it, so a service that still maps the old file keeps reading that one.
+    ids, offsets, lengths = array("Q"), array("Q"), array("I")
+    table = bytearray()
+    temporary = path + ".tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(bytes(HEADER.size))
+            position = 0
+            for entry in entries:
+                data = pack_entry(entry)
+                if position + len(data) >= MAX_HEAP:
+                    raise LookupFileError("The dictionary is too large for the lookup file format")
+                ids.append(entry['id'])
+                offsets.append(position)
+                lengths.append(len(data))
+                f.write(data)
+                position += len(data)
+            for entry_id, key in keys:
+                index = bisect_left(ids, entry_id)
+                if index == len(ids) or ids[index] != entry_id:
+                    continue
+                if position + len(key) >= MAX_HEAP:
+                    raise LookupFileError("The dictionary is too large for the lookup file format")
+                table += RECORD.pack(position, len(key), offsets[index], lengths[index])
+                f.write(key)
+                position += len(key)
+            f.write(table)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(table) // RECORD.size, HEADER.size, position,
+                                HEADER.size + position, collation_version.encode("utf-8")))
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return len(table) // RECORD.size
+
+
+class LookupFile:
+    # Reads a file written by write_lookup_file. Opening maps the file and reads the
+    # header, whatever the dictionary's size; processes mapping the same file share its
+    # pages. Lookups binary-search the record table and decode strings straight out of
+    # the mapping.
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        try:
+            if len(self.mmap) < HEADER.size:
+                raise LookupFileError(f"{path} is not a lookup file")
+            magic, version, self.count, self.heap_offset, heap_size, self.table_offset, collation = \
+                HEADER.unpack_from(self.mmap)
+            if magic != MAGIC:
+                raise LookupFileError(f"{path} is not a lookup file")
+            if version != FORMAT_VERSION:
+                raise LookupFileError(f"{path} has lookup format version {version}, expected {FORMAT_VERSION}")
+            if self.table_offset + self.count * RECORD.size != len(self.mmap):
+                raise LookupFileError(f"{path} is truncated")
+        except Exception:
+            self.close()
+            raise
+        self.collation_version = collation.rstrip(b"\0").decode("utf-8")
+        self.collation = load_collation(self.collation_version.split(":", 1)[0])
+        if self.collation.version != self.collation_version:
+            # Still readable in order, but queries are keyed with today's table.
+            logging.warning(f"{path} was sorted with collation {self.collation_version}, "
+                            f"lookups use {self.collation.version}")
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.view.release()
+        self.mmap.close()
+
+    def record(self, index):
+        return RECORD.unpack_from(self.mmap, self.table_offset + index * RECORD.size)
+
+    def key(self, index):
+        # A view of the record's sort key, without copying it out of the mapping.
+        key_offset, key_length, _, _ = self.record(index)
+        start = self.heap_offset + key_offset
+        return self.view[start:start + key_length]
+
+    def bisect(self, key, low=0):
+        # Index of the first record whose sort key is not below key. Views only compare
+        # for equality, so ordering needs the key's bytes.
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle).tobytes() < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def key_range(self, low_key, high_key):
+        start = self.bisect(low_key)
+        return start, self.bisect(high_key, start)
+
+    def strings(self, index):
+        # The entry's id and a memoryview of each of its strings, without copying.
+        _, _, entry_offset, _ = self.record(index)
+        start = self.heap_offset + entry_offset
+        entry_id, meaning_count = ENTRY_HEADER.unpack_from(self.mmap, start)
+        count = len(ENTRY_STRINGS) + meaning_count
+        lengths = struct.unpack_from(f"<{count}I", self.mmap, start + ENTRY_HEADER.size)
+        position = start + ENTRY_HEADER.size + count * LENGTH_SIZE
+        views = []
+        for length in lengths:
+            views.append(self.view[position:position + length])
+            position += length
+        return entry_id, views
+
+    def headword(self, index):
+        entry_id, views = self.strings(index)
+        return entry_id, str(views[0], "utf-8", "surrogatepass")
+
+    def entry(self, index):
+        # Same dict as DatabaseManager.fetch_entry.
+        entry_id, views = self.strings(index)
+        texts = [str(view, "utf-8", "surrogatepass") for view in views]
+        return {'id': entry_id, **dict(zip(ENTRY_STRINGS, texts)), 'meanings': texts[len(ENTRY_STRINGS):]}
+
+    def lookup(self, headword):
+        # Entries whose headword matches ignoring case, diacritics and spacing the way the
+        # headword list groups them, in list order.
+        start, end = self.key_range(*self.collation.headword_range(headword))
+        return [self.entry(index) for index in range(start, end)]
+
+    def complete(self, prefix, limit=10):
+        # (id, headword) of the first headwords starting with prefix, in list order. Like
+        # DatabaseManager.complete_headwords, a headword entered several times is listed
+        # once, with its lowest id: the first record of each run of equal keys.
+        start, end = self.key_range(*self.collation.prefix_range(prefix))
+        headwords, previous = [], None
+        for index in range(start, end):
+            if len(headwords) == limit:
+                break
+            key = self.key(index)
+            if key != previous:
+                headwords.append(self.headword(index))
+                previous = key
+        return headwords
@@ -0,0 +1,266 @@
+import argparse, json, logging, queue, sqlite3, sys, threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from database import DatabaseManager, DatabaseError, SEARCH_FIELDS
+from entry_cache import EntryCache
+
+# Read-only HTTP lookups over a finished dictionary, for tools that would otherwise run
+# their own SQL against it. Every endpoint answers GET with JSON:
+#   /lookup?q=word              entries whose headword matches, folded like the headword list
+#   /prefix?q=wo&limit=10       headwords starting with q, in list order
+#   /search?q=ord&field=meaning full-text search, ranked; limit and offset page through it
+#   /fuzzy?q=wrod&field=...     approximate matches, closest first, once the fuzzy index is built
+#   /entry?id=42                one entry
+#   /health                     whether the server and its fuzzy index are ready
+DEFAULT_PORT = 8765
+POOL_SIZE = 8
+RESPONSE_CACHE_SIZE = 4096
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 500
+# SQLite integers are 64-bit; binding a larger Python int raises OverflowError.
+MAX_INTEGER = (1 << 63) - 1
+
+
+class RequestError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ReaderPool:
+    # Read-only DatabaseManagers, each lent to one request at a time. With shared_cache
+    # their connections read through one SQLite page cache. They also share one fuzzy
+    # index, built in the background by build_fuzzy_index.
+    def __init__(self, db_name, size=POOL_SIZE, shared_cache=True):
+        self.db_name = db_name
+        self.shared_cache = shared_cache
+        self.readers = queue.Queue()
+        self.all_readers = []
+        try:
+            for _ in range(size):
+                self.all_readers.append(self.open_reader())
+                self.readers.put(self.all_readers[-1])
+        except Exception:
+            self.close()
+            raise
+        self.fuzzy_index = self.all_readers[0].fuzzy_index
+
+    def open_reader(self):
+        reader = DatabaseManager({}, logging.info, 0)
+        reader.open_read_only(self.db_name, self.shared_cache)
+        if self.all_readers:
+            reader.fuzzy_index = self.all_readers[0].fuzzy_index
+        return reader
+
+    @contextmanager
+    def reader(self):
+        reader = self.readers.get()
+        try:
+            yield reader
+        finally:
+            self.readers.put(reader)
+
+    def build_fuzzy_index(self):
+        # Takes seconds on a large dictionary, so it runs on a connection of its own while
+        # the other endpoints are served; fuzzy queries wait for it.
+        builder = self.open_reader()
+
+        def build():
+            try:
+                builder.fuzzy_index.build(builder.cursor)
+            except Exception:
+                logging.exception("Building the fuzzy index failed")
+            finally:
+                builder.conn.close()
+        threading.Thread(target=build, name="fuzzy-index", daemon=True).start()
+
+    def close(self):
+        for reader in self.all_readers:
+            reader.conn.close()
+
+
+def text_param(params, name="q"):
+    value = params.get(name, "").strip()
+    if not value:
+        raise RequestError(f"Missing parameter: {name}")
+    if "\0" in value:
+        # SQLite would cut the text at the NUL, leaving an unterminated FTS phrase.
+        raise RequestError(f"Invalid character in parameter: {name}")
+    return value
+
+
+def int_param(params, name, default, low=0, high=None):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise RequestError(f"Not a number: {name}") from None
+    if not -MAX_INTEGER <= value <= MAX_INTEGER:
+        raise RequestError(f"Out of range: {name}")
+    return max(low, value if high is None else min(value, high))
+
+
+def fields_param(params):
+    field = params.get("field")
+    if field is None:
+        return None
+    if field not in SEARCH_FIELDS:
+        raise RequestError(f"Unknown field: {field}; use one of {', '.join(SEARCH_FIELDS)}")
+    return [field]
+
+
+def headword_rows(rows):
+    return [{"id": entry_id, "headword": headword} for entry_id, headword in rows]
+
+
+class LookupService:
+    # Answers request targets (path and query string) with (status, JSON body). Bodies of
+    # successful lookups are kept in an LRU cache keyed by the target: the dictionary is
+    # not expected to change under a running server.
+    def __init__(self, db_name, pool_size=POOL_SIZE, cache_size=RESPONSE_CACHE_SIZE, shared_cache=True, fuzzy=True):
+        self.pool = ReaderPool(db_name, pool_size, shared_cache)
+        self.fuzzy_enabled = fuzzy
+        if fuzzy:
+            self.pool.build_fuzzy_index()
+        self.responses = EntryCache(cache_size)
+        self.routes = {
+            "/lookup": self.lookup,
+            "/prefix": self.prefix,
+            "/search": self.search,
+            "/fuzzy": self.fuzzy,
+            "/entry": self.entry,
+            "/health": self.health,
+        }
+
+    def handle(self, target):
+        body = self.responses.get(target)
+        if body is not None:
+            return 200, body
+        url = urlsplit(target)
+        route = self.routes.get(url.path)
+        try:
+            if route is None:
+                raise RequestError(f"Unknown endpoint: {url.path}", 404)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            with self.pool.reader() as reader:
+                result = route(reader, params)
+            status = 200
+        except RequestError as e:
+            status, result = e.status, {"error": str(e)}
+        except sqlite3.Error as e:
+            logging.exception(f"Lookup failed: {target}")
+            status, result = 500, {"error": str(e)}
+        except Exception:
+            # Answered all the same, rather than dropping the connection.
+            logging.exception(f"Lookup failed: {target}")
+            status, result = 500, {"error": "Internal server error"}
+        body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        if status == 200 and url.path != "/health":
+            self.responses.put(target, body)
+        return status, body
+
+    def lookup(self, reader, params):
+        return {"results": reader.find_headword(text_param(params))}
+
+    def prefix(self, reader, params):
+        rows = reader.complete_headwords(text_param(params), int_param(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT))
+        return {"results": headword_rows(rows)}
+
+    def search(self, reader, params):
+        rows = reader.search_entries(text_param(params), fields_param(params),
+                                     int_param(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT),
+                                     int_param(params, "offset", 0))
+        return {"results": headword_rows(rows)}
+
+    def fuzzy(self, reader, params):
+        if not self.fuzzy_enabled:
+            raise RequestError("Fuzzy search is turned off", 404)
+        if not self.pool.fuzzy_index.built:
+            raise RequestError("The fuzzy index is still being built", 503)
+        rows = reader.fuzzy_search(text_param(params), fields_param(params),
+                                   int_param(params, "limit", DEFAULT_LIMIT, 1, MAX_LIMIT),
+                                   int_param(params, "offset", 0))
+        return {"results": headword_rows(rows)}
+
+    def entry(self, reader, params):
+        text_param(params, "id")
+        entry = reader.fetch_entry(int_param(params, "id", 0))
+        if entry is None:
+            raise RequestError("No such entry", 404)
+        return entry
+
+    def health(self, reader, params):
+        return {"status": "ok", "collation": reader.collation.name, "search_index": reader.search_index_available,
+                "fuzzy_index": self.pool.fuzzy_index.built}
+
+    def close(self):
+        self.pool.close()
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a client's requests reuse one connection. Headers and body go out in
+    # two writes; with Nagle's algorithm the body would wait for the client's delayed ACK.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "NalluriLookup/1"
+
+    def do_GET(self):
+        status, body = self.server.service.handle(self.path)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            # The client gave up waiting.
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+def make_server(db_name, host="127.0.0.1", port=DEFAULT_PORT, pool_size=POOL_SIZE, cache_size=RESPONSE_CACHE_SIZE,
+                shared_cache=True, fuzzy=True):
+    service = LookupService(db_name, pool_size, cache_size, shared_cache, fuzzy)
+    try:
+        server = ThreadingHTTPServer((host, port), LookupHandler)
+    except Exception:
+        service.close()
+        raise
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve read-only lookups over a dictionary database.")
+    parser.add_argument("db", help="dictionary database file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE, help="read-only connections")
+    parser.add_argument("--cache-size", type=int, default=RESPONSE_CACHE_SIZE, help="responses kept, 0 for none")
+    parser.add_argument("--no-shared-cache", action="store_true", help="give each connection its own page cache")
+    parser.add_argument("--no-fuzzy", action="store_true", help="skip building the fuzzy index; /fuzzy answers 404")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    try:
+        server = make_server(args.db, args.host, args.port, args.pool_size, args.cache_size, not args.no_shared_cache,
+                             not args.no_fuzzy)
+    except (DatabaseError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    host, port = server.server_address[:2]
+    print(f"Serving {args.db} on http://{host}:{port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,100 @@
-import sys, os, logging, difflib, json
+import time
+# Startup is profiled from here, before the Qt imports that dominate it.
+STARTED = time.perf_counter()
+import sys, os, logging, json
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QTextEdit, QListWidget,
-    QPushButton, QMessageBox, QFileDialog, QInputDialog, QMenuBar, QMenu, QStatusBar, QFrame, QShortcut, QSplitter, QComboBox, QCheckBox
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QTextEdit, QListView,
+    QPushButton, QMessageBox, QInputDialog, QMenuBar, QMenu, QStatusBar, QFrame, QShortcut, QSplitter, QComboBox, QCheckBox,
+    QCompleter, QScrollArea, QToolButton
 )
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt, QEvent
-from settings import load_settings, save_settings
+from PyQt5.QtCore import Qt, QEvent, QTimer, QObject, QStringListModel
+from settings import SettingsStore
 from database import DatabaseManager
 from import_export import ImportExportManager
-from duplicates import DuplicatesWindow
+from dialogs import Dialogs
+from resources import resource_path, read_stylesheet, read_translations
+from headword_model import HeadwordListModel, ENTRY_ID_ROLE
+from entry_cache import ENTRY_CACHE_SIZE
+from entry_service import EntryService
+from jobs import JobRunner
+from collation import available_collations, DEFAULT_COLLATION
+
+# Searched columns for each entry of search_criteria_combo, in display order.
+SEARCH_CRITERIA = [None, ("headword",), ("part_of_speech",), ("variation",), ("meaning",)]
+SEARCH_DELAY_MS = 250
+# Result sets up to this size are loaded whole and narrowed in memory as the term grows;
+# larger ones are paged in from SQLite as the list scrolls.
+SEARCH_CACHE_LIMIT = 2000
+# Headwords offered by the search box's completion popup.
+COMPLETION_LIMIT = 12
+# Settings changed in quick succession (theme, language, diagnostics) are written once.
+SETTINGS_SAVE_DELAY_MS = 1000
+
+
+class StartupProfiler(QObject):
+    # --profile-startup: milliseconds from STARTED to each startup milestone, printed as one
+    # JSON object on stderr once the window has painted and the last database is open.
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.marks = {}
+        app.installEventFilter(self)
+
+    def mark(self, name):
+        self.marks.setdefault(name, round((time.perf_counter() - STARTED) * 1000, 1))
+        if "first_paint" in self.marks and "database_ready" in self.marks:
+            print(json.dumps(self.marks), file=sys.stderr, flush=True)
+            self.app.quit()
 
-def resource_path(relative_path):
-    if getattr(sys, 'frozen', False):
-        base_path = sys._MEIPASS
-    else:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and "first_paint" not in self.marks:
+            self.app.removeEventFilter(self)
+            # Marked once the event loop is free again, i.e. after the whole window painted.
+            QTimer.singleShot(0, lambda: self.mark("first_paint"))
+        return False
 
 class DictionaryApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, profiler=None):
         super().__init__()
+        self.profiler = profiler
         self.setWindowIcon(QIcon(resource_path("icons/app_icon.png")))
+        # Filled in place by load_translations, so the managers holding it see the new language.
         self.translations = {}
         self.current_language = "en"
         self.current_theme = "themes/default_style.qss"
         self.current_entry_id = None
+        self.settings_timer = QTimer(self)
+        self.settings_timer.setSingleShot(True)
+        self.settings_timer.setInterval(SETTINGS_SAVE_DELAY_MS)
+        self.settings = SettingsStore(self.settings_timer.start)
+        self.settings_timer.timeout.connect(self.settings.flush)
 
         # Create manager instances (pass a status callback and the translations dictionary)
-        self.db_manager = DatabaseManager(self.translations, self.update_status)
-        self.import_export_manager = ImportExportManager(self.db_manager, self.translations, self.update_status)
+        self.db_manager = DatabaseManager(self.translations, self.update_status,
+                                          self.settings.get("entry_cache_size", ENTRY_CACHE_SIZE))
+        self.dialogs = Dialogs(self.translations)
+        diagnostics = self.db_manager.diagnostics
+        diagnostics.slow_query_ms = self.settings.get("slow_query_ms", diagnostics.slow_query_ms)
+        self.db_manager.set_diagnostics(self.settings.get("diagnostics", False))
+        self.diagnostics_window = None
+        self.entry_service = EntryService(self.db_manager)
+        self.entry_service.subscribe(self.on_entry_changed)
         self.duplicates_window = None
+        self.job_runner = JobRunner(self)
+        self.search_job = None
+        self.search_results = None
+        # Typing searches once the user pauses; Enter, Ctrl+F and the button search at once.
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.search_filter)
 
         self.initUI()
-        settings = load_settings()
-        self.change_theme(settings.get("theme", "themes/default_style.qss"))
-        self.change_language(settings.get("language", "en"))
+        self.change_theme(self.settings.get("theme", "themes/default_style.qss"))
+        self.change_language(self.settings.get("language", "en"))
+        # The last database is opened once the event loop runs, so the window shows first.
+        QTimer.singleShot(0, self.initialize_last_db)
 
     def initUI(self):
         self.setWindowTitle("Nalluri DictMaker")
@@ -50,6 +110,14 @@ class DictionaryApp(QMainWindow):
         self.export_csv_action = self.file_menu.addAction("Export CSV", self.export_csv)
         self.import_json_action = self.file_menu.addAction("Import JSON", self.import_json)
         self.export_json_action = self.file_menu.addAction("Export JSON", self.export_json)
+        self.import_jsonl_action = self.file_menu.addAction("Import JSON Lines", self.import_jsonl)
+        self.export_jsonl_action = self.file_menu.addAction("Export JSON Lines", self.export_jsonl)
+        self.export_delta_action = self.file_menu.addAction("Export Changes", self.export_delta)
+        self.export_lookup_action = self.file_menu.addAction("Export Lookup File", self.export_lookup)
+        self.import_delta_action = self.file_menu.addAction("Import Changes", self.import_delta)
+        self.file_menu.addSeparator()
+        self.backup_action = self.file_menu.addAction("Backup Database", self.backup_database)
+        self.incremental_backup_action = self.file_menu.addAction("Incremental Backup", lambda: self.backup_database(True))
         self.file_menu.addSeparator()
         self.show_duplicates_action = self.file_menu.addAction("Show Duplicates", self.show_duplicates)
         self.file_menu.addSeparator()
@@ -73,8 +141,13 @@ class DictionaryApp(QMainWindow):
         self.japanese_action = self.language_menu.addAction("Japanese", lambda: self.change_language("jp"))
         self.indonesian_action = self.language_menu.addAction("Indonesian", lambda: self.change_language("id"))
 
+        # Per database; the choices are listed when the menu opens.
+        self.collation_menu = self.preferences_menu.addMenu("Headword Order")
+        self.collation_menu.aboutToShow.connect(self.fill_collation_menu)
+
         self.help_menu = menubar.addMenu("Help")
         self.keyboard_shortcuts_action = self.help_menu.addAction("Keyboard Shortcuts", self.show_help)
+        self.diagnostics_action = self.help_menu.addAction("Diagnostics", self.show_diagnostics)
         self.about_action = self.help_menu.addAction("About", self.show_about)
 
         # Main layout
@@ -103,6 +176,18 @@ class DictionaryApp(QMainWindow):
         self.fuzzy_search_checkbox = QCheckBox(self.translations.get("fuzzy_search", "Fuzzy Search"))
         self.fuzzy_search_checkbox.setToolTip(self.translations.get("fuzzy_search_tooltip", "Check for approximate matches"))
         search_layout.addWidget(self.fuzzy_search_checkbox)
+        self.entry_search.textChanged.connect(lambda text: self.search_timer.start())
+        # Completions are managed here rather than through setCompleter, so the popup lists
+        # exactly what the prefix query returned.
+        self.completion_model = QStringListModel(self)
+        self.completer = QCompleter(self.completion_model, self)
+        self.completer.setWidget(self.entry_search)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.activated[str].connect(self.completion_chosen)
+        self.entry_search.textEdited.connect(self.complete_search)
+        self.entry_search.returnPressed.connect(self.search_filter)
+        self.search_criteria_combo.currentIndexChanged.connect(self.restart_search)
+        self.fuzzy_search_checkbox.toggled.connect(self.restart_search)
         self.search_button = QPushButton("")
         self.search_button.setIcon(QIcon(resource_path("icons/search_icon.png")))
         self.search_button.clicked.connect(self.search_filter)
@@ -119,8 +204,31 @@ class DictionaryApp(QMainWindow):
         list_layout = QVBoxLayout(list_frame)
         self.entries_label = QLabel("Entries")
         list_layout.addWidget(self.entries_label)
-        self.listbox_headwords = QListWidget()
-        self.listbox_headwords.itemClicked.connect(self.display_entry)
+        # One button per first letter in use; filled by update_jump_bar.
+        self.jump_bar = QWidget()
+        self.jump_layout = QHBoxLayout(self.jump_bar)
+        self.jump_layout.setContentsMargins(0, 0, 0, 0)
+        self.jump_layout.setSpacing(1)
+        self.jump_layout.addStretch()
+        self.jump_initials = None
+        self.jump_scroll = QScrollArea()
+        self.jump_scroll.setWidget(self.jump_bar)
+        self.jump_scroll.setWidgetResizable(True)
+        self.jump_scroll.setFrameShape(QFrame.NoFrame)
+        self.jump_scroll.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.jump_scroll.setVisible(False)
+        list_layout.addWidget(self.jump_scroll)
+        self.headword_model = HeadwordListModel(parent=self)
+        self.listbox_headwords = QListView()
+        # The themes style this list by name, not every QListView (completer and combo popups are ones too).
+        self.listbox_headwords.setObjectName("listbox_headwords")
+        self.listbox_headwords.setUniformItemSizes(True)
+        self.listbox_headwords.setModel(self.headword_model)
+        self.listbox_headwords.clicked.connect(self.display_entry)
+        # Arrow keys move the current row without a click; show that entry as well.
+        self.listbox_headwords.selectionModel().currentChanged.connect(
+            lambda current, previous: self.display_entry(current))
+        self.listbox_headwords.verticalScrollBar().valueChanged.connect(self.headwords_scrolled)
         list_layout.addWidget(self.listbox_headwords)
         splitter.addWidget(list_frame)
 
@@ -182,9 +290,12 @@ class DictionaryApp(QMainWindow):
         self.setStatusBar(self.status_bar)
         self.status_label = QLabel("Total Headwords: 0")
         self.status_bar.addPermanentWidget(self.status_label)
-
-        # Initialize last database if available
-        self.initialize_last_db()
+        self.cancel_job_button = QPushButton("Cancel")
+        self.cancel_job_button.setToolTip("Cancel running operations")
+        self.cancel_job_button.clicked.connect(self.job_runner.cancel_all)
+        self.cancel_job_button.setVisible(False)
+        self.status_bar.addPermanentWidget(self.cancel_job_button)
+        self.job_runner.active_changed.connect(self.on_jobs_changed)
 
         # Keyboard shortcuts
         self.add_shortcut(Qt.CTRL + Qt.Key_S, self.save_entry)
@@ -201,98 +312,193 @@ class DictionaryApp(QMainWindow):
 
     def initialize_last_db(self):
         last_db = self.db_manager.load_last_db()
-        if last_db and os.path.exists(last_db):
-            self.db_manager.load_database(self, last_db)
+        if not last_db or not os.path.exists(last_db):
+            self.last_db_ready()
+            return
+        # Upgrading or indexing an older database can take a while; a worker does that on
+        # its own connection, then the GUI opens the up-to-date file. A failure is reported
+        # by the second open.
+        self.update_status(self.translations.get("opening_db", "Opening {database}...").format(
+            database=os.path.basename(last_db)))
+        self.job_runner.start(
+            None, lambda job, db: self.db_manager.prepare_database(last_db, job.report),
+            on_finished=lambda db_name: self.open_last_db(last_db),
+            on_progress=self.update_status,
+            on_failed=lambda error: self.open_last_db(last_db)
+        )
+
+    def open_last_db(self, last_db):
+        # Something else may have been opened while the worker ran.
+        if not self.db_manager.conn:
+            self.dialogs.load_database(self, self.db_manager, last_db)
             self.populate_headwords()
+        self.last_db_ready()
+
+    def last_db_ready(self):
+        if self.profiler:
+            self.profiler.mark("database_ready")
 
     def populate_headwords(self):
-        self.listbox_headwords.clear()
+        self.search_results = None
         if self.db_manager.conn:
-            self.db_manager.cursor.execute("SELECT headword FROM Entry ORDER BY headword")
-            for row in self.db_manager.cursor.fetchall():
-                self.listbox_headwords.addItem(row[0])
-            self.update_headword_count()
-
-    def display_entry(self, item):
-        headword = item.text()
-        self.db_manager.cursor.execute('''
-            SELECT Entry.*, Senses.meaning 
-            FROM Entry LEFT JOIN Senses 
-            ON Entry.id = Senses.entry_id 
-            WHERE headword=?''', (headword,))
-        result = self.db_manager.cursor.fetchone()
-        if result:
-            self.current_entry_id = result[0]
-            self.entry_headword.setText(result[1])
-            self.entry_variation.setText(result[2])
-            self.entry_pos.setText(result[3])
-            self.entry_notes.setText(result[4])
-            self.entry_meaning.clear()
-            self.db_manager.cursor.execute("SELECT meaning FROM Senses WHERE entry_id=?", (self.current_entry_id,))
-            for row in self.db_manager.cursor.fetchall():
-                self.entry_meaning.append(row[0])
+            # Rows are paged in by the view as it scrolls instead of being loaded up front.
+            with self.db_manager.diagnostics.span("populate_headwords"):
+                self.headword_model.reset(self.db_manager.fetch_headwords, self.db_manager.collation.sort_key)
+                self.update_headword_count()
+                self.update_jump_bar()
+        else:
+            self.headword_model.reset()
+            self.update_jump_bar()
+
+    def update_jump_bar(self):
+        initials = self.db_manager.headword_initials() if self.db_manager.conn else []
+        if initials == self.jump_initials:
+            return
+        self.jump_initials = initials
+        while self.jump_layout.count() > 1:
+            self.jump_layout.takeAt(0).widget().deleteLater()
+        for position, (label, low, high) in enumerate(initials):
+            button = QToolButton()
+            button.setText(label)
+            button.setAutoRaise(True)
+            button.setToolTip(self.translations.get("jump_to_letter", "Go to {letter}").format(letter=label))
+            button.clicked.connect(lambda checked, low=low: self.jump_to(low))
+            self.jump_layout.insertWidget(position, button)
+        self.jump_scroll.setVisible(bool(initials))
+        if initials:
+            self.jump_scroll.setFixedHeight(self.jump_layout.itemAt(0).widget().sizeHint().height()
+                                            + self.jump_scroll.horizontalScrollBar().sizeHint().height())
+
+    def jump_to(self, low, search_text=""):
+        # Restarts the list at the first key >= low instead of paging down to it; the page
+        # above is loaded at once so the list can still be scrolled up from there.
+        if not self.db_manager.conn:
+            return
+        self.search_timer.stop()
+        self.entry_search.blockSignals(True)
+        self.entry_search.setText(search_text)
+        self.entry_search.blockSignals(False)
+        self.search_results = None
+        with self.db_manager.diagnostics.span("jump_to_letter"):
+            self.headword_model.reset(self.db_manager.fetch_headwords, self.db_manager.collation.sort_key,
+                                      self.db_manager.fetch_headwords_before, start=(low, 0))
+            self.headword_model.fetchMore()
+            row = self.headword_model.fetch_rows_before()
+        self.listbox_headwords.scrollTo(self.headword_model.index(row), QListView.PositionAtTop)
+        return row
+
+    def headwords_scrolled(self, value):
+        # After a jump, reaching the top of the list pages in the rows above it.
+        if value == 0 and self.headword_model.can_fetch_before():
+            added = self.headword_model.fetch_rows_before()
+            if added:
+                self.listbox_headwords.scrollTo(self.headword_model.index(added), QListView.PositionAtTop)
+
+    def complete_search(self, text):
+        # Offered for the criteria that search headwords; one index range scan per keystroke.
+        fields = SEARCH_CRITERIA[max(self.search_criteria_combo.currentIndex(), 0)]
+        words = []
+        if self.db_manager.conn and text.strip() and fields in (None, ("headword",)):
+            with self.db_manager.diagnostics.span("complete_headwords"):
+                rows = self.db_manager.complete_headwords(text, COMPLETION_LIMIT)
+            words = [headword for entry_id, headword in rows]
+        self.completion_model.setStringList(words)
+        if words:
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def completion_chosen(self, headword):
+        # Goes to the headword in the full list and shows it, rather than searching for it.
+        row = self.jump_to(self.db_manager.collation.sort_key(headword), headword)
+        if row is not None and row < self.headword_model.rowCount():
+            self.listbox_headwords.setCurrentIndex(self.headword_model.index(row))
+
+    def display_entry(self, index):
+        if not index.isValid() or not self.db_manager.conn:
+            return
+        with self.db_manager.diagnostics.span("display_entry"):
+            entry = self.db_manager.fetch_entry(index.data(ENTRY_ID_ROLE))
+        if entry:
+            self.current_entry_id = entry['id']
+            self.entry_headword.setText(entry['headword'])
+            self.entry_variation.setText(entry['variation'])
+            self.entry_pos.setText(entry['part_of_speech'])
+            self.entry_notes.setText(entry['notes'])
+            self.entry_meaning.setPlainText("\n".join(entry['meanings']))
 
     def search_filter(self):
+        self.search_timer.stop()
         search_term = self.entry_search.text().lower().strip()
-        criteria = self.search_criteria_combo.currentText()
+        fields = SEARCH_CRITERIA[max(self.search_criteria_combo.currentIndex(), 0)]
         fuzzy = self.fuzzy_search_checkbox.isChecked()
-        self.listbox_headwords.clear()
+        if self.search_job:
+            # Also interrupts the query inside SQLite through the worker's progress handler.
+            self.search_job.cancel()
+            self.search_job = None
         if not search_term:
             self.populate_headwords()
             return
+        if not self.db_manager.conn:
+            return
 
         try:
             if fuzzy:
-                self.db_manager.cursor.execute("SELECT headword, part_of_speech, variation FROM Entry")
-                rows = self.db_manager.cursor.fetchall()
-                matched = []
-                for row in rows:
-                    if criteria == "Headword":
-                        field = (row[0] or "").lower()
-                        if difflib.get_close_matches(search_term, [field], cutoff=0.6):
-                            matched.append(row[0])
-                    elif criteria == "Part of Speech":
-                        field = (row[1] or "").lower()
-                        if difflib.get_close_matches(search_term, [field], cutoff=0.6):
-                            matched.append(row[0])
-                    elif criteria == "Variation":
-                        field = (row[2] or "").lower()
-                        if difflib.get_close_matches(search_term, [field], cutoff=0.6):
-                            matched.append(row[0])
-                    else:
-                        fields = [(row[0] or "").lower(), (row[1] or "").lower(), (row[2] or "").lower()]
-                        if any(difflib.get_close_matches(search_term, [f], cutoff=0.6) for f in fields):
-                            matched.append(row[0])
-                for head in sorted(set(matched)):
-                    self.listbox_headwords.addItem(head)
-            else:
-                if criteria == "Headword":
-                    query = "SELECT headword FROM Entry WHERE LOWER(headword) LIKE ?"
-                    param = ('%' + search_term + '%',)
-                elif criteria == "Part of Speech":
-                    query = "SELECT headword FROM Entry WHERE LOWER(part_of_speech) LIKE ?"
-                    param = ('%' + search_term + '%',)
-                elif criteria == "Variation":
-                    query = "SELECT headword FROM Entry WHERE LOWER(variation) LIKE ?"
-                    param = ('%' + search_term + '%',)
-                elif criteria == "Meaning":
-                    query = '''SELECT headword FROM Entry 
-                               WHERE id IN (
-                                   SELECT entry_id FROM Senses WHERE LOWER(meaning) LIKE ?
-                               )'''
-                    param = ('%' + search_term + '%',)
-                else:
-                    query = '''SELECT headword FROM Entry
-                               WHERE LOWER(headword) LIKE ? OR LOWER(part_of_speech) LIKE ? OR LOWER(variation) LIKE ?
-                               OR id IN (SELECT entry_id FROM Senses WHERE LOWER(meaning) LIKE ?)'''
-                    param = ('%' + search_term + '%', '%' + search_term + '%', '%' + search_term + '%', '%' + search_term + '%')
-                self.db_manager.cursor.execute(query, param)
-                rows = self.db_manager.cursor.fetchall()
-                for row in rows:
-                    self.listbox_headwords.addItem(row[0])
+                # Building and scanning the fuzzy index can take a while; keep it off the GUI thread.
+                self.search_job = self.run_job(
+                    lambda job, db: db.fuzzy_search(search_term, fields),
+                    on_finished=self.headword_model.set_rows,
+                    operation="search_fuzzy_" + "_".join(fields or ("all",)),
+                    background=True
+                )
+                return
+            with self.db_manager.diagnostics.span("search_narrow"):
+                narrowed = self.narrow_search(search_term, fields)
+            if narrowed is not None:
+                self.headword_model.set_rows(narrowed)
+                return
+            self.search_job = self.run_job(
+                lambda job, db: db.search_entries(search_term, fields, limit=SEARCH_CACHE_LIMIT + 1, with_text=True),
+                on_finished=lambda rows: self.show_search_results(search_term, fields, rows),
+                operation="search_" + "_".join(fields or ("all",)),
+                background=True
+            )
         except Exception as e:
             logging.exception("Error in search_filter")
 
+    def restart_search(self):
+        # A changed criterion or mode invalidates the cached results.
+        self.search_results = None
+        if self.entry_search.text().strip():
+            self.search_timer.start()
+
+    def show_search_results(self, search_term, fields, rows):
+        if search_term != self.entry_search.text().lower().strip():
+            return  # finished just before a newer search cancelled it
+        self.search_job = None
+        if len(rows) <= SEARCH_CACHE_LIMIT:
+            # The whole result set is known, so a longer term can be answered from it.
+            self.search_results = (search_term, fields, rows)
+            self.headword_model.set_rows(rows)
+        else:
+            self.search_results = None
+            self.headword_model.set_rows(
+                rows[:SEARCH_CACHE_LIMIT],
+                fetch_page=lambda offset, limit: self.db_manager.search_entries(search_term, fields, limit, offset)
+            )
+
+    def narrow_search(self, search_term, fields):
+        # Every match for a term that contains the previous term also matched the previous
+        # term, so the cached rows only need filtering.
+        if not self.search_results:
+            return None
+        previous_term, previous_fields, rows = self.search_results
+        if previous_fields != fields or previous_term not in search_term:
+            return None
+        rows = [row for row in rows if search_term in (row[2] or "").lower()]
+        self.search_results = (search_term, fields, rows)
+        return rows
+
     def save_entry(self):
         if not self.db_manager.conn:
             QMessageBox.warning(self, self.translations.get("db_error", "Database Error"),
@@ -313,26 +519,10 @@ class DictionaryApp(QMainWindow):
             return
 
         try:
-            if self.current_entry_id:  # Update
-                self.db_manager.cursor.execute('''UPDATE Entry SET
-                    headword=?, variation=?, part_of_speech=?, notes=?
-                    WHERE id=?''',
-                    (fields['headword'], fields['variation'], fields['pos'], fields['notes'], self.current_entry_id))
-                self.db_manager.cursor.execute("DELETE FROM Senses WHERE entry_id=?", (self.current_entry_id,))
-                for meaning in fields['meanings']:
-                    self.db_manager.cursor.execute("INSERT INTO Senses (entry_id, meaning) VALUES (?, ?)",
-                                              (self.current_entry_id, meaning.strip()))
-            else:  # Insert new
-                self.db_manager.cursor.execute("INSERT INTO Entry (headword, variation, part_of_speech, notes) VALUES (?, ?, ?, ?)",
-                                          (fields['headword'], fields['variation'], fields['pos'], fields['notes']))
-                entry_id = self.db_manager.cursor.lastrowid
-                for meaning in fields['meanings']:
-                    self.db_manager.cursor.execute("INSERT INTO Senses (entry_id, meaning) VALUES (?, ?)",
-                                              (entry_id, meaning.strip()))
-            self.db_manager.conn.commit()
+            self.entry_service.save_entry(self.current_entry_id, fields['headword'], fields['variation'],
+                                          fields['pos'], fields['notes'], fields['meanings'])
             self.update_status(self.translations.get("status_entry_saved", "Entry saved successfully"))
             self.clear_fields()
-            self.populate_headwords()
         except Exception as e:
             logging.exception("Error saving entry")
             self.update_status(f"Error: {e}")
@@ -346,12 +536,9 @@ class DictionaryApp(QMainWindow):
             self.translations.get("delete_confirmation", "Delete this entry permanently?")
         ) == QMessageBox.Yes:
             try:
-                self.db_manager.cursor.execute("DELETE FROM Senses WHERE entry_id=?", (self.current_entry_id,))
-                self.db_manager.cursor.execute("DELETE FROM Entry WHERE id=?", (self.current_entry_id,))
-                self.db_manager.conn.commit()
+                self.entry_service.delete_entry(self.current_entry_id)
                 self.update_status(self.translations.get("delete_entry", "Entry deleted"))
                 self.clear_fields()
-                self.populate_headwords()
             except Exception as e:
                 QMessageBox.critical(
                     self, 
@@ -359,6 +546,17 @@ class DictionaryApp(QMainWindow):
                     self.translations.get("delete_failed", "Delete failed: {error_message}").format(error_message=e)
                 )
 
+    def on_entry_changed(self, change):
+        # Only the changed row of the list is touched.
+        self.search_results = None
+        if change.kind == "inserted":
+            self.headword_model.insert_entry(change.entry_id, change.headword)
+        elif change.kind == "updated":
+            self.headword_model.update_entry(change.entry_id, change.headword)
+        else:
+            self.headword_model.remove_entry(change.entry_id)
+        self.update_headword_count()
+
     def clear_fields(self):
         self.current_entry_id = None
         self.entry_headword.clear()
@@ -385,12 +583,29 @@ class DictionaryApp(QMainWindow):
             )
             return
 
-        self.db_manager.cursor.execute("SELECT headword, COUNT(*) FROM Entry GROUP BY headword HAVING COUNT(*) > 1")
-        rows = self.db_manager.cursor.fetchall()
-        if rows:
+        self.duplicates_button.setEnabled(False)
+        job = self.run_job(
+            lambda job, db: (db.find_duplicates(), db.find_near_duplicates()),
+            on_finished=self.duplicates_found,
+            operation="find_duplicates"
+        )
+        if job:
+            job.signals.failed.connect(lambda message: self.duplicates_button.setEnabled(True))
+            job.signals.cancelled.connect(lambda: self.duplicates_button.setEnabled(True))
+        else:
+            self.duplicates_button.setEnabled(True)
+
+    def duplicates_found(self, result):
+        self.duplicates_button.setEnabled(True)
+        rows, near_groups = result
+        if rows or near_groups:
             duplicates_text = ""
             for row in rows:
                 duplicates_text += self.translations.get("duplicate_headword", "Duplicate Headword: {headword} (Appears {count} times)\n\n").format(headword=row[0], count=row[1])
+            for headwords in near_groups:
+                duplicates_text += self.translations.get("near_duplicate_group", "Possible Duplicates: {headwords}\n\n").format(headwords=", ".join(headwords))
+            # Imported on first use, like the diagnostics window, to keep it off the startup path.
+            from duplicates import DuplicatesWindow
             self.duplicates_window = DuplicatesWindow(duplicates_text, self)
             self.duplicates_window.show()
             self.duplicates_window.raise_()
@@ -403,28 +618,199 @@ class DictionaryApp(QMainWindow):
             )
 
     def create_database(self):
-        db_name = self.db_manager.create_database(self)
+        db_name = self.dialogs.create_database(self, self.db_manager)
         if db_name:
             self.populate_headwords()
 
     def load_database(self):
-        db_name = self.db_manager.load_database(self)
+        db_name = self.dialogs.load_database(self, self.db_manager)
         if db_name:
             self.populate_headwords()
 
+    def run_job(self, work, on_finished=None, error_key="error_job", error_default="Operation failed: {error_message}",
+                operation="job", background=False):
+        # Heavy work runs on the job pool; only its callbacks touch the UI. Background jobs
+        # (searches) stay out of the Cancel button and the status bar when cancelled.
+        if not self.db_manager.conn:
+            QMessageBox.warning(self, self.translations.get("db_error", "Database Error"),
+                                self.translations.get("db_error_message", "Please create or load a database first."))
+            return None
+
+        def failed(message):
+            QMessageBox.critical(
+                self,
+                self.translations.get("error", "Error"),
+                self.translations.get(error_key, error_default).format(error_message=message)
+            )
+
+        def timed(job, db):
+            with db.diagnostics.span(operation):
+                return work(job, db)
+
+        return self.job_runner.start(
+            self.db_manager, timed,
+            on_finished=on_finished,
+            on_progress=self.update_status,
+            on_failed=failed,
+            on_cancelled=None if background else
+            lambda: self.update_status(self.translations.get("job_cancelled", "Operation cancelled")),
+            background=background
+        )
+
+    def run_transfer(self, transfer, error_key, error_default, on_finished=None, operation="transfer"):
+        # transfer(manager) runs with an ImportExportManager bound to the worker's connection.
+        return self.run_job(
+            lambda job, db: transfer(ImportExportManager(db, self.translations, job.report)),
+            on_finished=on_finished, error_key=error_key, error_default=error_default, operation=operation
+        )
+
+    def on_jobs_changed(self, active):
+        self.cancel_job_button.setVisible(active > 0)
+
     def export_csv(self):
-        self.import_export_manager.export_csv(self)
+        path = self.dialogs.ask_export_path(
+            self, "export_csv", "Export CSV", "csv_file_filter", "CSV files (*.csv);;All files (*.*)")
+        if path:
+            self.run_transfer(lambda manager: manager.export_csv(path),
+                              "csv_failed", "CSV export failed: {error_message}",
+                              operation="export_csv")
 
     def export_json(self):
-        self.import_export_manager.export_json(self)
+        path = self.dialogs.ask_export_path(
+            self, "export_json", "Export JSON", "json_file_filter", "JSON files (*.json);;All files (*.*)")
+        if path:
+            self.run_transfer(lambda manager: manager.export_json(path),
+                              "json_failed", "JSON export failed: {error_message}",
+                              operation="export_json")
+
+    def export_jsonl(self):
+        path = self.dialogs.ask_export_path(
+            self, "export_jsonl", "Export JSON Lines", "jsonl_file_filter", "JSON Lines files (*.jsonl);;All files (*.*)")
+        if path:
+            self.run_transfer(lambda manager: manager.export_jsonl(path),
+                              "jsonl_failed", "JSON Lines export failed: {error_message}",
+                              operation="export_jsonl")
+
+    def export_lookup(self):
+        path = self.dialogs.ask_export_path(
+            self, "export_lookup", "Export Lookup File", "lookup_file_filter", "Lookup files (*.nlk);;All files (*.*)")
+        if path:
+            self.run_transfer(lambda manager: manager.export_lookup(path),
+                              "lookup_failed", "Lookup file export failed: {error_message}",
+                              operation="export_lookup")
+
+    def fill_collation_menu(self):
+        self.collation_menu.clear()
+        for name in available_collations():
+            label = self.translations.get("collation_default", "Unicode") if name == DEFAULT_COLLATION else name
+            action = self.collation_menu.addAction(label, lambda name=name: self.change_collation(name))
+            action.setCheckable(True)
+            action.setChecked(bool(self.db_manager.conn) and self.db_manager.collation.name == name)
+
+    def change_collation(self, name):
+        # Rebuilding the keys of a large dictionary takes a while; the GUI connection then
+        # picks up the new collation from the database.
+        self.run_job(
+            lambda job, db: db.set_collation(name),
+            on_finished=lambda result: self.collation_changed(),
+            operation="set_collation"
+        )
 
-    def import_csv(self):
-        self.import_export_manager.import_csv(self)
+    def collation_changed(self):
+        self.db_manager.ensure_sort_keys()
         self.populate_headwords()
 
+    def backup_database(self, incremental=False):
+        # Uses the SQLite online backup API, so editing can continue while it runs.
+        self.run_job(
+            lambda job, db: db.backup_database(incremental),
+            on_finished=lambda path: self.update_status(
+                self.translations.get("backup_saved", "Backup saved to {path}").format(path=path)),
+            error_key="backup_failed",
+            error_default="Database backup failed: {error_message}",
+            operation="incremental_backup" if incremental else "backup"
+        )
+
+    def import_csv(self):
+        path = self.dialogs.ask_import_path(
+            self, "import_csv", "Import CSV", "csv_file_filter", "CSV files (*.csv);;All files (*.*)")
+        options = path and self.dialogs.ask_import_options(self)
+        if options:
+            self.run_transfer(lambda manager: manager.import_csv(path, *options),
+                              "csv_import_failed", "CSV import failed: {error_message}",
+                              on_finished=lambda count: self.populate_headwords(),
+                              operation="import_csv")
+
     def import_json(self):
-        self.import_export_manager.import_json(self)
-        self.populate_headwords()
+        path = self.dialogs.ask_import_path(
+            self, "import_json", "Import JSON", "json_file_filter", "JSON files (*.json);;All files (*.*)")
+        options = path and self.dialogs.ask_import_options(self)
+        if options:
+            self.run_transfer(lambda manager: manager.import_json(path, *options),
+                              "json_import_failed", "JSON import failed: {error_message}",
+                              on_finished=lambda count: self.populate_headwords(),
+                              operation="import_json")
+
+    def import_jsonl(self):
+        path = self.dialogs.ask_import_path(
+            self, "import_jsonl", "Import JSON Lines", "jsonl_file_filter", "JSON Lines files (*.jsonl);;All files (*.*)")
+        options = path and self.dialogs.ask_import_options(self)
+        if options:
+            self.run_transfer(lambda manager: manager.import_jsonl(path, *options),
+                              "jsonl_import_failed", "JSON Lines import failed: {error_message}",
+                              on_finished=lambda count: self.populate_headwords(),
+                              operation="import_jsonl")
+
+    def export_delta(self):
+        if not self.db_manager.conn:
+            return
+        # Defaults to the revision the previous delta export of this database ended at.
+        revisions = self.settings.get("delta_revisions", {})
+        since, ok = QInputDialog.getInt(
+            self,
+            self.translations.get("export_delta", "Export Changes"),
+            self.translations.get("delta_since", "Export changes after revision (current: {revision}):").format(
+                revision=self.db_manager.current_revision()),
+            revisions.get(os.path.abspath(self.db_manager.db_name), 0), 0
+        )
+        if not ok:
+            return
+        path = self.dialogs.ask_export_path(
+            self, "export_delta", "Export Changes", "jsonl_file_filter", "JSON Lines files (*.jsonl);;All files (*.*)")
+        if path:
+            self.run_transfer(lambda manager: manager.export_delta(path, since),
+                              "delta_failed", "Exporting changes failed: {error_message}",
+                              on_finished=self.delta_exported,
+                              operation="export_delta")
+
+    def delta_exported(self, revision):
+        revisions = dict(self.settings.get("delta_revisions", {}))
+        revisions[os.path.abspath(self.db_manager.db_name)] = revision
+        self.settings.set("delta_revisions", revisions)
+
+    def import_delta(self):
+        path = self.dialogs.ask_import_path(
+            self, "import_delta", "Import Changes", "jsonl_file_filter", "JSON Lines files (*.jsonl);;All files (*.*)")
+        if path:
+            self.run_transfer(lambda manager: manager.import_delta(path),
+                              "delta_import_failed", "Importing changes failed: {error_message}",
+                              on_finished=lambda count: self.populate_headwords(),
+                              operation="import_delta")
+
+    def show_diagnostics(self):
+        if self.diagnostics_window is None:
+            from diagnostics_window import DiagnosticsWindow
+            self.diagnostics_window = DiagnosticsWindow(self.db_manager, self.translations, self.diagnostics_changed, self)
+        self.diagnostics_window.refresh()
+        self.diagnostics_window.show()
+        self.diagnostics_window.raise_()
+        self.diagnostics_window.activateWindow()
+
+    def diagnostics_changed(self):
+        self.settings.update({
+            "diagnostics": self.db_manager.diagnostics.enabled,
+            "slow_query_ms": self.db_manager.diagnostics.slow_query_ms,
+        })
 
     def show_about(self):
         QMessageBox.information(
@@ -438,41 +824,25 @@ class DictionaryApp(QMainWindow):
         QMessageBox.information(self, self.translations.get("help_title", "Help"), help_text)
 
     def load_stylesheet(self, filename):
-        style_path = resource_path(filename)
-        if os.path.exists(style_path):
-            with open(style_path, "r") as file:
-                self.setStyleSheet(file.read())
-        else:
-            logging.error(f"Stylesheet not found: {style_path}")
+        stylesheet = read_stylesheet(filename)
+        if stylesheet is not None and stylesheet != self.styleSheet():
+            self.setStyleSheet(stylesheet)
 
     def change_theme(self, theme_filename):
         self.load_stylesheet(theme_filename)
         self.current_theme = theme_filename
-        settings = load_settings()
-        settings["theme"] = theme_filename
-        save_settings(settings)
+        self.settings.set("theme", theme_filename)
         self.update_status(self.translations.get("theme_changed", "Theme changed to {theme}").format(theme=theme_filename))
 
     def load_translations(self, lang_code):
-        trans_path = resource_path(f"translations/{lang_code}.json")
-        if os.path.exists(trans_path):
-            try:
-                with open(trans_path, "r", encoding="utf-8") as f:
-                    self.translations = json.load(f)
-            except Exception as e:
-                logging.error(f"Failed to load translations: {e}")
-                self.translations = {}
-        else:
-            logging.error(f"Translation file not found: {trans_path}")
-            self.translations = {}
+        self.translations.clear()
+        self.translations.update(read_translations(lang_code))
 
     def change_language(self, lang_code):
         self.current_language = lang_code
         self.load_translations(lang_code)
         self.apply_translations()
-        settings = load_settings()
-        settings["language"] = lang_code
-        save_settings(settings)
+        self.settings.set("language", lang_code)
         self.update_status(self.translations.get("status_language_changed", "Language changed."))
 
     def apply_translations(self):
@@ -484,6 +854,13 @@ class DictionaryApp(QMainWindow):
         self.export_csv_action.setText(self.translations.get("menu_export_csv", "Export CSV"))
         self.import_json_action.setText(self.translations.get("menu_import_json", "Import JSON"))
         self.export_json_action.setText(self.translations.get("menu_export_json", "Export JSON"))
+        self.import_jsonl_action.setText(self.translations.get("menu_import_jsonl", "Import JSON Lines"))
+        self.export_delta_action.setText(self.translations.get("menu_export_delta", "Export Changes"))
+        self.import_delta_action.setText(self.translations.get("menu_import_delta", "Import Changes"))
+        self.export_jsonl_action.setText(self.translations.get("menu_export_jsonl", "Export JSON Lines"))
+        self.export_lookup_action.setText(self.translations.get("menu_export_lookup", "Export Lookup File"))
+        self.backup_action.setText(self.translations.get("menu_backup", "Backup Database"))
+        self.incremental_backup_action.setText(self.translations.get("menu_incremental_backup", "Incremental Backup"))
         self.show_duplicates_action.setText(self.translations.get("menu_show_duplicates", "Show Duplicates"))
         self.exit_action.setText(self.translations.get("menu_exit", "Exit"))
         self.preferences_menu.setTitle(self.translations.get("menu_preferences", "Preferences"))
@@ -494,6 +871,7 @@ class DictionaryApp(QMainWindow):
         self.greenlit_theme_action.setText(self.translations.get("menu_greenlit", "Greenlit"))
         self.material_theme_action.setText(self.translations.get("menu_material", "Material"))
         self.language_menu.setTitle(self.translations.get("menu_language", "Language"))
+        self.collation_menu.setTitle(self.translations.get("menu_collation", "Headword Order"))
         self.english_action.setText(self.translations.get("menu_english", "English"))
         self.german_action.setText(self.translations.get("menu_german", "German"))
         self.malayalam_action.setText(self.translations.get("menu_malayalam", "Malayalam"))
@@ -504,12 +882,16 @@ class DictionaryApp(QMainWindow):
         self.indonesian_action.setText(self.translations.get("menu_indonesian", "Indonesian"))
         self.help_menu.setTitle(self.translations.get("menu_help", "Help"))
         self.keyboard_shortcuts_action.setText(self.translations.get("menu_keyboard_shortcuts", "Keyboard Shortcuts"))
+        self.diagnostics_action.setText(self.translations.get("menu_diagnostics", "Diagnostics"))
         self.about_action.setText(self.translations.get("about", "About"))
         self.fuzzy_search_checkbox.setText(self.translations.get("fuzzy_search", "Fuzzy Search"))
         self.fuzzy_search_checkbox.setToolTip(self.translations.get("fuzzy_search_tooltip", "Check for approximate matches"))
         self.entry_search.setToolTip(self.translations.get("enter_search", "Enter search term"))
         self.search_label.setText(self.translations.get("search_label", "Search:"))
         self.entries_label.setText(self.translations.get("entries_label", "Entries"))
+        for position, (label, low, high) in enumerate(self.jump_initials or []):
+            self.jump_layout.itemAt(position).widget().setToolTip(
+                self.translations.get("jump_to_letter", "Go to {letter}").format(letter=label))
         self.headword_label.setText(self.translations.get("headword_label", "Headword"))
         self.variation_label.setText(self.translations.get("variation_label", "Variation"))
         self.pos_label.setText(self.translations.get("pos_label", "Part of Speech"))
@@ -520,6 +902,8 @@ class DictionaryApp(QMainWindow):
         self.delete_button.setToolTip(self.translations.get("delete_button_tooltip", "Delete entry, Ctrl+D"))
         self.duplicates_button.setToolTip(self.translations.get("duplicates_button_tooltip", "Check for duplicate entries"))
         self.search_criteria_combo.setToolTip(self.translations.get("select_search_criteria", "Select search criteria"))
+        self.cancel_job_button.setText(self.translations.get("cancel_job", "Cancel"))
+        self.cancel_job_button.setToolTip(self.translations.get("cancel_job_tooltip", "Cancel running operations"))
         self.search_criteria_combo.clear()
         self.search_criteria_combo.addItems([
             self.translations.get("search_all", "All"),
@@ -529,6 +913,13 @@ class DictionaryApp(QMainWindow):
             self.translations.get("meaning_label", "Meaning"),
         ])
 
+    def closeEvent(self, event):
+        self.job_runner.cancel_all(background=True)
+        self.job_runner.pool.waitForDone()
+        self.settings_timer.stop()
+        self.settings.flush()
+        super().closeEvent(event)
+
     def eventFilter(self, obj, event):
         if event.type() == QEvent.KeyPress and obj.__class__.__name__ == "QLineEdit":
             if event.key() == Qt.Key_Up:
@@ -540,7 +931,11 @@ class DictionaryApp(QMainWindow):
         return super().eventFilter(obj, event)
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = DictionaryApp()
+    profile_startup = "--profile-startup" in sys.argv
+    app = QApplication([arg for arg in sys.argv if arg != "--profile-startup"])
+    profiler = StartupProfiler(app) if profile_startup else None
+    window = DictionaryApp(profiler)
+    if profiler:
+        profiler.mark("window_created")
     window.show()
     sys.exit(app.exec_())
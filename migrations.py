@@ -0,0 +1,98 @@
+import datetime, logging
+from changelog import CHANGE_TABLE, CHANGE_TRIGGERS
+
+def add_sense_positions(cursor):
+    # Senses were ordered by id; an explicit position lets an edit insert or move a sense
+    # without renumbering ids.
+    cursor.execute("PRAGMA table_info(Senses)")
+    if "position" not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE Senses ADD COLUMN position INTEGER NOT NULL DEFAULT 0")
+    # The old full-text trigger fired on any Senses update; ensure_search_index recreates
+    # it limited to entry_id and meaning, so numbering the rows does not touch the index.
+    cursor.execute("DROP TRIGGER IF EXISTS senses_search_au")
+    cursor.execute('''
+        UPDATE Senses SET position = numbered.position FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY entry_id ORDER BY id) - 1 AS position FROM Senses
+        ) AS numbered WHERE numbered.id = Senses.id''')
+    cursor.execute("DROP INDEX IF EXISTS idx_senses_entry_id")
+    cursor.execute("CREATE INDEX idx_senses_entry_id ON Senses(entry_id, position)")
+
+
+META_TABLE = '''CREATE TABLE IF NOT EXISTS Meta (
+        key TEXT PRIMARY KEY,
+        value TEXT)'''
+
+
+def add_sort_keys(cursor):
+    # Headword order by a per-database collation. The keys are filled by
+    # DatabaseManager.ensure_sort_keys, which has the collation function; the index
+    # carries the headword so the ordered list is read from the index alone.
+    cursor.execute(META_TABLE)
+    cursor.execute("PRAGMA table_info(Entry)")
+    if "sort_key" not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE Entry ADD COLUMN sort_key BLOB")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_entry_sort_key ON Entry(sort_key, id, headword)")
+
+
+# Schema changes, applied in order to any database whose PRAGMA user_version is lower
+# than their version. Each step is a list of SQL statements or a callable(cursor), and
+# must be safe on databases that already have the change (e.g. from an earlier build).
+MIGRATIONS = [
+    (1, "index_senses_entry_id", [
+        "CREATE INDEX IF NOT EXISTS idx_senses_entry_id ON Senses(entry_id)",
+    ]),
+    (2, "index_entry_headword", [
+        # Headword list paging orders by (headword, id); the index carries id as its rowid.
+        "CREATE INDEX IF NOT EXISTS idx_entry_headword ON Entry(headword)",
+    ]),
+    (3, "index_entry_norm_headword", [
+        "CREATE INDEX IF NOT EXISTS idx_entry_norm_headword ON Entry(LOWER(TRIM(headword)))",
+    ]),
+    (4, "senses_position", add_sense_positions),
+    # Starts empty: revision 0 stands for the state a full export captures.
+    (5, "change_log", [CHANGE_TABLE] + list(CHANGE_TRIGGERS.values())),
+    (6, "sort_keys", add_sort_keys),
+]
+
+MIGRATIONS_TABLE = '''CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at TEXT)'''
+
+
+def schema_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def apply_migrations(conn):
+    # Each migration commits on its own, together with its schema_migrations row and the
+    # new user_version, so an interrupted upgrade resumes at the first missing step.
+    cursor = conn.cursor()
+    applied = []
+    current = schema_version(cursor)
+    conn.commit()
+    for version, name, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            cursor.execute("BEGIN")
+            cursor.execute(MIGRATIONS_TABLE)
+            if callable(steps):
+                steps(cursor)
+            else:
+                for statement in steps:
+                    cursor.execute(statement)
+            cursor.execute(
+                "INSERT OR REPLACE INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.datetime.now().isoformat(timespec="seconds"))
+            )
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logging.exception(f"Schema migration {version} ({name}) failed")
+            raise
+        logging.info(f"Applied schema migration {version} ({name})")
+        applied.append(name)
+    return applied
@@ -0,0 +1,244 @@
+import argparse, json, os, sys, time, logging
+from database import DatabaseManager, DatabaseError, SEARCH_FIELDS
+from import_export import ImportExportManager, IMPORT_MODES, COMPRESSED_OPENERS
+from backup import BackupManager, BACKUP_DIR, BACKUP_KEEP, restore_backup
+from migrations import schema_version
+from collation import available_collations
+from lookup_file import LOOKUP_EXTENSION
+
+# Exit codes for batch schedulers.
+EXIT_OK = 0
+EXIT_FAILED = 1
+# Bad arguments, also what argparse exits with.
+EXIT_USAGE = 2
+# The database could not be opened, created or was not a dictionary.
+EXIT_DATABASE = 3
+# dedupe --check found duplicates.
+EXIT_DUPLICATES = 4
+
+FORMATS = ("csv", "json", "jsonl")
+# Exports can also compile the read-only lookup file.
+EXPORT_FORMATS = FORMATS + ("lookup",)
+
+
+class UsageError(Exception):
+    pass
+
+
+def file_format(path, given=None, formats=FORMATS):
+    # Taken from the extension unless given, looking past a compression suffix.
+    if given:
+        return given
+    root, ext = os.path.splitext(path.lower())
+    if ext in COMPRESSED_OPENERS:
+        ext = os.path.splitext(root)[1]
+    fmt = "lookup" if ext == LOOKUP_EXTENSION else ext.lstrip(".")
+    if fmt not in formats:
+        raise UsageError(f"Cannot tell the format of {path}; pass --format")
+    return fmt
+
+
+def open_database(args, status, create=False):
+    db_manager = DatabaseManager({}, status, args.cache_size)
+    if create and not os.path.exists(args.db):
+        db_manager.create_database(args.db)
+    else:
+        db_manager.load_database(args.db)
+    return db_manager
+
+
+def run_import(args, status):
+    fmt = file_format(args.path, args.format)
+    db_manager = open_database(args, status, create=args.create)
+    manager = ImportExportManager(db_manager, {}, status, args.batch_size)
+    counts = getattr(manager, f"import_{fmt}")(args.path, args.mode, args.match_pos)
+    return {"format": fmt, "mode": args.mode, **counts}
+
+
+def run_export(args, status):
+    fmt = None if args.since is not None else file_format(args.path, args.format, EXPORT_FORMATS)
+    db_manager = open_database(args, status)
+    manager = ImportExportManager(db_manager, {}, status, args.batch_size)
+    if fmt is None:
+        return {"format": "delta", "since": args.since, "revision": manager.export_delta(args.path, args.since)}
+    if args.workers is not None or args.parts:
+        if fmt not in FORMATS:
+            raise UsageError(f"--workers and --parts only apply to {', '.join(FORMATS)} exports")
+        revision = db_manager.current_revision()
+        return {"format": fmt, "revision": revision, **manager.export_sharded(args.path, fmt, args.workers, args.parts)}
+    getattr(manager, f"export_{fmt}")(args.path)
+    return {"format": fmt, "revision": db_manager.current_revision()}
+
+
+def run_dedupe(args, status):
+    db_manager = open_database(args, status)
+    result = {"duplicates": [{"headword": headword, "count": count} for headword, count in db_manager.find_duplicates()]}
+    if args.near:
+        result["near_duplicates"] = db_manager.find_near_duplicates()
+    if args.action == "merge":
+        result["merged"] = db_manager.merge_duplicates()
+    elif args.action == "delete":
+        result["deleted"] = db_manager.delete_duplicates()
+    if args.action != "report":
+        # What --check goes by: the duplicates the action left behind.
+        result["remaining"] = len(db_manager.find_duplicates())
+        if args.near:
+            result["remaining"] += len(db_manager.find_near_duplicates())
+    return result
+
+
+def run_search(args, status):
+    db_manager = open_database(args, status)
+    fields = [args.field] if args.field else None
+    if args.prefix:
+        rows = db_manager.complete_headwords(args.term, args.limit)
+    elif args.fuzzy:
+        rows = db_manager.fuzzy_search(args.term, fields, args.limit, args.offset)
+    else:
+        rows = db_manager.search_entries(args.term, fields, args.limit, args.offset)
+    return {"results": [{"id": entry_id, "headword": headword} for entry_id, headword in rows]}
+
+
+def run_backup(args, status):
+    db_manager = open_database(args, status)
+    path = BackupManager(db_manager, {}, status, args.dir, args.keep).backup(args.incremental)
+    return {"path": path, "size": os.path.getsize(path)}
+
+
+def run_restore(args, status):
+    if os.path.exists(args.target) and not args.force:
+        raise UsageError(f"{args.target} already exists; pass --force to overwrite it")
+    restore_backup(args.manifest, args.target)
+    return {"path": args.target, "size": os.path.getsize(args.target)}
+
+
+def run_stats(args, status):
+    db_manager = open_database(args, status)
+    cursor = db_manager.cursor
+    stats = {}
+    for name, query in (
+        ("entries", "SELECT COUNT(*) FROM Entry"),
+        ("senses", "SELECT COUNT(*) FROM Senses"),
+        ("page_size", "PRAGMA page_size"),
+        ("page_count", "PRAGMA page_count"),
+        ("freelist_count", "PRAGMA freelist_count"),
+    ):
+        cursor.execute(query)
+        stats[name] = cursor.fetchone()[0]
+    stats["duplicate_groups"] = len(db_manager.find_duplicates())
+    stats["revision"] = db_manager.current_revision()
+    stats["schema_version"] = schema_version(cursor)
+    stats["search_index"] = db_manager.search_index_available
+    stats["collation"] = db_manager.collation.name
+    return stats
+
+
+def run_collation(args, status):
+    db_manager = open_database(args, status)
+    if args.set:
+        if args.set not in available_collations():
+            raise UsageError(f"Unknown collation {args.set}; available: {', '.join(available_collations())}")
+        db_manager.set_collation(args.set)
+    elif args.rebuild:
+        db_manager.rebuild_sort_keys()
+    return {"collation": db_manager.collation.name, "version": db_manager.collation.version,
+            "available": available_collations()}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="nalluri", description="Nalluri DictMaker batch operations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def command(name, handler, help, needs_db=True):
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument("--quiet", action="store_true", help="do not print progress to stderr")
+        if needs_db:
+            sub.add_argument("--db", required=True, help="dictionary database file")
+            sub.add_argument("--cache-size", type=int, default=0, help="entries kept in the entry cache")
+        sub.set_defaults(handler=handler)
+        return sub
+
+    sub = command("import", run_import, "import entries from a CSV, JSON or JSON Lines file")
+    sub.add_argument("path")
+    sub.add_argument("--format", choices=FORMATS)
+    sub.add_argument("--mode", choices=IMPORT_MODES, default="append",
+                     help="what to do with records whose headword already exists")
+    sub.add_argument("--match-pos", action="store_true", help="match part of speech as well as headword")
+    sub.add_argument("--batch-size", type=int, default=5000)
+    sub.add_argument("--create", action="store_true", help="create the database if it does not exist")
+
+    sub = command("export", run_export, "export entries, or the changes after a revision")
+    sub.add_argument("path")
+    sub.add_argument("--format", choices=EXPORT_FORMATS)
+    sub.add_argument("--since", type=int, help="write a delta of the changes after this revision")
+    sub.add_argument("--workers", type=int, help="export id ranges in this many processes (0: one per core)")
+    sub.add_argument("--parts", action="store_true", help="write each id range to a file of its own")
+    sub.add_argument("--batch-size", type=int, default=5000)
+
+    sub = command("dedupe", run_dedupe, "report, merge or delete duplicate headwords")
+    sub.add_argument("--action", choices=("report", "merge", "delete"), default="report")
+    sub.add_argument("--near", action="store_true", help="also report near-duplicates")
+    sub.add_argument("--check", action="store_true",
+                     help=f"exit with {EXIT_DUPLICATES} if duplicates were found, or remain after --action")
+
+    sub = command("search", run_search, "search entries")
+    sub.add_argument("term")
+    sub.add_argument("--field", choices=SEARCH_FIELDS)
+    sub.add_argument("--limit", type=int, default=100)
+    sub.add_argument("--offset", type=int, default=0)
+    sub.add_argument("--fuzzy", action="store_true")
+    sub.add_argument("--prefix", action="store_true", help="headwords starting with the term, in list order")
+
+    sub = command("backup", run_backup, "back up the database")
+    sub.add_argument("--incremental", action="store_true")
+    sub.add_argument("--dir", default=BACKUP_DIR)
+    sub.add_argument("--keep", type=int, default=BACKUP_KEEP)
+
+    sub = command("restore", run_restore, "rebuild a database from a backup manifest", needs_db=False)
+    sub.add_argument("manifest")
+    sub.add_argument("target")
+    sub.add_argument("--force", action="store_true")
+
+    command("stats", run_stats, "print database statistics")
+
+    sub = command("collation", run_collation, "show or change the headword order and rebuild its sort keys")
+    sub.add_argument("--set", metavar="NAME", help="order headwords by this collation from now on")
+    sub.add_argument("--rebuild", action="store_true", help="recompute every sort key")
+    return parser
+
+
+def main(argv=None):
+    # Prints one JSON object to stdout: the command's result plus status and timing.
+    # Progress messages go to stderr.
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+
+    def status(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    output = {"command": args.command}
+    code = EXIT_OK
+    try:
+        output.update(args.handler(args, status))
+        output["status"] = "ok"
+        if getattr(args, "check", False) and output.get("remaining", output["duplicates"] or output.get("near_duplicates")):
+            code = EXIT_DUPLICATES
+    except UsageError as e:
+        output.update(status="error", error=str(e))
+        code = EXIT_USAGE
+    except DatabaseError as e:
+        output.update(status="error", error=str(e))
+        code = EXIT_DATABASE
+    except Exception as e:
+        logging.exception(f"{args.command} failed")
+        output.update(status="error", error=str(e))
+        code = EXIT_FAILED
+    output["elapsed"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(output, ensure_ascii=False))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import hashlib, random, re, struct, unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from operator import eq
+
+# Zero-width characters that change the code points but not the rendered word.
+IGNORABLE = "\u200b\u200c\u200d\u2060\ufeff"
+# Generic combining diacritics; script-specific marks (Malayalam vowel signs, kana
+# voicing marks) are left alone because they change the word.
+DIACRITIC_RANGES = ((0x0300, 0x036F), (0x1AB0, 0x1AFF), (0x1DC0, 0x1DFF), (0x20D0, 0x20FF), (0xFE20, 0xFE2F))
+# Atomic Malayalam chillu letters and their older consonant + virama (+ ZWJ) spelling.
+CHILLU_MAP = {
+    "\u0d7a": "\u0d23\u0d4d", "\u0d7b": "\u0d28\u0d4d", "\u0d7c": "\u0d30\u0d4d",
+    "\u0d7d": "\u0d32\u0d4d", "\u0d7e": "\u0d33\u0d4d", "\u0d7f": "\u0d15\u0d4d",
+}
+
+_FOLD_TABLE = {ord(char): None for char in IGNORABLE}
+_FOLD_TABLE.update({code: None for low, high in DIACRITIC_RANGES for code in range(low, high + 1)})
+_FOLD_TABLE.update({ord(char): spelling for char, spelling in CHILLU_MAP.items()})
+_WORD_RE = re.compile(r"\w+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fold(text):
+    text = text or ""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKD", text).translate(_FOLD_TABLE)
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def normalize_headword(text):
+    text = _SPACE_RE.sub(" ", fold(text)).strip()
+    # Trailing or leading punctuation ("word.", "-word") does not make a new headword.
+    start, end = 0, len(text)
+    while start < end and unicodedata.category(text[start]).startswith("P"):
+        start += 1
+    while end > start and unicodedata.category(text[end - 1]).startswith("P"):
+        end -= 1
+    return text[start:end].strip()
+
+
+def shingles(key, meanings):
+    padded = f"  {key} "
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    for meaning in meanings:
+        grams.update("\x00" + word for word in _WORD_RE.findall(fold(meaning)))
+    return frozenset(grams)
+
+
+@lru_cache(maxsize=1 << 18)
+def shingle_hash(shingle):
+    # Stable from run to run, unlike hash(), which is salted per process.
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+# Clusters entries whose normalized headwords are equal, or whose headword trigrams plus
+# meaning words look alike. Candidates come from MinHash LSH over a one-permutation
+# signature (each shingle lands in one of bands*rows bins, empty bins are densified), so
+# no all-pairs comparison is made; only packed signatures are kept and Jaccard similarity
+# is estimated from the share of equal bins. Headwords that normalize to nothing (empty,
+# or punctuation only) are not equal to each other.
+class NearDuplicateDetector:
+    def __init__(self, threshold=0.6, bands=12, rows=3, max_bucket=20, seed=0):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.max_bucket = max_bucket
+        self.size = bands * rows
+        self.packer = struct.Struct(f"<{self.size}Q")
+        rng = random.Random(seed)
+        self.probes = [rng.sample([other for other in range(self.size) if other != slot], self.size - 1)
+                       for slot in range(self.size)]
+
+    def find_clusters(self, entries, fetch_entries=None):
+        # fetch_entries(ids) -> {id: entry}, when given, re-reads the few candidate pairs
+        # so they are kept only if their exact Jaccard similarity reaches the threshold.
+        union = _UnionFind()
+        by_key = {}
+        signatures = {}
+        candidates = set()
+        buckets = defaultdict(list)
+        size = self.size
+        for entry in entries:
+            entry_id = entry['id']
+            key = normalize_headword(entry['headword'])
+            union.find(entry_id)
+            if key in by_key:
+                union.union(by_key[key], entry_id)
+            elif key:
+                by_key[key] = entry_id
+            signature = self._signature(shingles(key, entry['meanings']))
+            if signature is None:
+                continue
+            signatures[entry_id] = self.packer.pack(*signature)
+            for band in range(0, size, self.rows):
+                bucket = buckets[(band,) + signature[band:band + self.rows]]
+                for other_id in bucket:
+                    other = self.packer.unpack(signatures[other_id])
+                    if sum(map(eq, signature, other)) >= self.threshold * size:
+                        candidates.add((other_id, entry_id))
+                # Capping bucket size bounds the work on very common bands.
+                if len(bucket) < self.max_bucket:
+                    bucket.append(entry_id)
+        if candidates and fetch_entries is not None:
+            candidates = self._verify(candidates, fetch_entries)
+        for pair in candidates:
+            union.union(*pair)
+        clusters = defaultdict(list)
+        for entry_id in union.parent:
+            clusters[union.find(entry_id)].append(entry_id)
+        return [sorted(members) for members in clusters.values() if len(members) > 1]
+
+    def _signature(self, shingle_set):
+        size = self.size
+        signature = [None] * size
+        for shingle in shingle_set:
+            value = shingle_hash(shingle)
+            slot = value % size
+            if signature[slot] is None or value < signature[slot]:
+                signature[slot] = value
+        empty = [slot for slot in range(size) if signature[slot] is None]
+        if len(empty) == size:
+            return None
+        # Densification: an empty bin copies the first originally filled bin along its own
+        # fixed random probe order, so two entries agree on it about as often as on a filled bin.
+        for slot in empty:
+            for probe in self.probes[slot]:
+                if probe not in empty:
+                    signature[slot] = signature[probe]
+                    break
+        return tuple(signature)
+
+    def _verify(self, candidates, fetch_entries):
+        entries = fetch_entries({entry_id for pair in candidates for entry_id in pair})
+        shingle_sets = {
+            entry_id: shingles(normalize_headword(entry['headword']), entry['meanings'])
+            for entry_id, entry in entries.items()
+        }
+        verified = set()
+        for a, b in candidates:
+            if a in shingle_sets and b in shingle_sets:
+                first, second = shingle_sets[a], shingle_sets[b]
+                if len(first & second) >= self.threshold * len(first | second):
+                    verified.add((a, b))
+        return verified
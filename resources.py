@@ -0,0 +1,38 @@
+import sys, os, json, logging
+from functools import lru_cache
+
+
+def resource_path(relative_path):
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        # Beside this file rather than the working directory, so the command line finds
+        # the collation tables wherever it is run from.
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, relative_path)
+
+
+# The bundled themes and translations do not change while the program runs, so each is
+# read and parsed once; switching back to a theme or language costs nothing.
+@lru_cache(maxsize=None)
+def read_stylesheet(filename):
+    style_path = resource_path(filename)
+    if not os.path.exists(style_path):
+        logging.error(f"Stylesheet not found: {style_path}")
+        return None
+    with open(style_path, "r") as file:
+        return file.read()
+
+
+@lru_cache(maxsize=None)
+def read_translations(lang_code):
+    trans_path = resource_path(f"translations/{lang_code}.json")
+    if not os.path.exists(trans_path):
+        logging.error(f"Translation file not found: {trans_path}")
+        return {}
+    try:
+        with open(trans_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"Failed to load translations: {e}")
+        return {}
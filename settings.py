@@ -6,8 +6,11 @@ SETTINGS_FILE ="settings.json"
 
 def save_settings(settings):
     try:
-        with open(SETTINGS_FILE, "w") as f:
+        # Written beside the file and renamed over it, so a crash mid-write cannot leave it truncated.
+        temp_file = SETTINGS_FILE + ".tmp"
+        with open(temp_file, "w") as f:
             json.dump(settings, f, indent=4)
+        os.replace(temp_file, SETTINGS_FILE)
     except Exception as e:
         logging.error("Failed to save settings: %s", e)
 
@@ -20,3 +23,35 @@ def load_settings():
             logging.error("Failed to load settings: %s", e)
     return {}
 
+
+class SettingsStore:
+    # settings.json read once and kept in memory. Changes mark the store dirty and call
+    # schedule_save, which the window points at a single-shot timer so a burst of changes
+    # is written once; without it every change is saved at once. flush() writes whatever
+    # is still pending.
+    def __init__(self, schedule_save=None):
+        self.values = load_settings()
+        self.schedule_save = schedule_save
+        self.dirty = False
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, values):
+        changed = {key: value for key, value in values.items() if self.values.get(key, object()) != value}
+        if not changed:
+            return
+        self.values.update(changed)
+        self.dirty = True
+        if self.schedule_save:
+            self.schedule_save()
+        else:
+            self.flush()
+
+    def flush(self):
+        if self.dirty:
+            save_settings(self.values)
+            self.dirty = False
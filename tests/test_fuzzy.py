@@ -0,0 +1,83 @@
+import random, sqlite3, unittest
+from difflib import SequenceMatcher, get_close_matches
+from fuzzy import FuzzyIndex, at_least, common_length, normalize
+
+
+def make_index(entries):
+    # entries: (headword, meanings) in id order.
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE Entry (id INTEGER PRIMARY KEY, headword TEXT, part_of_speech TEXT, variation TEXT)")
+    conn.execute("CREATE TABLE Senses (entry_id INTEGER, meaning TEXT)")
+    for entry_id, (headword, meanings) in enumerate(entries, 1):
+        conn.execute("INSERT INTO Entry VALUES (?, ?, '', '')", (entry_id, headword))
+        conn.executemany("INSERT INTO Senses VALUES (?, ?)", [(entry_id, meaning) for meaning in meanings])
+    index = FuzzyIndex()
+    index.build(conn.cursor())
+    conn.close()
+    return index
+
+
+def expected(headwords, term):
+    # What get_close_matches finds, entry by entry, with the ratio it matched at.
+    term = normalize(term)
+    values = {normalize(headword) for headword in headwords} - {""}
+    matches = set(get_close_matches(term, values, n=len(values) + 1, cutoff=0.6))
+    return {entry_id: SequenceMatcher(None, normalize(headword), term).ratio()
+            for entry_id, headword in enumerate(headwords, 1) if normalize(headword) in matches}
+
+
+class FuzzyIndexTest(unittest.TestCase):
+    def test_matches_get_close_matches(self):
+        rng = random.Random(7)
+        headwords = ["".join(rng.choice("abcdehikorstu") for _ in range(rng.randint(1, 9))) for _ in range(2000)]
+        headwords += ["hose", "house", "horse", "mouse", "Alpha", "abxd", "kadha", "", "  Spaced  "]
+        index = make_index([(headword, []) for headword in headwords])
+        queries = rng.sample(headwords, 100) + ["hoise", "alpah", "abcd", "katha", "spaced", "x", "zzzz"]
+        queries += ["".join(rng.choice("abcdehikorstu") for _ in range(rng.randint(1, 12))) for _ in range(100)]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertEqual(index.search(query, ["headword"]), expected(headwords, query))
+
+    def test_reported_misses(self):
+        index = make_index([("hose", []), ("house", []), ("horse", []), ("mouse", []), ("Alpha", []),
+                            ("abxd", []), ("kadha", [])])
+        self.assertEqual(set(index.search("hoise")), {1, 2, 3, 4})
+        self.assertEqual(set(index.search("alpah")), {5})
+        self.assertEqual(set(index.search("abcd")), {6})
+        self.assertIn(7, index.search("katha"))
+
+    def test_meaning_words(self):
+        index = make_index([("one", ["to eat; to consume"]), ("two", ["drink"])])
+        self.assertEqual(set(index.search("consme", ["meaning"])), {1})
+        self.assertEqual(set(index.search("drnk")), {2})
+
+    def test_edits(self):
+        index = make_index([("house", [])])
+        index.update_entry(1, "mouse", "", "", [])
+        index.update_entry(2, "horse", "", "", [])
+        self.assertEqual(set(index.search("house")), {1, 2})
+        index.remove_entry(1)
+        self.assertEqual(set(index.search("house")), {2})
+
+    def test_at_least(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            masks = [rng.getrandbits(64) for _ in range(rng.randint(1, 12))]
+            needed = rng.randint(1, len(masks) + 1)
+            counts = [sum(mask >> bit & 1 for mask in masks) for bit in range(64)]
+            self.assertEqual(at_least(masks, needed), sum(1 << bit for bit in range(64) if counts[bit] >= needed))
+
+    def test_common_length_bounds_ratio(self):
+        rng = random.Random(5)
+        for _ in range(500):
+            a = "".join(rng.choice("abcd") for _ in range(rng.randint(1, 10)))
+            b = "".join(rng.choice("abcd") for _ in range(rng.randint(1, 10)))
+            masks = {}
+            for position, char in enumerate(b):
+                masks[char] = masks.get(char, 0) | 1 << position
+            blocks = sum(block.size for block in SequenceMatcher(None, a, b).get_matching_blocks())
+            self.assertGreaterEqual(common_length(masks, len(b), a), blocks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os, random, sqlite3, tempfile, unittest
+from database import DatabaseManager, duplicate_key
+from import_export import ImportExportManager, join_meanings, split_meanings
+
+
+class MeaningsCellTest(unittest.TestCase):
+    def test_plain_meanings_are_unchanged(self):
+        self.assertEqual(join_meanings(["to eat; to consume", "food"]), "to eat; to consume;;food")
+        self.assertEqual(split_meanings("to eat; to consume;;food"), ["to eat; to consume", "food"])
+
+    def test_round_trip(self):
+        rng = random.Random(2)
+        for _ in range(2000):
+            meanings = ["".join(rng.choice("ab;\\ ") for _ in range(rng.randint(0, 6)))
+                        for _ in range(rng.randint(1, 4))]
+            self.assertEqual(split_meanings(join_meanings(meanings)), meanings)
+
+    def test_reads_fully_escaped_cells(self):
+        self.assertEqual(split_meanings(r"to eat\; to consume;;a\\b"), ["to eat; to consume", "a\\b"])
+
+
+class ImportKeyTest(unittest.TestCase):
+    def test_duplicate_key_matches_sqlite(self):
+        conn = sqlite3.connect(":memory:")
+        for text in ("Word", "  WORD  ", "\tword\n", "Wörd", "ÉCLAIR", "a  B", "İstanbul", "ǅ", "", "ｗｏｒｄ"):
+            self.assertEqual(duplicate_key(text), conn.execute("SELECT LOWER(TRIM(?))", (text,)).fetchone()[0])
+        conn.close()
+
+    def test_merge_import_leaves_no_duplicates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db_manager = DatabaseManager({}, lambda message: None, 0)
+            db_manager.create_database(os.path.join(directory, "test.db"))
+            manager = ImportExportManager(db_manager, {}, lambda message: None)
+            records = [{'headword': headword, 'meanings': [meaning]} for headword, meaning in
+                       (("Word", "a"), (" word", "b"), ("WORD ", "a"), ("Wörd", "c"), ("wÖrd", "d"), ("a  b", "e"))]
+            counts, _ = manager.bulk_import(records, mode="merge")
+            self.assertEqual((counts["added"], counts["merged"]), (4, 2))
+            self.assertEqual(db_manager.find_duplicates(), [])
+            db_manager.conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import io, json, random, unittest
+from json_stream import iter_json_array, iter_json_lines
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(9 if depth < 3 else 7)
+    if kind == 0:
+        return rng.randint(-10 ** 12, 10 ** 12)
+    if kind == 1:
+        return rng.choice([0.5, -12.25, 1e-7, 3.0e21, 123456.789, -0.0])
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind in (3, 4, 5, 6):
+        return "".join(rng.choice('ab "\\/\n\té൦中😀') for _ in range(rng.randint(0, 12)))
+    if kind == 7:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{i}": random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+
+def parse(text, chunk_size):
+    return list(iter_json_array(io.StringIO(text), chunk_size))
+
+
+class JsonArrayTest(unittest.TestCase):
+    def test_chunk_sizes(self):
+        rng = random.Random(11)
+        for case in range(60):
+            values = [random_value(rng) for _ in range(rng.randint(0, 20))]
+            text = json.dumps(values, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1]))
+            for chunk_size in (1, 2, 3, 5, 7, 16, 1 << 16):
+                with self.subTest(case=case, chunk_size=chunk_size):
+                    self.assertEqual(parse(text, chunk_size), values)
+
+    def test_numbers_across_chunks(self):
+        text = "[1.5, 12e3, -7, 2.5E-3, 100, 0.125]"
+        for chunk_size in range(1, len(text) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(parse(text, chunk_size), [1.5, 12e3, -7, 2.5e-3, 100, 0.125])
+
+    def test_empty_and_bom(self):
+        self.assertEqual(parse("  [ ] ", 1), [])
+        self.assertEqual(parse("﻿[1]", 1), [1])
+
+    def test_malformed(self):
+        for text in ("{}", "[1 2]", "[1,", "[tru]", '["a', "[1.x]", "[{}, {]"):
+            for chunk_size in (1, 4, 1 << 16):
+                with self.subTest(text=text, chunk_size=chunk_size), self.assertRaises(ValueError):
+                    parse(text, chunk_size)
+
+    def test_stops_at_first_malformed_element(self):
+        reader = iter_json_array(io.StringIO('[1, {"a": oops}, 3' + " " * 100000 + "]"), 16)
+        self.assertEqual(next(reader), 1)
+        with self.assertRaises(ValueError):
+            next(reader)
+
+
+class JsonLinesTest(unittest.TestCase):
+    def test_lines(self):
+        self.assertEqual(list(iter_json_lines(io.StringIO('{"a": 1}\n\n[2]\n'))), [{"a": 1}, [2]])
+        with self.assertRaises(ValueError):
+            list(iter_json_lines(io.StringIO('{"a": 1}\n{oops}\n')))
+
+
+if __name__ == "__main__":
+    unittest.main()
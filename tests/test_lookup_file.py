@@ -0,0 +1,62 @@
+import os, tempfile, unittest
+from unittest import mock
+import lookup_file
+from collation import load_collation
+from lookup_file import LookupFile, LookupFileError, write_lookup_file
+
+
+def entry(entry_id, headword, meanings=()):
+    return {'id': entry_id, 'headword': headword, 'variation': "", 'part_of_speech': "noun", 'notes': "",
+            'meanings': list(meanings)}
+
+
+class LookupFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "dict.nlk")
+        self.collation = load_collation("default")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, entries):
+        keys = sorted(((item['id'], self.collation.sort_key(item['headword'])) for item in entries),
+                      key=lambda pair: (pair[1], pair[0]))
+        return write_lookup_file(self.path, entries, keys, self.collation.version)
+
+    def test_round_trip(self):
+        entries = [entry(1, "kathir", ["ray", "light"]), entry(2, "apple", ["fruit"]), entry(3, "Kathir"),
+                   entry(4, "kat", ["cat"]), entry(5, "മലയാളം", ["Malayalam"]), entry(6, ""), entry(7, "kathir")]
+        self.assertEqual(self.write(entries), 7)
+        with LookupFile(self.path) as lookup:
+            self.assertEqual(len(lookup), 7)
+            self.assertEqual([found['id'] for found in lookup.lookup("KATHIR")], [3, 1, 7])
+            self.assertEqual(lookup.lookup("apple"), [entries[1]])
+            self.assertEqual(lookup.lookup("മലയാളം")[0]['meanings'], ["Malayalam"])
+            self.assertEqual(lookup.lookup("missing"), [])
+            # A headword entered twice is completed once, with its lowest id.
+            self.assertEqual(lookup.complete("ka"), [(4, "kat"), (3, "Kathir"), (1, "kathir")])
+            self.assertEqual(lookup.complete("ka", limit=1), [(4, "kat")])
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a lookup file at all, but long enough for a header" * 2)
+        with self.assertRaises(LookupFileError):
+            LookupFile(self.path)
+        self.write([entry(1, "word")])
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(LookupFileError):
+            LookupFile(self.path)
+
+    def test_out_of_range(self):
+        for entries in ([entry(1 << 32, "word")], [entry(-1, "word")], [entry(1, "word", ["m"] * 65536)]):
+            with self.subTest(entries=len(entries[0]['meanings'])), self.assertRaises(LookupFileError):
+                self.write(entries)
+        with mock.patch.object(lookup_file, "MAX_HEAP", 64), self.assertRaises(LookupFileError):
+            self.write([entry(1, "word", ["a meaning long enough to pass the heap limit"])])
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
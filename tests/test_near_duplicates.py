@@ -0,0 +1,46 @@
+import os, subprocess, sys, unittest
+from near_duplicates import NearDuplicateDetector, normalize_headword
+
+
+def entries(*records):
+    return [{'id': entry_id, 'headword': headword, 'meanings': meanings}
+            for entry_id, (headword, meanings) in enumerate(records, 1)]
+
+
+class NearDuplicateTest(unittest.TestCase):
+    def test_normalize_headword(self):
+        self.assertEqual(normalize_headword("  Word. "), "word")
+        self.assertEqual(normalize_headword("café"), "cafe")
+        self.assertEqual(normalize_headword("നൻ"), "നന്")
+        self.assertEqual(normalize_headword("?!"), "")
+
+    def test_equal_keys_cluster(self):
+        clusters = NearDuplicateDetector().find_clusters(entries(("Word", ["a"]), ("word.", ["b"]), ("other", ["c"])))
+        self.assertEqual(clusters, [[1, 2]])
+
+    def test_empty_keys_do_not_cluster(self):
+        records = entries(("?", ["question mark"]), ("!!", ["exclamation"]), ("", ["nothing at all"]),
+                          ("...", ["ellipsis"]))
+        self.assertEqual(NearDuplicateDetector().find_clusters(records), [])
+
+    def test_similar_entries_cluster(self):
+        meanings = ["a large house with many rooms", "a building to live in"]
+        records = entries(("mansion", meanings), ("mansions", meanings), ("kettle", ["a pot for boiling water"]))
+        self.assertEqual(NearDuplicateDetector().find_clusters(records, lambda ids: {
+            entry['id']: entry for entry in records if entry['id'] in ids}), [[1, 2]])
+
+    def test_signature_is_stable_across_processes(self):
+        # hash() is salted per process; the signature must not be.
+        code = ("from near_duplicates import NearDuplicateDetector, shingles\n"
+                "print(NearDuplicateDetector()._signature(shingles('word', ['a meaning'])))")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        outputs = {
+            subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True,
+                           env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+            for seed in ("1", "2")
+        }
+        self.assertEqual(len(outputs), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
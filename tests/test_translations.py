@@ -0,0 +1,16 @@
+import glob, json, os, unittest
+
+TRANSLATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "translations")
+
+
+class TranslationsTest(unittest.TestCase):
+    def test_every_locale_has_every_key(self):
+        with open(os.path.join(TRANSLATIONS, "en.json"), encoding="utf-8") as f:
+            keys = set(json.load(f))
+        for path in glob.glob(os.path.join(TRANSLATIONS, "*.json")):
+            with self.subTest(locale=os.path.basename(path)), open(path, encoding="utf-8") as f:
+                self.assertEqual(keys - set(json.load(f)), set())
+
+
+if __name__ == "__main__":
+    unittest.main()